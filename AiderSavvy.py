@@ -12,6 +12,9 @@ from .commands.dashboard import (
     AiderSavvyNextTabCommand,
     AiderSavvyPrevTabCommand,
     AiderSavvyGoToTabCommand,
+    AiderSavvyNewSessionCommand,
+    AiderSavvySwitchSessionCommand,
+    AiderSavvyCloseSessionCommand,
     get_aider_instance
 )
 from .commands.file_commands import (
@@ -19,11 +22,17 @@ from .commands.file_commands import (
     AiderSavvyAddCurrentFileCommand,
     AiderSavvyDropFileCommand,
     AiderSavvyReadOnlyFileCommand,
-    AiderSavvyScanFilesCommand
+    AiderSavvyScanFilesCommand,
+    AiderSavvyAddGlobCommand,
+    AiderSavvyAddDirectoryCommand,
+    AiderSavvyAddRelatedFilesCommand,
+    AiderSavvyAddSymbolFileCommand,
+    AiderSavvyAddGitChangesCommand
 )
 from .commands.session_commands import (
     AiderSavvyStartTerminalCommand,
     AiderSavvyStopTerminalCommand,
+    AiderSavvyRestartTerminalCommand,
     AiderSavvySendMessageCommand,
     AiderSavvySendCommandCommand,
     AiderSavvyChangeModeCommand,
@@ -34,17 +43,43 @@ from .commands.session_commands import (
     AiderSavvyOpenLocalConfigCommand,
     AiderSavvyClearOutputCommand,
     AiderSavvyRefreshOutputCommand,
-    AiderSavvySyncSessionCommand
+    AiderSavvyLoadOlderOutputCommand,
+    AiderSavvySyncSessionCommand,
+    AiderSavvySendMultilineCommand,
+    send_multiline_buffer
 )
+from .commands.batch_commands import (
+    AiderSavvyBatchPromptCommand,
+    AiderSavvyRunBatchFileCommand,
+    AiderSavvyCancelBatchCommand
+)
+from .commands.history_commands import (
+    AiderSavvyHistoryJumpCommand,
+    AiderSavvyHistoryLoadCommand,
+    AiderSavvyArchiveHistoryCommand
+)
+from .commands.search_commands import AiderSavvySearchHistoryCommand
+from .commands.recall_commands import AiderSavvyRecallPromptCommand
+from .commands.profiling_commands import AiderSavvyPerformanceStatsCommand
+from .core.profiling import profiler
+from .core.settings import SETTINGS_FILE, get_setting
 
 
 def plugin_loaded():
     """Called when the plugin is loaded."""
+    _update_profiling()
+    sublime.load_settings(SETTINGS_FILE).add_on_change("aider_savvy_profiling", _update_profiling)
     print("AiderSavvy: Plugin loaded successfully.")
 
 
+def _update_profiling():
+    """Follow the "profiling" setting."""
+    profiler.enabled = bool(get_setting("profiling", False))
+
+
 def plugin_unloaded():
     """Called when the plugin is unloaded."""
+    sublime.load_settings(SETTINGS_FILE).clear_on_change("aider_savvy_profiling")
     # Clean up any running instances
     for window in sublime.windows():
         if hasattr(window, 'aider_savvy'):
@@ -68,6 +103,44 @@ class AiderSavvyEventListener(sublime_plugin.EventListener):
                 return is_aider != operand
         return None
 
+    def on_selection_modified(self, view):
+        """Backfill older history when the cursor reaches the top of the Output tab."""
+        if not view.settings().get("aider_savvy_main"):
+            return
+        window = view.window()
+        instance = getattr(window, 'aider_savvy', None) if window else None
+        if not instance or instance.current_tab != instance.TAB_OUTPUT:
+            return
+        if not instance.output_panel.loaded_from or not len(view.sel()):
+            return
+        if view.rowcol(view.sel()[0].begin())[0] == 0:
+            window.run_command("aider_savvy_load_older_output")
+
+    def on_post_save(self, view):
+        """Keep the project file index, import graph, symbol index and git status up to date."""
+        window = view.window()
+        instance = getattr(window, 'aider_savvy', None) if window else None
+        if not instance or not view.file_name():
+            return
+        for session in instance.sessions:
+            session.context.project_index.add(view.file_name())
+            session.context.import_graph.update(view.file_name())
+            session.context.symbol_index.update(view.file_name())
+            git_status = session.context.git_status
+            if git_status.active:
+                # Ready for the next "add git changes"
+                method = get_setting("git_status_method", "git")
+                project_files = list(session.context.project_index.files) if method == "index" else None
+                git_status.refresh_later(session.context.project_root, method, project_files)
+
+    def on_pre_close(self, view):
+        """Send a multiline message buffer when it is closed."""
+        if not view.settings().get("aider_multiline_input"):
+            return
+        window = view.window()
+        if window:
+            send_multiline_buffer(window, view)
+
     def on_close(self, view):
         """Handle view close events."""
         # If an Aider view is closed, refresh the instance
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""Fake `aider` executable for exercising AiderSavvy without a model.
+
+Accepts the subset of aider's command line used by the plugin, sleeps to
+simulate a model round-trip and appends a plausible exchange to the chat
+history file. Point the "aider_executable" setting at this script to run
+batch jobs locally.
+
+Environment:
+    FAKE_AIDER_DELAY  seconds to sleep per message (default 0.5)
+    FAKE_AIDER_FAIL   exit with status 1 when set
+"""
+import argparse
+import datetime
+import os
+import sys
+import time
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="aider")
+    parser.add_argument("--message")
+    parser.add_argument("--yes", action="store_true")
+    parser.add_argument("--no-pretty", action="store_true")
+    parser.add_argument("--ask", action="store_true")
+    parser.add_argument("--architect", action="store_true")
+    parser.add_argument("--model", default="gpt-4o")
+    parser.add_argument("--chat-history-file", default=".aider.chat.history.md")
+    parser.add_argument("--input-history-file", default=".aider.input.history")
+    parser.add_argument("--file", action="append", default=[])
+    parser.add_argument("--read", action="append", default=[])
+    parser.add_argument("--auto-commits", dest="auto_commits", action="store_true", default=True)
+    parser.add_argument("--no-auto-commits", dest="auto_commits", action="store_false")
+    parser.add_argument("--dirty-commits", dest="dirty_commits", action="store_true", default=True)
+    parser.add_argument("--no-dirty-commits", dest="dirty_commits", action="store_false")
+    parser.add_argument("files", nargs="*")
+    args = parser.parse_args(argv)
+
+    mode = "ask" if args.ask else "architect" if args.architect else "diff"
+    files = args.file + args.files
+    started = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    lines = [
+        "",
+        "# aider chat started at {0}".format(started),
+        "",
+        "> Main model: {0} with {1} edit format".format(args.model, mode),
+    ]
+    for f in files:
+        lines.append("> Added {0} to the chat.".format(f))
+    for f in args.read:
+        lines.append("> Added {0} to the chat as read-only.".format(f))
+
+    if args.message and args.dirty_commits:
+        lines.append("> Commit 0000000 (aider) chore: commit dirty files before the edit")
+
+    if args.message:
+        delay = float(os.environ.get("FAKE_AIDER_DELAY", "0.5"))
+        time.sleep(delay)
+        lines.extend([
+            "",
+            "#### {0}".format(args.message),
+            "",
+            "Done. I applied the requested change to {0}.".format(", ".join(files) or "no files"),
+            "",
+            "> Tokens: 1.2k sent, 85 received. Cost: $0.0040 message, $0.0040 session.",
+        ])
+        if args.auto_commits:
+            lines.append("> Commit 1111111 (aider) feat: apply the requested change")
+    print("\n".join(lines))
+
+    with open(args.chat_history_file, "a") as f:
+        f.write("\n".join(lines) + "\n")
+
+    if os.environ.get("FAKE_AIDER_FAIL"):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
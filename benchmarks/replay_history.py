@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""Replay a recorded chat history into a file watched by AiderFileWatcher.
+
+Reproduces a streaming aider reply without a model: the source history is
+re-appended to a target file by a writer thread at a configurable rate and
+chunk-size distribution, optionally splitting chunks in the middle of
+UTF-8 sequences and truncating the target now and then. The main thread
+plays Sublime's main loop and polls the watcher.
+
+It reports the delay from each write to its delivery as OutputChunk and
+session change events on the context's event bus, and checks the delivered stream
+against what was written (dropped, duplicated or corrupted bytes) and the
+final model/mode/files against a context fed the whole history at once.
+
+    python benchmarks/replay_history.py .aider.chat.history.md
+    python benchmarks/replay_history.py --synthetic 2 --rate 200000 \\
+        --chunks lognormal:4:1.2 --utf8-split 0.3 --truncate-every 500000
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import sublime_stub  # noqa: E402
+from run_benchmarks import percentile, write_history  # noqa: E402
+
+
+def chunk_sizes(spec, rng):
+    """Generator of chunk sizes from "uniform:LOW:HIGH" or "lognormal:MU:SIGMA"."""
+    kind, a, b = spec.split(":")
+    a, b = float(a), float(b)
+    while True:
+        if kind == "uniform":
+            yield rng.randint(int(a), int(b))
+        elif kind == "lognormal":
+            yield max(1, int(rng.lognormvariate(a, b)))
+        else:
+            raise ValueError("unknown chunk distribution: {0}".format(kind))
+
+
+def split_points(data, spec, utf8_split, rng):
+    """Chunk boundaries, nudged into multi-byte characters with probability utf8_split."""
+    points = []
+    position = 0
+    for size in chunk_sizes(spec, rng):
+        position += size
+        if position >= len(data):
+            break
+        if utf8_split and rng.random() < utf8_split:
+            # Move the cut just after the lead byte of a nearby multi-byte character
+            for probe in range(position, min(position + 64, len(data) - 1)):
+                if data[probe] >= 0xC0:
+                    position = probe + 1
+                    break
+        points.append(position)
+    points.append(len(data))
+    return points
+
+
+class Writer(threading.Thread):
+    """Appends the source to the target following the chunk plan."""
+
+    def __init__(self, target, data, points, rate, truncate_every):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.target = target
+        self.data = data
+        self.points = points
+        self.rate = rate
+        self.truncate_every = truncate_every
+        self.writes = []  # (epoch, end offset in epoch, write time)
+        self.epochs = [bytearray()]
+        self.lock = threading.Lock()
+        self.done = False
+
+    def run(self):
+        start = time.perf_counter()
+        previous = 0
+        since_truncate = 0
+        f = open(self.target, 'ab')
+        try:
+            for point in self.points:
+                chunk = self.data[previous:point]
+                previous = point
+
+                if self.truncate_every and since_truncate >= self.truncate_every:
+                    since_truncate = 0
+                    with self.lock:
+                        f.close()
+                        f = open(self.target, 'wb')
+                        self.epochs.append(bytearray())
+
+                # Pace writes to the requested byte rate
+                due = start + point / float(self.rate)
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+
+                f.write(chunk)
+                f.flush()
+                with self.lock:
+                    epoch = len(self.epochs) - 1
+                    self.epochs[epoch].extend(chunk)
+                    self.writes.append((epoch, len(self.epochs[epoch]), time.perf_counter()))
+                since_truncate += len(chunk)
+        finally:
+            f.close()
+            self.done = True
+
+
+def replay(args):
+    package = sublime_stub.load_package()
+    prefix = package.__package__
+    context_module = sys.modules[prefix + ".core.context"]
+    watcher_module = sys.modules[prefix + ".core.file_watcher"]
+    events_module = sys.modules[prefix + ".core.events"]
+
+    workdir = tempfile.mkdtemp(prefix="aider-savvy-replay-")
+    try:
+        if args.synthetic:
+            source = os.path.join(workdir, "source.md")
+            write_history(source, int(args.synthetic * 1024 * 1024))
+            # Sprinkle multi-byte characters so UTF-8 splits have targets
+            with open(source, 'rb') as f:
+                text = f.read().decode('utf-8')
+            text = text.replace(" model ", " modèle ").replace(" cost ", " coût 💰 ")
+            data = text.encode('utf-8')
+        else:
+            with open(args.source, 'rb') as f:
+                data = f.read()
+
+        rng = random.Random(args.seed)
+        points = split_points(data, args.chunks, args.utf8_split, rng)
+
+        window = sublime_stub.Window([workdir])
+        target = os.path.join(workdir, ".aider.chat.history.md")
+        open(target, 'wb').close()
+
+        context = context_module.AiderContext(window)
+        writer = Writer(target, data, points, args.rate, args.truncate_every)
+        deliveries = []  # (time, writer epoch seen by the watcher, text)
+        session_events = []  # (time, event type name)
+        seen = {'epoch': 0}
+        skipped = {}  # epoch -> bytes before the re-read tail window
+
+        def on_output(events):
+            for event in events:
+                deliveries.append((time.perf_counter(), seen['epoch'], event.text))
+
+        def on_session(events):
+            now = time.perf_counter()
+            for event in events:
+                session_events.append((now, type(event).__name__))
+
+        context.events.subscribe((events_module.OutputChunk,), on_output)
+        context.events.subscribe(events_module.OPTION_EVENTS + events_module.FILE_EVENTS +
+                                 (events_module.StateSynced,), on_session)
+        watcher = watcher_module.AiderFileWatcher(context)
+        read_replaced = watcher._read_replaced
+
+        def on_replaced(history_path):
+            # The watcher noticed a truncation, later output belongs to a new epoch
+            with writer.lock:
+                seen['epoch'] = len(writer.epochs) - 1
+                result = read_replaced(history_path)
+                # Only the tail window of the new file is re-read
+                skipped[seen['epoch']] = watcher.replaced_from
+                return result
+
+        watcher._read_replaced = on_replaced
+        watcher.start()
+        sublime_stub.clear_timeouts()
+
+        started = time.perf_counter()
+        writer.start()
+        polls = 0
+        while True:
+            finished = writer.done
+            watcher._poll()
+            sublime_stub.clear_timeouts()
+            polls += 1
+            if finished:
+                break
+            time.sleep(args.poll_interval / 1000.0)
+        elapsed = time.perf_counter() - started
+        watcher.stop()
+
+        report(args, data, points, writer, deliveries, skipped, session_events, polls,
+               elapsed, context, context_module, window)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def report(args, data, points, writer, deliveries, skipped, session_events, polls,
+           elapsed, context, context_module, window):
+    # Write -> OutputChunk latency, matching bytes delivered per epoch.
+    # Bytes written and truncated away before the next poll can never be seen.
+    latencies = []
+    oldest_write = {}  # delivery time -> write time of its oldest chunk
+    delivered_epochs = [[] for _ in writer.epochs]
+    write_index = 0
+    epoch_bytes = 0
+    current = 0
+    for delivered_at, epoch, text in deliveries:
+        if epoch != current:
+            current = epoch
+            epoch_bytes = skipped.get(epoch, 0)
+        delivered_epochs[epoch].append(text)
+        epoch_bytes += len(text.encode('utf-8'))
+        while write_index < len(writer.writes) and writer.writes[write_index][0] < epoch:
+            write_index += 1
+        while (write_index < len(writer.writes) and
+               writer.writes[write_index][0] == epoch and
+               writer.writes[write_index][1] <= epoch_bytes):
+            oldest_write.setdefault(delivered_at, writer.writes[write_index][2])
+            latencies.append(delivered_at - writer.writes[write_index][2])
+            write_index += 1
+
+    # Session events: delay from the oldest write delivered by the same poll
+    # (an upper bound, the triggering line may have been written later)
+    session_latencies = []
+    for event_at, _ in session_events:
+        previous = [t for t in oldest_write if t <= event_at]
+        if previous:
+            session_latencies.append(event_at - oldest_write[max(previous)])
+
+    # Each epoch must be delivered as a prefix of what was written to it,
+    # and the last one completely
+    written_chars = delivered_chars = dropped = duplicated = lost = corrupted = 0
+    divergence = None
+    for number, epoch_data in enumerate(writer.epochs):
+        written = bytes(epoch_data[skipped.get(number, 0):]).decode('utf-8', 'replace')
+        lost += len(bytes(epoch_data[:skipped.get(number, 0)]).decode('utf-8', 'replace'))
+        delivered = "".join(delivered_epochs[number])
+        written_chars += len(written)
+        delivered_chars += len(delivered)
+        corrupted += max(0, delivered.count(u"\ufffd") - written.count(u"\ufffd"))
+        if written.startswith(delivered):
+            if number == len(writer.epochs) - 1:
+                dropped += len(written) - len(delivered)
+            else:
+                lost += len(written) - len(delivered)
+            continue
+        common = 0
+        limit = min(len(written), len(delivered))
+        while common < limit and written[common] == delivered[common]:
+            common += 1
+        if divergence is None:
+            divergence = "epoch {0}, char {1:,}".format(number, common)
+        dropped += max(0, len(written) - len(delivered))
+        duplicated += max(0, len(delivered) - len(written))
+
+    # Ground truth: the same history parsed in one go
+    truth = context_module.AiderContext(window)
+    for epoch_data in writer.epochs:
+        truth.sync_incremental_from_history(bytes(epoch_data).decode('utf-8', 'replace') + "\n")
+
+    def ms(values, fraction):
+        return percentile(values, fraction) * 1000
+
+    print("Replay: {0:,} bytes in {1:,} chunks, {2} truncations, {3:.2f}s, {4} polls".format(
+        len(data), len(points), len(writer.epochs) - 1, elapsed, polls))
+    print("")
+    print("  write -> output chunk     p50 {0:8.1f} ms  p95 {1:8.1f} ms  max {2:8.1f} ms  ({3} of {4} writes)".format(
+        ms(latencies, 0.5), ms(latencies, 0.95), max(latencies or [0]) * 1000,
+        len(latencies), len(writer.writes)))
+    print("  write -> session event    p50 {0:8.1f} ms  p95 {1:8.1f} ms  ({2} events: {3} model/mode, {4} files)".format(
+        ms(session_latencies, 0.5), ms(session_latencies, 0.95), len(session_events),
+        sum(1 for _, t in session_events if t in ("ModelChanged", "ModeChanged")),
+        sum(1 for _, t in session_events if t in ("FileAdded", "ReadOnlyAdded", "FileDropped"))))
+    print("")
+    print("  written chars      {0:>12,}".format(written_chars))
+    print("  delivered chars    {0:>12,}".format(delivered_chars))
+    print("  first divergence   {0:>12}".format(divergence or "none"))
+    print("  dropped chars      {0:>12,}".format(dropped))
+    print("  duplicated chars   {0:>12,}".format(duplicated))
+    print("  replacement chars  {0:>12,}  (U+FFFD not in the source)".format(corrupted))
+    print("  not delivered      {0:>12,}  (truncated between two polls, or before the re-read tail)".format(lost))
+    print("")
+    for name in ("model", "mode", "files", "readonly_files"):
+        got, expected = getattr(context, name), getattr(truth, name)
+        if got == expected:
+            state = "ok"
+        else:
+            state = "MISMATCH: {0!r} != {1!r}".format(got, expected)
+            if lost:
+                state += " (expected, part of the history was not delivered)"
+        print("  final {0:<15} {1}".format(name, state))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("source", nargs="?", help="recorded .aider.chat.history.md")
+    parser.add_argument("--synthetic", type=float, metavar="MB",
+                        help="replay a synthetic history of this size instead")
+    parser.add_argument("--rate", type=float, default=50000, help="bytes per second (default 50000)")
+    parser.add_argument("--chunks", default="uniform:1:400",
+                        help="chunk sizes: uniform:LOW:HIGH or lognormal:MU:SIGMA (default uniform:1:400)")
+    parser.add_argument("--utf8-split", type=float, default=0.0,
+                        help="probability of cutting a chunk inside a UTF-8 character")
+    parser.add_argument("--truncate-every", type=int, default=0, metavar="BYTES",
+                        help="truncate the target after about this many bytes")
+    parser.add_argument("--poll-interval", type=float, default=50,
+                        help="watcher poll interval in ms (default 50)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    if not args.source and not args.synthetic:
+        parser.error("give a history file or --synthetic MB")
+    replay(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
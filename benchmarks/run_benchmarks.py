@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+"""Headless benchmarks for AiderSavvy's hot paths.
+
+Runs the plugin against benchmarks/sublime_stub.py, so no Sublime Text is
+needed. Each scenario builds its synthetic data in a temporary directory
+and reports throughput and per-operation latency (p50/p95/max).
+
+    python benchmarks/run_benchmarks.py                 # all scenarios
+    python benchmarks/run_benchmarks.py history append  # some of them
+    python benchmarks/run_benchmarks.py --scale 0.1     # smaller data sets
+    python benchmarks/run_benchmarks.py --json out.json
+
+Scenarios:
+    history   100 MB synthetic chat history: index build, session sync,
+              search index build and queries
+    tree      200k-file project tree: project index build, scan_project_files
+    session   5k-file session: Files/Options/Output rendering
+    append    10k appended chunks through AiderFileWatcher._poll
+    startup   dashboard time to first paint and background bootstrap
+              next to a 20 MB history
+    input     50k-prompt .aider.input.history: parse, cached reload,
+              appended prompt and recall ranking
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import sublime_stub  # noqa: E402
+
+WORDS = ("parser watcher index session render terminal output history model "
+         "token cost latency refactor function class import module buffer "
+         "panel context file window view chunk stream diff commit").split()
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[int(round(fraction * (len(ordered) - 1)))]
+
+
+class Result(object):
+    """Timings of one measured operation."""
+
+    def __init__(self, scenario, name, unit=None):
+        self.scenario = scenario
+        self.name = name
+        self.unit = unit  # Throughput unit, e.g. "MB" or "chunks"
+        self.samples = []  # Seconds per operation
+        self.amount = 0.0  # Units processed over all samples
+
+    def measure(self, func, amount=0.0):
+        start = time.perf_counter()
+        value = func()
+        self.samples.append(time.perf_counter() - start)
+        self.amount += amount
+        return value
+
+    def to_dict(self):
+        total = sum(self.samples)
+        return {
+            'scenario': self.scenario,
+            'name': self.name,
+            'runs': len(self.samples),
+            'total_s': total,
+            'p50_ms': percentile(self.samples, 0.5) * 1000,
+            'p95_ms': percentile(self.samples, 0.95) * 1000,
+            'max_ms': max(self.samples) * 1000 if self.samples else 0.0,
+            'throughput': (self.amount / total) if self.unit and total else None,
+            'unit': self.unit,
+        }
+
+
+def synthetic_turn(rng, number):
+    """One user turn with a reply, tool lines and a tokens line."""
+    prompt = " ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 20)))
+    reply = []
+    for _ in range(rng.randint(5, 40)):
+        reply.append(" ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 16))))
+    return (
+        "\n#### {0} #{1}\n\n{2}\n\n> Applied edit to src/{3}.py\n"
+        "> Tokens: {4}.{5}k sent, {6} received. Cost: $0.0{7} message, $0.{8} session.\n"
+    ).format(prompt, number, "\n".join(reply), rng.choice(WORDS),
+             rng.randint(1, 30), rng.randint(0, 9), rng.randint(50, 900),
+             rng.randint(1, 9), rng.randint(10, 99))
+
+
+def write_history(path, size_bytes, seed=1):
+    """Write a synthetic history of about size_bytes, return turn count."""
+    rng = random.Random(seed)
+    written = 0
+    turns = 0
+    with open(path, 'w') as f:
+        while written < size_bytes:
+            header = (
+                "\n# aider chat started at 2024-{0:02d}-{1:02d} 10:00:00\n\n"
+                "> Main model: gpt-4o with diff edit format\n"
+                "> Added src/{2}.py to the chat.\n"
+            ).format(rng.randint(1, 12), rng.randint(1, 28), rng.choice(WORDS))
+            f.write(header)
+            written += len(header)
+            for _ in range(rng.randint(5, 30)):
+                turn = synthetic_turn(rng, turns)
+                f.write(turn)
+                written += len(turn)
+                turns += 1
+    return turns
+
+
+def new_instance(package, project_dir):
+    """A dashboard instance for a stub window on project_dir."""
+    dashboard = sys.modules[package.__package__ + ".commands.dashboard"]
+    window = sublime_stub.Window([project_dir])
+    instance = dashboard.get_aider_instance(window)
+    return window, instance
+
+
+# Scenarios
+
+def bench_history(package, workdir, scale):
+    results = []
+    size = int(100 * 1024 * 1024 * scale)
+    path = os.path.join(workdir, ".aider.chat.history.md")
+    turns = write_history(path, size)
+    megabytes = os.path.getsize(path) / (1024.0 * 1024.0)
+
+    core = sys.modules[package.__package__ + ".core.history_index"]
+    search = sys.modules[package.__package__ + ".core.search_index"]
+    context_module = sys.modules[package.__package__ + ".core.context"]
+
+    build = Result("history", "index build ({0:.0f} MB, {1} turns)".format(megabytes, turns), "MB")
+    for _ in range(3):
+        index = core.HistoryIndex(None)
+        build.measure(lambda: index.update(path), megabytes)
+    results.append(build)
+
+    window = sublime_stub.Window([workdir])
+    sync = Result("history", "sync_from_existing_session (indexed)")
+    context = context_module.AiderContext(window)
+    context.history_index = index
+    for _ in range(20):
+        sync.measure(context.sync_from_existing_session)
+    results.append(sync)
+
+    search_index = search.HistorySearchIndex(None)
+    search_build = Result("history", "search index build", "MB")
+    search_build.measure(lambda: search_index.update(index), megabytes)
+    results.append(search_build)
+
+    queries = Result("history", "search query (2 terms)", "queries")
+    rng = random.Random(2)
+    for _ in range(50):
+        query = "{0} {1}".format(rng.choice(WORDS), rng.choice(WORDS))
+        queries.measure(lambda: search_index.search(index, query), 1)
+    results.append(queries)
+
+    load_turn = Result("history", "load one turn by byte range", "turns")
+    for _ in range(200):
+        number = rng.randrange(len(index.turns))
+        load_turn.measure(lambda: index.read_range(*index.turn_range(number)), 1)
+    results.append(load_turn)
+    return results
+
+
+def bench_tree(package, workdir, scale):
+    count = int(200000 * scale)
+    per_dir = 500
+    for i in range(count):
+        directory = os.path.join(workdir, "pkg{0:04d}".format(i // per_dir))
+        if i % per_dir == 0:
+            os.makedirs(directory)
+        open(os.path.join(directory, "module_{0}.py".format(i)), 'w').close()
+
+    window, instance = new_instance(package, workdir)
+    index = instance.context.project_index
+    root = instance.context.project_root
+    build = Result("tree", "project index build ({0} files on disk)".format(count))
+    for _ in range(5):
+        index.invalidate()
+        build.measure(lambda: index.build(root))
+    scan = Result("tree", "scan_project_files from the index ({0} files)".format(count))
+    for _ in range(5):
+        scan.measure(instance.files_panel.scan_project_files)
+    return [build, scan]
+
+
+def bench_session(package, workdir, scale):
+    count = int(5000 * scale)
+    window, instance = new_instance(package, workdir)
+    for i in range(count):
+        instance.context.add_file("src/pkg{0}/module_{1}.py".format(i // 100, i))
+    instance.output_panel.set_content("\n".join(
+        "line {0} {1}".format(i, " ".join(WORDS[:8])) for i in range(5000)))
+    instance._create_main_view()
+
+    results = []
+    for tab, name in ((instance.TAB_OPTIONS, "Options"), (instance.TAB_FILES, "Files"),
+                      (instance.TAB_OUTPUT, "Output")):
+        render = Result("session", "render {0} tab ({1} files)".format(name, count), "renders")
+        for _ in range(20):
+            render.measure(lambda: instance.go_to_tab(tab), 1)
+        results.append(render)
+    return results
+
+
+def bench_append(package, workdir, scale):
+    chunks = int(10000 * scale)
+    path = os.path.join(workdir, ".aider.chat.history.md")
+    open(path, 'w').close()
+
+    window, instance = new_instance(package, workdir)
+    instance._create_main_view()
+    instance.start_file_watcher()
+    instance.current_tab = instance.TAB_OUTPUT
+    sublime_stub.clear_timeouts()
+    watcher = instance.file_watcher
+
+    rng = random.Random(3)
+    poll = Result("append", "append + _poll ({0} chunks)".format(chunks), "chunks")
+    written = 0
+    with open(path, 'a') as f:
+        for i in range(chunks):
+            if i % 200 == 0:
+                chunk = "\n#### {0}\n\n".format(" ".join(rng.choice(WORDS) for _ in range(8)))
+            else:
+                chunk = " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 12))) + "\n"
+            f.write(chunk)
+            f.flush()
+            written += len(chunk)
+            poll.measure(watcher._poll, 1)
+            sublime_stub.clear_timeouts()
+    watcher.stop()
+    return [poll]
+
+
+def bench_startup(package, workdir, scale):
+    path = os.path.join(workdir, ".aider.chat.history.md")
+    write_history(path, int(20 * 1024 * 1024 * scale))
+    dashboard = sys.modules[package.__package__ + ".commands.dashboard"]
+
+    first_paint = Result("startup", "open dashboard: time to first paint")
+    bootstrap = Result("startup", "open dashboard: background detection + sync")
+    for _ in range(10):
+        window = sublime_stub.Window([workdir])
+        sublime_stub.clear_timeouts()
+        first_paint.measure(dashboard.AiderSavvyCommand(window).run)
+        # Runs the async detection, then the main thread completion
+        bootstrap.measure(lambda: sublime_stub.run_timeouts(limit=10))
+        window.aider_savvy.close_all()
+        sublime_stub.clear_timeouts()
+    return [first_paint, bootstrap]
+
+
+def bench_input(package, workdir, scale):
+    count = int(50000 * scale)
+    path = os.path.join(workdir, ".aider.input.history")
+    cache_dir = os.path.join(workdir, "cache")
+    rng = random.Random(4)
+    with open(path, 'w') as f:
+        for i in range(count):
+            f.write("\n# 2024-01-01 10:00:00.{0:06d}\n".format(i))
+            for _ in range(rng.choice((1, 1, 1, 4))):
+                f.write("+{0}\n".format(" ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 16)))))
+    megabytes = os.path.getsize(path) / (1024.0 * 1024.0)
+    module = sys.modules[package.__package__ + ".core.input_history"]
+
+    results = []
+    parse = Result("input", "parse input history ({0} prompts)".format(count), "MB")
+    for _ in range(3):
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        index = module.InputHistoryIndex(cache_dir)
+        parse.measure(lambda: index.update(path), megabytes)
+    results.append(parse)
+
+    reload_ = Result("input", "reload from cache")
+    for _ in range(5):
+        cached = module.InputHistoryIndex(cache_dir)
+        reload_.measure(lambda: cached.update(path))
+    results.append(reload_)
+
+    append = Result("input", "update after one appended prompt", "prompts")
+    for i in range(50):
+        with open(path, 'a') as f:
+            f.write("\n# 2024-02-01 10:00:00.{0:06d}\n+{1}\n".format(i, rng.choice(WORDS)))
+        append.measure(lambda: cached.update(path), 1)
+    results.append(append)
+
+    recall = Result("input", "recall ranking (fuzzy query)", "queries")
+    for _ in range(20):
+        query = "{0} {1}".format(rng.choice(WORDS)[:3], rng.choice(WORDS)[:3])
+        recall.measure(lambda: cached.rank(query), 1)
+    results.append(recall)
+    return results
+
+
+def bench_git(package, workdir, scale):
+    count = max(int(100000 * scale), 1)
+    root = os.path.join(workdir, "repo")
+    for i in range(count):
+        directory = os.path.join(root, "d{0}".format(i // 200))
+        if i % 200 == 0:
+            os.makedirs(directory)
+        with open(os.path.join(directory, "f{0}.py".format(i % 200)), 'w') as f:
+            f.write("x = {0}\n".format(i))
+    git = ["git", "-c", "user.name=bench", "-c", "user.email=bench@example.com"]
+    try:
+        for command in (["init", "-q"], ["add", "-A"], ["commit", "-q", "-m", "init"]):
+            subprocess.check_call(git + command, cwd=root)
+    except (OSError, subprocess.CalledProcessError) as e:
+        print("  git unavailable, skipping: {0}".format(e))
+        return []
+    # A few changes of each kind, spread over the files that exist at this scale
+    touched = ["d{0}/f{1}.py".format(i // 200, i % 200) for i in range(0, count, max(count // 5, 1))]
+    for path in touched:
+        with open(os.path.join(root, path), 'a') as f:
+            f.write("y = 1\n")
+    with open(os.path.join(root, "d0", "new.py"), 'w') as f:
+        f.write("z = 1\n")
+    subprocess.check_call(git + ["add", touched[-1]], cwd=root)
+    module = sys.modules[package.__package__ + ".core.git_status"]
+
+    results = []
+    porcelain = Result("git", "git status --porcelain=v2 ({0} files)".format(count))
+    for _ in range(5):
+        porcelain.measure(lambda: module.git_status(root))
+    results.append(porcelain)
+
+    # The fallback for machines without git, slower than git status
+    index = Result("git", ".git/index read + stat (fallback without git)")
+    for _ in range(5):
+        index.measure(lambda: module.index_changes(root))
+    results.append(index)
+
+    cache = module.GitStatusCache()
+    cache.refresh(root)
+    cached = Result("git", "cached status after a background refresh", "lookups")
+    for _ in range(50):
+        cached.measure(lambda: cache.fresh(root) and cache.changes, 1)
+    results.append(cached)
+    return results
+
+
+SCENARIOS = [
+    ("history", bench_history),
+    ("tree", bench_tree),
+    ("session", bench_session),
+    ("append", bench_append),
+    ("startup", bench_startup),
+    ("input", bench_input),
+    ("git", bench_git),
+]
+
+
+def format_result(result):
+    data = result.to_dict()
+    throughput = ""
+    if data['throughput'] is not None:
+        throughput = "{0:,.1f} {1}/s".format(data['throughput'], data['unit'])
+    return "  {0:<52} {1:>5} {2:>10.2f} {3:>10.2f} {4:>10.2f}  {5}".format(
+        data['name'], data['runs'], data['p50_ms'], data['p95_ms'], data['max_ms'], throughput)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("scenarios", nargs="*", help="scenarios to run (default: all)")
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="scale data set sizes (default 1.0)")
+    parser.add_argument("--json", help="also write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    package = sublime_stub.load_package()
+    selected = [s for s in SCENARIOS if not args.scenarios or s[0] in args.scenarios]
+
+    all_results = []
+    print("  {0:<52} {1:>5} {2:>10} {3:>10} {4:>10}  {5}".format(
+        "Operation", "runs", "p50 ms", "p95 ms", "max ms", "throughput"))
+    print("  " + "-" * 110)
+    for name, scenario in selected:
+        workdir = tempfile.mkdtemp(prefix="aider-savvy-bench-{0}-".format(name))
+        try:
+            for result in scenario(package, workdir, args.scale):
+                all_results.append(result)
+                print(format_result(result))
+                sys.stdout.flush()
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump([r.to_dict() for r in all_results], f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,361 @@
+"""Minimal `sublime` / `sublime_plugin` stand-ins to run AiderSavvy headlessly.
+
+Only what the plugin touches is implemented: windows and views holding
+plain text, settings, and set_timeout callbacks collected in a queue that
+the caller drains with run_timeouts(). Nothing is drawn.
+
+Usage:
+    import sublime_stub
+    sublime_stub.install()
+    AiderSavvy = sublime_stub.load_package()   # imports the package
+    window = sublime_stub.Window(["/path/to/project"])
+"""
+import importlib
+import os
+import sys
+import tempfile
+import types
+
+PACKAGE_NAME = "AiderSavvy"
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_timeouts = []
+_settings = {}
+_windows = []
+_cache_dir = [None]
+
+
+class Settings(object):
+    """sublime.Settings backed by a dict."""
+
+    def __init__(self, values=None):
+        self.values = dict(values or {})
+        self.callbacks = {}
+
+    def get(self, key, default=None):
+        return self.values.get(key, default)
+
+    def set(self, key, value):
+        self.values[key] = value
+        for callback in list(self.callbacks.values()):
+            callback()
+
+    def has(self, key):
+        return key in self.values
+
+    def erase(self, key):
+        self.values.pop(key, None)
+
+    def add_on_change(self, tag, callback):
+        self.callbacks[tag] = callback
+
+    def clear_on_change(self, tag):
+        self.callbacks.pop(tag, None)
+
+
+class Region(object):
+    def __init__(self, a, b=None):
+        self.a = a
+        self.b = a if b is None else b
+
+    def begin(self):
+        return min(self.a, self.b)
+
+    def end(self):
+        return max(self.a, self.b)
+
+
+class Selection(list):
+    def clear(self):
+        del self[:]
+
+    def add(self, region):
+        self.append(region)
+
+
+class View(object):
+    """A text buffer with the view API the plugin uses."""
+
+    _next_id = 1
+
+    def __init__(self, window=None, file_name=None):
+        self._id = View._next_id
+        View._next_id += 1
+        self._window = window
+        self._file_name = file_name
+        self._settings = Settings()
+        self._sel = Selection()
+        self._status = {}
+        self.text = ""
+        self.name_ = ""
+        self.read_only = False
+        self.valid = True
+
+    def id(self):
+        return self._id
+
+    def window(self):
+        return self._window
+
+    def file_name(self):
+        return self._file_name
+
+    def settings(self):
+        return self._settings
+
+    def set_name(self, name):
+        self.name_ = name
+
+    def name(self):
+        return self.name_
+
+    def set_scratch(self, scratch):
+        pass
+
+    def set_read_only(self, read_only):
+        self.read_only = read_only
+
+    def is_valid(self):
+        return self.valid
+
+    def assign_syntax(self, syntax):
+        pass
+
+    def sel(self):
+        return self._sel
+
+    def show(self, *args, **kwargs):
+        pass
+
+    def size(self):
+        return len(self.text)
+
+    def substr(self, region):
+        if isinstance(region, int):
+            return self.text[region:region + 1]
+        return self.text[region.begin():region.end()]
+
+    def word(self, point):
+        if isinstance(point, Region):
+            point = point.begin()
+        start = end = point
+        while start > 0 and (self.text[start - 1].isalnum() or self.text[start - 1] == '_'):
+            start -= 1
+        while end < len(self.text) and (self.text[end].isalnum() or self.text[end] == '_'):
+            end += 1
+        return Region(start, end)
+
+    def rowcol(self, point):
+        row = self.text.count("\n", 0, point)
+        return (row, point - (self.text.rfind("\n", 0, point) + 1))
+
+    def set_status(self, key, value):
+        self._status[key] = value
+
+    def erase_status(self, key):
+        self._status.pop(key, None)
+
+    def close(self):
+        self.valid = False
+        if self._window and self in self._window._views:
+            self._window._views.remove(self)
+
+    def run_command(self, cmd, args=None):
+        args = args or {}
+        if cmd == "append":
+            self.text += args.get("characters", "")
+        elif cmd == "select_all":
+            self._sel.clear()
+            self._sel.add(Region(0, len(self.text)))
+        elif cmd == "right_delete":
+            if self._sel and self._sel[0].end() - self._sel[0].begin() == len(self.text):
+                self.text = ""
+        elif cmd == "insert":
+            self.text += args.get("characters", "")
+
+
+class Window(object):
+    """A window with folders, views and output panels."""
+
+    def __init__(self, folders=None):
+        self._folders = list(folders or [])
+        self._views = []
+        self._panels = {}
+        self._active_panel = None
+        self.commands = []  # (command, args) of every window command run
+        self.quick_panel = None  # (items, on_done) of the last quick panel
+        self.input_panel = None  # (caption, initial, on_done) of the last input panel
+        _windows.append(self)
+
+    def id(self):
+        return id(self)
+
+    def folders(self):
+        return self._folders
+
+    def views(self):
+        return list(self._views)
+
+    def active_view(self):
+        return self._views[-1] if self._views else None
+
+    def new_file(self, *args, **kwargs):
+        view = View(self)
+        self._views.append(view)
+        return view
+
+    def open_file(self, path, flags=0, *args, **kwargs):
+        view = View(self, path.split(":")[0])
+        self._views.append(view)
+        return view
+
+    def focus_view(self, view):
+        if view in self._views:
+            self._views.remove(view)
+            self._views.append(view)
+
+    def set_layout(self, layout):
+        pass
+
+    def set_view_index(self, view, group, index):
+        pass
+
+    def active_panel(self):
+        return self._active_panel
+
+    def find_output_panel(self, name):
+        return self._panels.get(name)
+
+    def create_output_panel(self, name, *args, **kwargs):
+        view = self._panels.setdefault(name, View(self))
+        return view
+
+    def show_quick_panel(self, items, on_done, *args, **kwargs):
+        self.quick_panel = (items, on_done)
+
+    def show_input_panel(self, caption, initial, on_done, on_change, on_cancel):
+        self.input_panel = (caption, initial, on_done)
+
+    def status_message(self, message):
+        status_message(message)
+
+    def run_command(self, cmd, args=None):
+        args = args or {}
+        self.commands.append((cmd, args))
+        if cmd == "terminus_open":
+            panel = View(self)
+            panel.settings().set("terminus_view.tag", args.get("tag"))
+            self._panels[args.get("panel_name", "Terminus")] = panel
+        elif cmd == "terminus_close":
+            for name, view in list(self._panels.items()):
+                if view.settings().get("terminus_view.tag") == args.get("tag"):
+                    del self._panels[name]
+        elif cmd == "show_panel":
+            self._active_panel = args.get("panel")
+        elif cmd == "hide_panel":
+            self._active_panel = None
+
+
+# sublime module functions
+
+def set_timeout(callback, delay=0):
+    _timeouts.append(callback)
+
+
+def set_timeout_async(callback, delay=0):
+    _timeouts.append(callback)
+
+
+def run_timeouts(limit=10000):
+    """Run queued set_timeout callbacks (including ones they queue)."""
+    ran = 0
+    while _timeouts and ran < limit:
+        _timeouts.pop(0)()
+        ran += 1
+    return ran
+
+
+def clear_timeouts():
+    del _timeouts[:]
+
+
+def load_settings(name):
+    if name not in _settings:
+        _settings[name] = Settings()
+    return _settings[name]
+
+
+def cache_path():
+    if _cache_dir[0] is None:
+        _cache_dir[0] = tempfile.mkdtemp(prefix="aider-savvy-cache-")
+    return _cache_dir[0]
+
+
+def status_message(message):
+    pass
+
+
+def error_message(message):
+    print("sublime.error_message: {0}".format(message))
+
+
+def message_dialog(message):
+    pass
+
+
+def ok_cancel_dialog(message, ok_title=""):
+    return True
+
+
+def windows():
+    return list(_windows)
+
+
+def active_window():
+    return _windows[-1] if _windows else None
+
+
+def install():
+    """Register the stub modules as `sublime` and `sublime_plugin`."""
+    if "sublime" in sys.modules and getattr(sys.modules["sublime"], "IS_STUB", False):
+        return
+
+    sublime = types.ModuleType("sublime")
+    sublime.IS_STUB = True
+    sublime.OP_EQUAL = 0
+    sublime.OP_NOT_EQUAL = 1
+    sublime.ENCODED_POSITION = 1
+    sublime.TRANSIENT = 4
+    sublime.Region = Region
+    sublime.Settings = Settings
+    sublime.View = View
+    sublime.Window = Window
+    for func in (set_timeout, set_timeout_async, load_settings, cache_path,
+                 status_message, error_message, message_dialog, ok_cancel_dialog,
+                 windows, active_window):
+        setattr(sublime, func.__name__, func)
+
+    sublime_plugin = types.ModuleType("sublime_plugin")
+
+    class _Command(object):
+        def __init__(self, target=None):
+            self.window = target
+            self.view = target
+
+    for name in ("WindowCommand", "TextCommand", "ApplicationCommand"):
+        setattr(sublime_plugin, name, type(name, (_Command,), {}))
+    for name in ("EventListener", "ViewEventListener"):
+        setattr(sublime_plugin, name, type(name, (object,), {}))
+
+    sys.modules["sublime"] = sublime
+    sys.modules["sublime_plugin"] = sublime_plugin
+
+
+def load_package(package_dir=PACKAGE_DIR):
+    """Import the plugin as the `AiderSavvy` package and return its entry module."""
+    install()
+    if PACKAGE_NAME not in sys.modules:
+        package = types.ModuleType(PACKAGE_NAME)
+        package.__path__ = [package_dir]
+        sys.modules[PACKAGE_NAME] = package
+    return importlib.import_module(PACKAGE_NAME + ".AiderSavvy")
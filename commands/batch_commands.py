@@ -0,0 +1,111 @@
+# AiderSavvy - Headless batch job commands
+import sublime
+import sublime_plugin
+import json
+
+from .dashboard import get_aider_instance
+from ..core.batch_runner import AiderBatchRunner, AiderBatchJob
+from ..core.settings import get_setting
+
+
+def start_batch(window, jobs):
+    """Start a batch runner for jobs and show its progress in the Batch tab."""
+    instance = get_aider_instance(window)
+
+    runner = instance.batch_panel.runner
+    if runner and runner.is_running():
+        sublime.status_message("Aider: A batch is already running, cancel it with [X]")
+        return
+
+    # Worker threads report progress, render on the main thread
+    def on_progress(runner):
+        sublime.set_timeout(instance.refresh_batch, 0)
+
+    runner = AiderBatchRunner(
+        instance.context,
+        jobs,
+        concurrency=get_setting("batch_concurrency", 2),
+        executable=get_setting("aider_executable", "aider"),
+        progress_callback=on_progress
+    )
+    instance.batch_panel.context = instance.context
+    instance.batch_panel.runner = runner
+    runner.start()
+
+    instance.go_to_tab(instance.TAB_BATCH)
+    sublime.status_message("Aider: Started {0} batch jobs".format(len(jobs)))
+
+
+class AiderSavvyBatchPromptCommand(sublime_plugin.WindowCommand):
+    """Run one prompt headlessly on each editable file, one job per file."""
+
+    def run(self):
+        instance = get_aider_instance(self.window)
+        if not instance.context.files:
+            sublime.status_message("Add editable files first, one batch job runs per file")
+            return
+
+        self.window.show_input_panel(
+            "Batch prompt for {0} files:".format(len(instance.context.files)),
+            "",
+            self.on_done,
+            None,
+            None
+        )
+
+    def on_done(self, text):
+        if not text.strip():
+            return
+
+        instance = get_aider_instance(self.window)
+        snapshot = instance.context.snapshot
+        jobs = [AiderBatchJob(i, text, [f], snapshot.readonly_files)
+                for i, f in enumerate(snapshot.files, 1)]
+        start_batch(self.window, jobs)
+
+
+class AiderSavvyRunBatchFileCommand(sublime_plugin.WindowCommand):
+    """Run the batch jobs described in the active view.
+
+    One JSON object per line: {"prompt": "...", "files": [...], "read": [...]}"""
+
+    def run(self):
+        view = self.window.active_view()
+        if not view:
+            return
+
+        jobs = []
+        text = view.substr(sublime.Region(0, view.size()))
+        for line_number, line in enumerate(text.split('\n'), 1):
+            line = line.strip()
+            if not line or line.startswith('//'):
+                continue
+            try:
+                spec = json.loads(line)
+                jobs.append(AiderBatchJob(
+                    len(jobs) + 1,
+                    spec['prompt'],
+                    spec.get('files', []),
+                    spec.get('read', [])
+                ))
+            except (ValueError, KeyError, TypeError) as e:
+                sublime.error_message("Invalid batch job on line {0}: {1}".format(line_number, e))
+                return
+
+        if not jobs:
+            sublime.status_message("No batch jobs found in view")
+            return
+        start_batch(self.window, jobs)
+
+
+class AiderSavvyCancelBatchCommand(sublime_plugin.WindowCommand):
+    """Cancel the running batch."""
+
+    def run(self):
+        instance = get_aider_instance(self.window)
+        runner = instance.batch_panel.runner
+        if runner and runner.is_running():
+            runner.cancel()
+            sublime.status_message("Aider: Batch cancelled")
+        else:
+            sublime.status_message("Aider: No batch running")
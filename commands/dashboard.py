@@ -2,13 +2,24 @@
 import sublime
 import sublime_plugin
 import os
+import time
 
 from ..core.context import AiderContext
+from ..core.events import (OutputChunk, HistoryReplaced, SessionStarted, StateSynced,
+                           ModelChanged, ModeChanged, FileDropped, ReadOnlyAdded,
+                           TokensEstimated, HealthChanged, OPTION_EVENTS, FILE_EVENTS)
 from ..core.terminal import AiderTerminal
 from ..core.file_watcher import AiderFileWatcher
+from ..core.scheduler import AiderSessionScheduler
+from ..core.profiling import profiler, profiled
+from ..core.settings import get_setting
+from ..core.warm_pool import AiderWarmPool
+from ..core.watchdog import AiderWatchdog, STALLED, EXITED
 from ..views.options_panel import OptionsPanel
 from ..views.output_panel import OutputPanel
 from ..views.files_panel import FilesPanel
+from ..views.batch_panel import BatchPanel
+from ..views.metrics_panel import MetricsPanel
 
 
 def get_aider_instance(window):
@@ -18,6 +29,44 @@ def get_aider_instance(window):
     return window.aider_savvy
 
 
+class AiderSession:
+    """One aider session: context, terminal, watcher and Files/Output state."""
+
+    def __init__(self, window, number, project_root=None):
+        self.window = window
+        self.number = number
+
+        # The first session keeps aider's defaults, later ones get their own
+        # Terminus tag and history file so they can run side by side
+        if number == 1:
+            history_file, tag, panel_name = None, None, None
+        else:
+            history_file = ".aider.chat.history.{0}.md".format(number)
+            tag = "aider_savvy_{0}".format(number)
+            panel_name = "Aider {0}".format(number)
+
+        self.context = AiderContext(window, project_root, history_file)
+        self.terminal = AiderTerminal(window, self.context, tag, panel_name)
+        self.file_watcher = None
+        self.watchdog = AiderWatchdog(self.context, self.terminal)
+        self.switch_from_model = None
+        # Environment detection and history sync ran (see bootstrap_session)
+        self.ready = False
+        self.bootstrapping = False
+
+        # Views (they share the same view, just different content)
+        self.options_panel = OptionsPanel(window, self.context, self.terminal, self.watchdog)
+        self.output_panel = OutputPanel(window, self.context)
+        self.files_panel = FilesPanel(window, self.context)
+        self.metrics_panel = MetricsPanel(window, self.context)
+
+    @property
+    def name(self):
+        """Short display name for the session switcher."""
+        return "{0}: {1}".format(
+            self.number, os.path.basename(self.context.project_root) or self.context.project_root)
+
+
 class AiderSavvyInstance:
     """Main instance managing all Aider components for a window."""
 
@@ -25,25 +74,63 @@ class AiderSavvyInstance:
     TAB_OPTIONS = 0
     TAB_FILES = 1
     TAB_OUTPUT = 2
+    TAB_BATCH = 3
+    TAB_METRICS = 4
+
+    TAB_NAMES = ["Options", "Files", "Output", "Batch", "Metrics"]
+
+    # Time to wait for aider to confirm a live model/mode switch
+    LIVE_SWITCH_TIMEOUT = 15000  # milliseconds
 
     def __init__(self, window):
         self.window = window
-        self.context = AiderContext(window)
-        self.terminal = AiderTerminal(window, self.context)
-        self.file_watcher = None
+        self.warm_pool = AiderWarmPool(window)
+        self.scheduler = AiderSessionScheduler(get_setting("max_streaming_sessions", 2))
+        self.sessions = [AiderSession(window, 1)]
+        self.session = self.sessions[0]
+        self._subscribe(self.session)
         self.current_tab = self.TAB_OPTIONS
         self.main_view = None
 
-        # Views (they share the same view, just different content)
-        self.options_panel = OptionsPanel(window, self.context)
-        self.output_panel = OutputPanel(window, self.context)
-        self.files_panel = FilesPanel(window, self.context)
+        # Batch jobs are window-wide, they run outside any terminal session
+        self.batch_panel = BatchPanel(window, self.session.context)
+
+    # The active session's components, used by all commands
+    @property
+    def context(self):
+        return self.session.context
+
+    @property
+    def terminal(self):
+        return self.session.terminal
+
+    @property
+    def file_watcher(self):
+        return self.session.file_watcher
+
+    @property
+    def options_panel(self):
+        return self.session.options_panel
+
+    @property
+    def output_panel(self):
+        return self.session.output_panel
+
+    @property
+    def files_panel(self):
+        return self.session.files_panel
+
+    @property
+    def metrics_panel(self):
+        return self.session.metrics_panel
+
+    def setup_layout(self, started=None):
+        """Setup the layout: main view on top, terminal in panel below.
+
+        The dashboard is painted first; context detection and the history
+        sync run in the background and fill it in when they finish."""
+        started = started or time.perf_counter()
 
-    def setup_layout(self):
-        """Setup the layout: main view on top, terminal in panel below."""
-        # Sync from existing Aider session
-        self.context.sync_from_existing_session()
-        
         # Simple single-group layout (terminal will be in output panel)
         self.window.set_layout({
             "cols": [0.0, 1.0],
@@ -57,8 +144,97 @@ class AiderSavvyInstance:
         # Initial render
         self.render_current_tab()
 
-        # Start file watcher
-        self.start_file_watcher()
+        elapsed = (time.perf_counter() - started) * 1000
+        profiler.record("dashboard.first_paint", elapsed)
+        sublime.status_message("Aider: Dashboard opened in {0:.0f} ms".format(elapsed))
+
+        self.bootstrap_session(self.session, started)
+
+    def bootstrap_session(self, session, started=None):
+        """Detect the environment and sync the history without blocking the UI."""
+        started = started or time.perf_counter()
+        session.ready = False
+        session.bootstrapping = True
+        if session.file_watcher:
+            # Reopened: the sync below must not race the watcher on the index
+            session.file_watcher.stop()
+            session.file_watcher = None
+
+        def detect():
+            try:
+                if not session.context.detected:
+                    session.context.detect_environment()
+                    sublime.set_timeout(self.refresh_options, 0)
+                # Sync from existing Aider session
+                session.context.sync_from_existing_session()
+            except Exception as e:
+                print("AiderSavvy: Session bootstrap failed: {0}".format(e))
+            sublime.set_timeout(on_ready, 0)
+
+        def on_ready():
+            session.ready = True
+            session.bootstrapping = False
+            if session not in self.sessions:
+                return
+            # Started only now so it does not index the history concurrently
+            self.start_file_watcher(session)
+            self._warm_standby(session)
+            # Keep the session on screen the most recently used one
+            self.scheduler.activate(self.session)
+            self.render_current_tab()
+            profiler.record("dashboard.bootstrap", (time.perf_counter() - started) * 1000)
+
+        sublime.set_timeout_async(detect, 0)
+
+    def _warm_standby(self, session):
+        """Pre-launch an idle aider so "Start Terminal" does not cold-start."""
+        if not get_setting("warm_standby", False):
+            return
+        session.terminal.warm_pool = self.warm_pool
+        if not session.terminal.is_running():
+            self.warm_pool.warm(
+                session.context.get_aider_history_path(),
+                session.context.project_root,
+                session.terminal.build_standby_command(),
+                session.context.model
+            )
+
+    def new_session(self, project_root=None):
+        """Open another session and make it the active one."""
+        number = max(s.number for s in self.sessions) + 1
+        session = AiderSession(self.window, number, project_root)
+        self._subscribe(session)
+        self.sessions.append(session)
+        self.switch_session(session)
+        self.bootstrap_session(session)
+        return session
+
+    def switch_session(self, session):
+        """Make session the active one and let it stream."""
+        self.session = session
+        if not session.ready:
+            # bootstrap_session starts its watcher once the sync is done
+            self.render_current_tab()
+            return
+        if not session.file_watcher:
+            self.start_file_watcher(session)
+        self.scheduler.activate(session)
+        self.render_current_tab()
+
+    def close_session(self, session):
+        """Stop and forget a session; the last session cannot be closed."""
+        if len(self.sessions) < 2:
+            return False
+        if session.file_watcher:
+            session.file_watcher.stop()
+        session.terminal.close()
+        self.scheduler.remove(session)
+        self.sessions.remove(session)
+        if session is self.session:
+            self.switch_session(self.sessions[0])
+        else:
+            self.render_current_tab()
+        return True
 
     def _create_main_view(self):
         """Create or get the main view."""
@@ -91,28 +267,30 @@ class AiderSavvyInstance:
 
     def next_tab(self):
         """Switch to next tab."""
-        self.current_tab = (self.current_tab + 1) % 3
+        self.current_tab = (self.current_tab + 1) % len(self.TAB_NAMES)
         self.render_current_tab()
 
     def prev_tab(self):
         """Switch to previous tab."""
-        self.current_tab = (self.current_tab - 1) % 3
+        self.current_tab = (self.current_tab - 1) % len(self.TAB_NAMES)
         self.render_current_tab()
 
     def go_to_tab(self, tab_index):
         """Go to specific tab."""
-        if 0 <= tab_index <= 2:
+        if 0 <= tab_index < len(self.TAB_NAMES):
             self.current_tab = tab_index
             self.render_current_tab()
 
-    def render_current_tab(self):
-        """Render the current tab content."""
+    @profiled("dashboard.render_current_tab")
+    def render_current_tab(self, scan=True):
+        """Render the current tab content.
+
+        scan=False keeps the Files tab's available files unless they are stale."""
         if not self.main_view or not self.main_view.is_valid():
             self._create_main_view()
 
         # Update view name based on tab
-        tab_names = ["AIDER: Options", "AIDER: Files", "AIDER: Output"]
-        self.main_view.set_name(tab_names[self.current_tab])
+        self.main_view.set_name("AIDER: {0}".format(self.TAB_NAMES[self.current_tab]))
 
         # Build content with tab header
         content = self._build_tab_header()
@@ -120,16 +298,22 @@ class AiderSavvyInstance:
         if self.current_tab == self.TAB_OPTIONS:
             content += self.options_panel.get_content()
         elif self.current_tab == self.TAB_FILES:
-            self.files_panel.scan_project_files()
+            if scan or self.files_panel.stale:
+                self.files_panel.scan_project_files()
             content += self.files_panel.get_content()
         elif self.current_tab == self.TAB_OUTPUT:
             content += self.output_panel.get_content()
+        elif self.current_tab == self.TAB_BATCH:
+            content += self.batch_panel.get_content()
+        elif self.current_tab == self.TAB_METRICS:
+            content += self.metrics_panel.get_content()
 
+        profiler.count("dashboard.rendered_chars", len(content))
         self._update_view_content(content)
 
     def _build_tab_header(self):
         """Build the tab navigation header."""
-        tabs = ["[1] Options", "[2] Files", "[3] Output"]
+        tabs = ["[{0}] {1}".format(i + 1, name) for i, name in enumerate(self.TAB_NAMES)]
         indicators = []
 
         for i, tab in enumerate(tabs):
@@ -141,8 +325,21 @@ class AiderSavvyInstance:
         header = "  ".join(indicators)
         separator = "=" * 50
 
+        if len(self.sessions) > 1:
+            header += "\n" + self._build_session_switcher()
+
         return "{0}\n{1}\n{2}\n\n".format(separator, header, separator)
 
+    def _build_session_switcher(self):
+        """Build the session switcher line shown with several sessions."""
+        entries = []
+        for session in self.sessions:
+            marker = ">>" if session is self.session else "  "
+            state = "" if self.scheduler.is_streaming(session) else " (parked)"
+            entries.append("{0} [{1}]{2}".format(marker, session.name, state))
+        return "Sessions: {0}   [n] New  [w] Switch  [W] Close".format("  ".join(entries))
+
+    @profiled("dashboard._update_view_content")
     def _update_view_content(self, content):
         """Update the main view content."""
         self.main_view.set_read_only(False)
@@ -154,33 +351,192 @@ class AiderSavvyInstance:
         # Move cursor to top
         self.main_view.show(0)
 
-    def start_file_watcher(self):
-        """Start watching Aider history file for changes."""
-        if self.file_watcher:
-            self.file_watcher.stop()
-
-        self.file_watcher = AiderFileWatcher(
-            self.context,
-            self.on_new_output,
-            self.on_session_change
-        )
-        self.file_watcher.start()
+    @profiled("dashboard._append_view_content")
+    def _append_view_content(self, text):
+        """Append text at the end of the main view, leaving the rest as is."""
+        self.main_view.set_read_only(False)
+        self.main_view.run_command("append", {"characters": text, "force": True, "scroll_to_end": True})
+        self.main_view.set_read_only(True)
+        profiler.count("dashboard.rendered_chars", len(text))
 
-    def on_new_output(self, new_content):
-        """Callback when new output is detected."""
-        self.output_panel.append_content(new_content)
-        # If on output tab, refresh
+    def start_file_watcher(self, session=None):
+        """Start watching Aider history file for changes."""
+        session = session or self.session
+        if session.file_watcher:
+            session.file_watcher.stop()
+
+        session.file_watcher = AiderFileWatcher(session.context, session.watchdog)
+        session.file_watcher.start()
+        if session.output_panel.loaded_from is None and not len(session.output_panel.lines):
+            # Live output starts where the watcher does, older history loads on demand
+            session.output_panel.loaded_from = session.file_watcher.last_size
+        self.scheduler.activate(session)
+
+    def _subscribe(self, session):
+        """Re-render what the history events of a session change.
+
+        Subscribed after the session's panels, so they are up to date by then."""
+        events = session.context.events
+        events.subscribe((OutputChunk, HistoryReplaced),
+                         lambda batch: self.on_new_output(session, batch))
+        events.subscribe(OPTION_EVENTS + FILE_EVENTS + (SessionStarted, StateSynced),
+                         lambda batch: self.on_session_change(session, batch))
+        events.subscribe((TokensEstimated,), lambda batch: self.on_tokens_estimated(session))
+        events.subscribe((HealthChanged,), lambda batch: self.on_health_changed(session, batch[-1]))
+
+    def on_new_output(self, session, events):
+        """New output reached the session's Output panel."""
+        if session is not self.session:
+            return
         if self.current_tab == self.TAB_OUTPUT:
+            text = session.output_panel.take_unrendered()
+            if text is None or not self.main_view or not self.main_view.is_valid():
+                self.render_current_tab()
+            elif text:
+                # Only the new output goes to the view, not the whole tab
+                self._append_view_content(text)
+        elif self.current_tab == self.TAB_METRICS:
             self.render_current_tab()
 
-    def on_session_change(self, change_type):
-        """Callback when session state changes (model, mode, files)."""
-        if change_type == "OPTIONS":
-            sublime.status_message("Aider: Model/Mode updated from external session")
+    def on_session_change(self, session, events):
+        """Model, mode or files changed in the session's history."""
+        synced = any(isinstance(event, StateSynced) for event in events)
+        options_changed = synced or any(isinstance(event, OPTION_EVENTS) for event in events)
+        files_changed = synced or any(isinstance(event, FILE_EVENTS) for event in events)
+
+        confirmed = options_changed and self._confirm_live_change(session)
+        changes = [self._describe_event(event) for event in events]
+        changes = [change for change in changes if change]
+        if changes and not confirmed:
+            sublime.status_message("Aider: {0}".format(", ".join(changes)))
+        elif synced and not confirmed:
+            sublime.status_message("Aider: Session state synced from the history")
+
+        if session is not self.session:
+            return
+        if options_changed and self.current_tab == self.TAB_OPTIONS:
+            self.render_current_tab()
+        elif files_changed and self.current_tab == self.TAB_FILES:
+            # The Files panel followed the events, no need to scan again
+            self.render_current_tab(scan=False)
+
+    def on_tokens_estimated(self, session):
+        """Sampled token estimates replace the size-based ones in the Files tab."""
+        if session is self.session and self.current_tab == self.TAB_FILES:
+            self.render_current_tab(scan=False)
+
+    def on_health_changed(self, session, event):
+        """The watchdog found aider stalled, exited or back to normal."""
+        if event.state == STALLED:
+            if get_setting("restart_stalled_sessions", False):
+                session.terminal.restart()
+                sublime.status_message("Aider: Session {0} stalled, restarted with the same context".format(
+                    session.name))
+            else:
+                sublime.status_message("Aider: Session {0} stalled, {1} ([k] to restart)".format(
+                    session.name, session.watchdog.describe()))
+        elif event.state == EXITED:
+            sublime.status_message("Aider: Session {0} exited ([k] to restart)".format(session.name))
+        if session is self.session:
+            self.refresh_options()
+
+    def _describe_event(self, event):
+        """Short status bar description of a session change."""
+        if isinstance(event, SessionStarted):
+            return "new session started"
+        if isinstance(event, ModelChanged):
+            return "model {0}".format(event.model)
+        if isinstance(event, ModeChanged):
+            return "mode {0}".format(event.mode)
+        if isinstance(event, FileDropped):
+            return "dropped {0}".format(event.path)
+        if isinstance(event, ReadOnlyAdded):
+            return "added {0} (read-only)".format(event.path)
+        if isinstance(event, FILE_EVENTS):
+            return "added {0}".format(event.path)
+        return None
+
+    def change_model(self, model):
+        """Change the model, live through /model when the terminal runs."""
+        session = self.session
+        if model == session.context.model and not session.context.pending_model:
+            return
+        if not session.terminal.is_running():
+            session.context.set_model(model)
+            return
+        session.context.pending_model = model
+        session.switch_from_model = session.context.model
+        session.terminal.switch_model(model)
+        self._schedule_live_change_check(session, 'model', model)
+
+    def change_mode(self, mode):
+        """Change the chat mode, live through /chat-mode when the terminal runs."""
+        session = self.session
+        if mode == session.context.mode and not session.context.pending_mode:
+            return
+        if not session.terminal.is_running():
+            session.context.set_mode(mode)
+            return
+        session.context.pending_mode = mode
+        session.terminal.switch_mode(mode)
+        self._schedule_live_change_check(session, 'mode', mode)
+
+    def _schedule_live_change_check(self, session, kind, value):
+        """Fall back to a restart if aider does not confirm the change in time."""
+        sublime.set_timeout(
+            lambda: self._check_live_change(session, kind, value),
+            self.LIVE_SWITCH_TIMEOUT
+        )
+
+    def _confirm_live_change(self, session):
+        """Clear pending switches confirmed by the history.
+
+        Aider announces the new "Main model: ... with X edit format" line after
+        /model and /chat-mode, which the watcher has already parsed into the
+        context. Any new model announcement confirms a pending /model since
+        aider may resolve aliases to a longer name."""
+        ctx = session.context
+        confirmed = []
+        if ctx.pending_model and (ctx.model == ctx.pending_model or
+                                  ctx.model != session.switch_from_model):
+            confirmed.append("model {0}".format(ctx.model))
+            ctx.pending_model = None
+        if ctx.pending_mode and ctx.pending_mode == ctx.mode:
+            confirmed.append("mode {0}".format(ctx.mode))
+            ctx.pending_mode = None
+        if confirmed:
+            sublime.status_message("Aider: Switched {0} live".format(", ".join(confirmed)))
+            return True
+        return False
+
+    def _check_live_change(self, session, kind, value):
+        """Restart the terminal when a live switch was not confirmed."""
+        ctx = session.context
+        pending = ctx.pending_model if kind == 'model' else ctx.pending_mode
+        if pending != value:
+            return
+
+        if kind == 'model':
+            ctx.pending_model = None
+            ctx.set_model(value)
+        else:
+            ctx.pending_mode = None
+            ctx.set_mode(value)
+        self.refresh_options()
+
+        if not session.terminal.is_running():
+            return
+        if sublime.ok_cancel_dialog(
+                "Aider did not confirm the {0} change to {1}.\n"
+                "Restart the terminal to apply it?".format(kind, value),
+                "Restart"):
+            session.terminal.restart()
             self.refresh_options()
-        elif change_type == "FILES":
-            sublime.status_message("Aider: Files synced from external session")
-            self.refresh_files()
+
+    def refresh_batch(self):
+        """Refresh if on batch tab."""
+        if self.current_tab == self.TAB_BATCH:
+            self.render_current_tab()
 
     def refresh_all(self):
         """Refresh current view."""
@@ -191,6 +547,11 @@ class AiderSavvyInstance:
         if self.current_tab == self.TAB_OPTIONS:
             self.render_current_tab()
 
+    def refresh_output(self):
+        """Refresh if on output tab."""
+        if self.current_tab == self.TAB_OUTPUT:
+            self.render_current_tab()
+
     def refresh_files(self):
         """Refresh if on files tab."""
         if self.current_tab == self.TAB_FILES:
@@ -198,10 +559,13 @@ class AiderSavvyInstance:
 
     def close_all(self):
         """Close all Aider views and stop terminal."""
-        if self.file_watcher:
-            self.file_watcher.stop()
-
-        self.terminal.stop()
+        for session in self.sessions:
+            if session.file_watcher:
+                session.file_watcher.stop()
+            session.terminal.stop()
+        self.warm_pool.stop_all()
+        if self.batch_panel.runner:
+            self.batch_panel.runner.cancel()
 
         # Close main view
         if self.main_view and self.main_view.is_valid():
@@ -217,8 +581,10 @@ class AiderSavvyCommand(sublime_plugin.WindowCommand):
     """Main command to open the Aider dashboard."""
 
     def run(self):
+        # Time to first paint includes creating the instance
+        started = time.perf_counter()
         instance = get_aider_instance(self.window)
-        instance.setup_layout()
+        instance.setup_layout(started)
 
 
 class AiderSavvyRefreshCommand(sublime_plugin.WindowCommand):
@@ -260,3 +626,65 @@ class AiderSavvyGoToTabCommand(sublime_plugin.WindowCommand):
     def run(self, tab=0):
         if hasattr(self.window, 'aider_savvy'):
             self.window.aider_savvy.go_to_tab(tab)
+
+
+class AiderSavvyNewSessionCommand(sublime_plugin.WindowCommand):
+    """Open another Aider session on a project folder."""
+
+    def run(self):
+        self.folders = self.window.folders()
+        if len(self.folders) < 2:
+            self.on_done(0)
+            return
+        self.window.show_quick_panel(self.folders, self.on_done)
+
+    def on_done(self, index):
+        if index < 0:
+            return
+        instance = get_aider_instance(self.window)
+        project_root = self.folders[index] if self.folders else None
+        session = instance.new_session(project_root)
+        sublime.status_message("Aider: Opened session {0}".format(session.name))
+
+
+class AiderSavvySwitchSessionCommand(sublime_plugin.WindowCommand):
+    """Switch the dashboard to another Aider session."""
+
+    def run(self, number=None):
+        instance = get_aider_instance(self.window)
+        self.sessions = instance.sessions[:]
+
+        if number is not None:
+            for i, session in enumerate(self.sessions):
+                if session.number == number:
+                    self.on_done(i)
+                    break
+            return
+
+        items = []
+        for session in self.sessions:
+            status = "RUNNING" if session.context.is_running else "READY"
+            if session.watchdog.state in (STALLED, EXITED):
+                status = session.watchdog.state.upper()
+            if not instance.scheduler.is_streaming(session):
+                status += ", parked"
+            items.append("{0} [{1}] {2}".format(session.name, status, session.context.model))
+        self.window.show_quick_panel(items, self.on_done)
+
+    def on_done(self, index):
+        if index >= 0:
+            instance = get_aider_instance(self.window)
+            instance.switch_session(self.sessions[index])
+            sublime.status_message("Aider: Session {0}".format(self.sessions[index].name))
+
+
+class AiderSavvyCloseSessionCommand(sublime_plugin.WindowCommand):
+    """Close the active Aider session."""
+
+    def run(self):
+        instance = get_aider_instance(self.window)
+        name = instance.session.name
+        if instance.close_session(instance.session):
+            sublime.status_message("Aider: Closed session {0}".format(name))
+        else:
+            sublime.status_message("Aider: Cannot close the only session")
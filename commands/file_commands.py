@@ -4,12 +4,79 @@ import sublime_plugin
 import os
 
 from .dashboard import get_aider_instance
+from ..core.git_status import GitError
+from ..core.project_index import IGNORE_EXTENSIONS
+from ..core.settings import get_setting
+from ..core.token_budget import format_tokens
+
+
+def _token_items(context, files):
+    """Quick panel items: each file with its estimated token count.
+
+    Files not sampled yet show their size guess with a "?" and are sampled
+    in the background for the next time. Stats every file, so it runs off
+    the UI thread (see _show_token_panel)."""
+    root = context.project_root
+    estimator = context.token_estimator
+    items = []
+    unsampled = []
+    for path in files:
+        full_path = os.path.join(root, path)
+        tokens, sampled = estimator.estimate(full_path)
+        if sampled:
+            items.append([path, "~{0} tokens".format(format_tokens(tokens))])
+        else:
+            items.append([path, "~{0} tokens?".format(format_tokens(tokens))])
+            unsampled.append(full_path)
+    if unsampled:
+        estimator.refresh(unsampled)
+    return items
+
+
+def _show_token_panel(window, context, files, on_done, arrange=None):
+    """Show files with their token estimates in a quick panel, estimated in the background.
+
+    arrange(items) returns the items to show instead, e.g. with an "all files" choice."""
+    def estimate():
+        items = _token_items(context, files)
+        if arrange:
+            items = arrange(items)
+        sublime.set_timeout(lambda: window.show_quick_panel(items, on_done), 0)
+
+    sublime.set_timeout_async(estimate, 0)
+
+
+def _budget_warning(context, paths, adding=None):
+    """Warning text if adding paths takes the chat files over the token budget, else None."""
+    snapshot = context.snapshot
+    used = context.chat_tokens(snapshot)
+    if adding is None:
+        adding = context.estimate_tokens([p for p in paths if p not in snapshot.files], snapshot)
+    budget = context.token_budget(snapshot)
+    if used + adding <= budget:
+        return None
+    return ("This brings the chat files to ~{0} tokens, over the ~{1} token budget "
+            "for {2} (context window {3}). Every request resends them.").format(
+        format_tokens(used + adding), format_tokens(budget), snapshot.model,
+        format_tokens(context.context_window(snapshot)))
+
+
+def _confirm_budget(context, paths):
+    """Ask before an add that goes over the token budget; True to go ahead."""
+    warning = _budget_warning(context, paths)
+    if not warning:
+        return True
+    return sublime.ok_cancel_dialog("Add {0} to the chat?\n\n{1}".format(
+        paths[0] if len(paths) == 1 else "{0} files".format(len(paths)), warning), "Add Anyway")
 
 
 class AiderSavvyAddFileCommand(sublime_plugin.WindowCommand):
     """Add a file to the Aider chat via quick panel."""
 
     def run(self):
+        _with_project_index(self.window, self.pick)
+
+    def pick(self, index):
         instance = get_aider_instance(self.window)
         instance.files_panel.scan_project_files()
 
@@ -19,12 +86,14 @@ class AiderSavvyAddFileCommand(sublime_plugin.WindowCommand):
             return
 
         self.files = files
-        self.window.show_quick_panel(files, self.on_done)
+        _show_token_panel(self.window, instance.context, files, self.on_done)
 
     def on_done(self, index):
         if index >= 0:
             instance = get_aider_instance(self.window)
             filepath = self.files[index]
+            if not _confirm_budget(instance.context, [filepath]):
+                return
 
             if instance.context.add_file(filepath):
                 sublime.status_message("Added: {0}".format(filepath))
@@ -52,6 +121,9 @@ class AiderSavvyAddCurrentFileCommand(sublime_plugin.WindowCommand):
         if folders:
             filepath = os.path.relpath(filepath, folders[0])
 
+        if filepath not in instance.context.files and not _confirm_budget(instance.context, [filepath]):
+            return
+
         if instance.context.add_file(filepath):
             sublime.status_message("Added: {0}".format(filepath))
 
@@ -68,18 +140,18 @@ class AiderSavvyDropFileCommand(sublime_plugin.WindowCommand):
 
     def run(self):
         instance = get_aider_instance(self.window)
-        ctx = instance.context
+        snapshot = instance.context.snapshot
 
-        all_files = ctx.files + ctx.readonly_files
+        all_files = snapshot.files + snapshot.readonly_files
         if not all_files:
             sublime.status_message("No files to drop")
             return
 
         self.files = all_files
         display = []
-        for f in ctx.files:
+        for f in snapshot.files:
             display.append(f)
-        for f in ctx.readonly_files:
+        for f in snapshot.readonly_files:
             display.append("{0} [read-only]".format(f))
 
         self.window.show_quick_panel(display, self.on_done)
@@ -102,22 +174,27 @@ class AiderSavvyReadOnlyFileCommand(sublime_plugin.WindowCommand):
     """Add a file as read-only."""
 
     def run(self):
+        _with_project_index(self.window, self.pick)
+
+    def pick(self, index):
         instance = get_aider_instance(self.window)
         instance.files_panel.scan_project_files()
 
         # Include currently editable files too
-        files = instance.context.files + instance.files_panel.available_files
+        files = list(instance.context.files) + instance.files_panel.available_files
         if not files:
             sublime.status_message("No files available")
             return
 
         self.files = files
-        self.window.show_quick_panel(files, self.on_done)
+        _show_token_panel(self.window, instance.context, files, self.on_done)
 
     def on_done(self, index):
         if index >= 0:
             instance = get_aider_instance(self.window)
             filepath = self.files[index]
+            if not _confirm_budget(instance.context, [filepath]):
+                return
 
             if instance.context.add_readonly_file(filepath):
                 sublime.status_message("Added as read-only: {0}".format(filepath))
@@ -132,8 +209,359 @@ class AiderSavvyScanFilesCommand(sublime_plugin.WindowCommand):
     """Scan project for available files."""
 
     def run(self):
+        instance = get_aider_instance(self.window)
+        # Files may have been created or deleted outside Sublime
+        instance.context.project_index.invalidate()
+        instance.context.import_graph.invalidate()
+        instance.context.symbol_index.invalidate()
+        _with_project_index(self.window, self.on_indexed)
+
+    def on_indexed(self, index):
         instance = get_aider_instance(self.window)
         instance.files_panel.scan_project_files()
         instance.refresh_files()
         sublime.status_message("Found {0} files".format(
             len(instance.files_panel.available_files)))
+
+
+def _format_size(size):
+    """Human readable byte count."""
+    if size < 1024:
+        return "{0} B".format(size)
+    if size < 1024 * 1024:
+        return "{0:.1f} KB".format(size / 1024.0)
+    return "{0:.1f} MB".format(size / (1024.0 * 1024.0))
+
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+# Files listed in the bulk add confirmation dialog
+PREVIEW_FILES = 10
+
+
+def _with_project_index(window, callback):
+    """Call callback(index) once the project index is built for the current root."""
+    ctx = get_aider_instance(window).context
+    index = ctx.project_index
+    root = ctx.project_root
+    if index.is_built(root):
+        callback(index)
+        return
+
+    def built():
+        sublime.status_message("Aider: Indexed {0} project files".format(len(index.files)))
+        callback(index)
+
+    sublime.status_message("Aider: Indexing project files...")
+    index.build_later(root, built)
+
+
+def _confirm_and_add(window, index, paths, description):
+    """Ask for confirmation with count and size, then add paths in one batch.
+
+    Sizes come from the project file index, or from stat when it is None."""
+    instance = get_aider_instance(window)
+    chat_files = instance.context.snapshot.chat_files
+    paths = [path for path in paths if path not in chat_files]
+    if not paths:
+        sublime.status_message("Aider: No new files for {0}".format(description))
+        return
+
+    preview = ["  " + path for path in paths[:PREVIEW_FILES]]
+    if len(paths) > PREVIEW_FILES:
+        preview.append("  ... and {0} more".format(len(paths) - PREVIEW_FILES))
+    ctx = instance.context
+    tokens = ctx.estimate_tokens(paths)
+    if index:
+        size = index.total_size(paths)
+    else:
+        size = sum(_file_size(os.path.join(ctx.project_root, path)) for path in paths)
+    message = "Add {0} files ({1}, ~{2} tokens) for {3} to the chat?\n\n{4}".format(
+        len(paths), _format_size(size), format_tokens(tokens),
+        description, "\n".join(preview))
+    warning = _budget_warning(ctx, paths, tokens)
+    if warning:
+        message += "\n\nWARNING: " + warning
+    if not sublime.ok_cancel_dialog(message, "Add Anyway" if warning else "Add"):
+        return
+
+    added = instance.context.add_files(paths)
+    if instance.terminal.is_running():
+        instance.terminal.send_paths_command("add", added)
+    sublime.status_message("Added {0} files".format(len(added)))
+    instance.refresh_files()
+
+
+class AiderSavvyAddGlobCommand(sublime_plugin.WindowCommand):
+    """Add the project files matching a glob such as src/**/*.py."""
+
+    def run(self, pattern=None):
+        if pattern:
+            self.on_done(pattern)
+            return
+        self.window.show_input_panel("Add files matching (e.g. src/**/*.py):", "",
+                                     self.on_done, None, None)
+
+    def on_done(self, pattern):
+        pattern = pattern.strip()
+        if not pattern:
+            return
+
+        def resolve(index):
+            paths = index.match_glob(pattern)
+            if not paths:
+                sublime.status_message("No project files match {0}".format(pattern))
+                return
+            _confirm_and_add(self.window, index, paths, pattern)
+
+        _with_project_index(self.window, resolve)
+
+
+class AiderSavvyAddDirectoryCommand(sublime_plugin.WindowCommand):
+    """Add every project file under a directory (also from the side bar)."""
+
+    def run(self, dirs=None, paths=None):
+        selected = list(dirs or []) + list(paths or [])
+        if selected:
+            _with_project_index(self.window, lambda index: self.add_selected(index, selected))
+            return
+        _with_project_index(self.window, self.pick_directory)
+
+    def pick_directory(self, index):
+        self.directories = ["."] + index.directories()
+        self.window.show_quick_panel(self.directories, self.on_done)
+
+    def on_done(self, choice):
+        if choice < 0:
+            return
+        directory = self.directories[choice]
+        _with_project_index(self.window, lambda index: self.add_selected(
+            index, [os.path.join(index.root, directory)]))
+
+    def add_selected(self, index, selected):
+        """Resolve absolute side bar paths (directories or files) and add them."""
+        paths = []
+        for path in selected:
+            rel_path = os.path.relpath(path, index.root).replace(os.sep, "/")
+            if rel_path == ".." or rel_path.startswith("../"):
+                sublime.status_message("Not in the project root: {0}".format(path))
+                continue
+            if os.path.isdir(path):
+                paths.extend(index.in_directory(rel_path))
+            elif rel_path in index.files:
+                paths.append(rel_path)
+        if not paths:
+            sublime.status_message("No project files in the selection")
+            return
+
+        names = [os.path.basename(path.rstrip(os.sep)) or path for path in selected]
+        description = ", ".join(names[:3]) + (" and {0} more".format(len(names) - 3) if len(names) > 3 else "")
+        _confirm_and_add(self.window, index, sorted(set(paths)), description)
+
+
+class AiderSavvyAddRelatedFilesCommand(sublime_plugin.WindowCommand):
+    """Add the direct imports and importers of the chat files as read-only."""
+
+    def run(self):
+        _with_project_index(self.window, self.with_graph)
+
+    def with_graph(self, index):
+        """Build the import graph if needed, then offer the related files."""
+        ctx = get_aider_instance(self.window).context
+        graph = ctx.import_graph
+        if graph.is_built(index.root) and graph.built_at >= index.built_at:
+            self.pick(graph)
+            return
+
+        def build():
+            count = graph.build(index)
+            sublime.status_message("Aider: Linked the imports of {0} source files".format(count))
+            sublime.set_timeout(lambda: self.pick(graph), 0)
+
+        sublime.status_message("Aider: Reading imports...")
+        sublime.set_timeout_async(build, 0)
+
+    def pick(self, graph):
+        ctx = get_aider_instance(self.window).context
+        snapshot = ctx.snapshot
+        if not snapshot.files:
+            sublime.status_message("Aider: No files in the chat to find related files for")
+            return
+        related = [(path, reason) for path, reason in graph.related(snapshot.files)
+                   if path not in snapshot.chat_files]
+        if not related:
+            sublime.status_message("Aider: No imports or importers outside the chat")
+            return
+
+        self.related = [path for path, reason in related]
+
+        def arrange(items):
+            arranged = [["All {0} related files".format(len(related)),
+                         "~{0} tokens, read-only".format(format_tokens(ctx.estimate_tokens(self.related)))]]
+            for (path, reason), item in zip(related, items):
+                arranged.append([path, "{0} · {1}".format(reason, item[1])])
+            return arranged
+
+        _show_token_panel(self.window, ctx, self.related, self.on_done, arrange)
+
+    def on_done(self, choice):
+        if choice < 0:
+            return
+        paths = self.related if choice == 0 else [self.related[choice - 1]]
+        instance = get_aider_instance(self.window)
+        if not _confirm_budget(instance.context, paths):
+            return
+        added = instance.context.add_readonly_files(paths)
+        if instance.terminal.is_running():
+            instance.terminal.send_paths_command("read-only", added)
+        if len(added) == 1:
+            sublime.status_message("Added as read-only: {0}".format(added[0]))
+        else:
+            sublime.status_message("Added {0} related files as read-only".format(len(added)))
+        instance.refresh_files()
+
+
+class AiderSavvyAddSymbolFileCommand(sublime_plugin.WindowCommand):
+    """Add the file defining the symbol under the cursor (editable or read-only)."""
+
+    def run(self, readonly=False, symbol=None):
+        self.readonly = readonly
+        symbol = symbol or self._symbol_under_cursor()
+        if not symbol:
+            sublime.status_message("Aider: No symbol under the cursor")
+            return
+
+        ctx = get_aider_instance(self.window).context
+        index = ctx.symbol_index
+        paths = []
+        if index.is_built(ctx.project_root) and index.built_at >= ctx.project_index.built_at:
+            paths = index.lookup(symbol)
+        else:
+            self._build_index()
+        if not paths:
+            # Sublime's own index, while ours builds or for languages it does not tag
+            paths = self._sublime_lookup(symbol, ctx.project_root)
+        if not paths:
+            sublime.status_message("Aider: No definition of {0} found".format(symbol))
+            return
+
+        self.paths = paths
+        if len(paths) == 1:
+            self.on_done(0)
+        else:
+            _show_token_panel(self.window, ctx, paths, self.on_done)
+
+    def _symbol_under_cursor(self):
+        view = self.window.active_view()
+        if not view or not len(view.sel()):
+            return None
+        region = view.sel()[0]
+        if region.empty():
+            region = view.word(region)
+        return view.substr(region).strip() or None
+
+    def _build_index(self):
+        """Build the symbol index in the background for the next lookups."""
+        ctx = get_aider_instance(self.window).context
+        index = ctx.symbol_index
+        if index.building:
+            return
+
+        def build(project_index):
+            if index.building:
+                return
+            index.building = True
+
+            def tag():
+                count = index.build(project_index)
+                sublime.status_message("Aider: Indexed {0} symbols".format(count))
+            sublime.set_timeout_async(tag, 0)
+
+        _with_project_index(self.window, build)
+
+    def _sublime_lookup(self, symbol, root):
+        """Project-relative files where Sublime's index has symbol defined."""
+        paths = set()
+        for location in self.window.lookup_symbol_in_index(symbol):
+            rel_path = os.path.relpath(location[0], root).replace(os.sep, "/")
+            if not rel_path.startswith("../"):
+                paths.add(rel_path)
+        return sorted(paths)
+
+    def on_done(self, choice):
+        if choice < 0:
+            return
+        filepath = self.paths[choice]
+        instance = get_aider_instance(self.window)
+        ctx = instance.context
+        if filepath in ctx.snapshot.chat_files:
+            sublime.status_message("Already in chat: {0}".format(filepath))
+            return
+        if not _confirm_budget(ctx, [filepath]):
+            return
+
+        if self.readonly:
+            ctx.add_readonly_file(filepath)
+            command = "read-only"
+            sublime.status_message("Added as read-only: {0}".format(filepath))
+        else:
+            ctx.add_file(filepath)
+            command = "add"
+            sublime.status_message("Added: {0}".format(filepath))
+        if instance.terminal.is_running():
+            instance.terminal.send_paths_command(command, [filepath])
+        instance.refresh_files()
+
+
+class AiderSavvyAddGitChangesCommand(sublime_plugin.WindowCommand):
+    """Add the modified, staged and untracked files of the git working tree."""
+
+    def run(self):
+        ctx = get_aider_instance(self.window).context
+        root = ctx.project_root
+        if ctx.git_status.fresh(root):
+            # Refreshed in the background since the last save
+            self.confirm(root, ctx.git_status.changes)
+            return
+        method = get_setting("git_status_method", "git")
+        if method == "index":
+            _with_project_index(self.window, lambda index: self.refresh(root, method, list(index.files)))
+        else:
+            self.refresh(root, method, None)
+
+    def refresh(self, root, method, project_files):
+        """Read the git status in the background, then confirm."""
+        cache = get_aider_instance(self.window).context.git_status
+
+        def read():
+            try:
+                changes = cache.refresh(root, method, project_files)
+            except (GitError, OSError, IOError) as e:
+                sublime.status_message("Aider: Could not read the git status: {0}".format(e))
+                return
+            sublime.set_timeout(lambda: self.confirm(root, changes), 0)
+
+        sublime.status_message("Aider: Reading git status...")
+        sublime.set_timeout_async(read, 0)
+
+    def confirm(self, root, changes):
+        paths = []
+        counts = {}
+        for change in changes:
+            name = os.path.basename(change.path)
+            if (name.startswith('.aider') or os.path.splitext(name)[1].lower() in IGNORE_EXTENSIONS or
+                    not os.path.isfile(os.path.join(root, change.path))):
+                continue
+            paths.append(change.path)
+            counts[change.kind] = counts.get(change.kind, 0) + 1
+        if not paths:
+            sublime.status_message("Aider: No modified, staged or untracked files")
+            return
+        description = "the git changes ({0})".format(
+            ", ".join("{0} {1}".format(counts[kind], kind) for kind in sorted(counts)))
+        _confirm_and_add(self.window, None, paths, description)
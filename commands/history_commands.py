@@ -0,0 +1,147 @@
+# AiderSavvy - Chat history navigation commands
+import sublime
+import sublime_plugin
+
+from .dashboard import get_aider_instance
+
+
+def _indexed_history(window):
+    """Bring the active session's history index up to date and return it."""
+    instance = get_aider_instance(window)
+    index = instance.context.history_index
+    index.update(instance.context.get_aider_history_path())
+    return index
+
+
+def _history_items(index, kind):
+    """Quick panel items for sessions or turns, newest first."""
+    items = []
+    if kind == 'session':
+        counts = index.session_turn_counts()
+        for number in range(index.session_count() - 1, -1, -1):
+            title, line, archived = index.session_info(number)
+            items.append([
+                "Session {0}: {1}".format(number + 1, title),
+                "{0} turns, {1}".format(counts[number], "archived" if archived else "line {0}".format(line))
+            ])
+    else:
+        for number in range(index.turn_count() - 1, -1, -1):
+            title, line, session, archived = index.turn_info(number)
+            items.append([
+                "Turn {0}: {1}".format(number + 1, title or "(empty)"),
+                "Session {0}, {1}".format(session + 1, "archived" if archived else "line {0}".format(line))
+            ])
+    return items
+
+
+def _pick_history(window, kind, number, on_pick):
+    """Pick a history session or turn (1-based number, or from a quick panel).
+
+    on_pick(index, kind, number) gets the 0-based number."""
+    index = _indexed_history(window)
+    count = index.session_count() if kind == 'session' else index.turn_count()
+
+    if not count:
+        sublime.status_message("No aider {0}s in history".format(kind))
+        return
+
+    if number is not None:
+        if 1 <= number <= count:
+            on_pick(index, kind, number - 1)
+        else:
+            sublime.status_message("No aider {0} {1}".format(kind, number))
+        return
+
+    def on_done(choice):
+        if choice >= 0:
+            # Listed newest first
+            on_pick(index, kind, count - 1 - choice)
+
+    window.show_quick_panel(_history_items(index, kind), on_done)
+
+
+class AiderSavvyHistoryJumpCommand(sublime_plugin.WindowCommand):
+    """Open the history file at a session or turn."""
+
+    def run(self, kind='turn', number=None):
+        _pick_history(self.window, kind, number, self.on_pick)
+
+    def on_pick(self, index, kind, number):
+        if kind == 'session':
+            title, line, archived = index.session_info(number)
+        else:
+            title, line, session, archived = index.turn_info(number)
+        if not archived:
+            self.window.open_file("{0}:{1}".format(index.path, line), sublime.ENCODED_POSITION)
+            return
+
+        # Archived sessions are compressed, show their segment in a scratch view
+        archive = index.archive
+        entries = archive.sessions if kind == 'session' else archive.turns
+        segment = entries[number][0]
+        view = self.window.new_file()
+        view.set_name("Aider archive: {0}".format(archive.segments[segment]['file']))
+        view.set_scratch(True)
+        view.run_command("append", {"characters": archive.read(segment, 0, archive.segments[segment]['size'])})
+        view.set_read_only(True)
+        view.run_command("goto_line", {"line": line})
+
+
+class AiderSavvyHistoryLoadCommand(sublime_plugin.WindowCommand):
+    """Load only a session or turn into the Output tab."""
+
+    def run(self, kind='turn', number=None):
+        _pick_history(self.window, kind, number, self.on_pick)
+
+    def on_pick(self, index, kind, number):
+        if kind == 'session':
+            content = index.read_session(number)
+        else:
+            content = index.read_turn(number)
+        # Older content can be backfilled from the live file only
+        live = index.live_range(kind, number)
+
+        instance = get_aider_instance(self.window)
+        instance.output_panel.set_content(content, live[0] if live else None)
+        instance.go_to_tab(instance.TAB_OUTPUT)
+        sublime.status_message("Loaded {0} {1} ({2} bytes)".format(
+            kind, number + 1, len(content.encode('utf-8'))))
+
+
+class AiderSavvyArchiveHistoryCommand(sublime_plugin.WindowCommand):
+    """Move all but the current session of the history into compressed archives."""
+
+    def run(self):
+        instance = get_aider_instance(self.window)
+        session = instance.session
+        index = _indexed_history(self.window)
+        count = len(index.sessions) - 1
+        if count < 1:
+            sublime.status_message("Aider: Nothing to archive, the history has a single session")
+            return
+
+        message = "Archive {0} older sessions ({1} KB) of {2}?".format(
+            count, index.sessions[-1][0] // 1024, session.context.history_file)
+        if session.terminal.is_running():
+            message += "\n\nAider is running: anything it writes while archiving may be lost."
+        if not sublime.ok_cancel_dialog(message, "Archive"):
+            return
+
+        # The watcher must not feed the index while it is rebuilt
+        watcher = session.file_watcher
+        resume = watcher and watcher.running
+        if resume:
+            watcher.pause()
+
+        def archive():
+            try:
+                archived = index.archive_sessions()
+                sublime.status_message("Aider: Archived {0} sessions".format(archived))
+            except (OSError, IOError) as e:
+                sublime.error_message("AiderSavvy: Could not archive the history: {0}".format(e))
+            if resume:
+                # Picks up the rewritten file as a replaced history
+                sublime.set_timeout(watcher.resume, 0)
+
+        sublime.status_message("Aider: Archiving history...")
+        sublime.set_timeout_async(archive, 0)
@@ -0,0 +1,60 @@
+# AiderSavvy - Performance stats command
+import sublime
+import sublime_plugin
+import json
+import os
+import time
+
+from ..core.profiling import profiler
+from ..core.settings import get_cache_dir
+
+
+class AiderSavvyPerformanceStatsCommand(sublime_plugin.WindowCommand):
+    """Show the plugin's timing histograms, or dump them to JSON."""
+
+    def run(self, dump=False, reset=False):
+        if reset:
+            profiler.reset()
+            sublime.status_message("Aider: Performance stats reset")
+            return
+
+        if dump:
+            self._dump()
+            return
+
+        view = None
+        for v in self.window.views():
+            if v.settings().get("aider_savvy_perf_stats"):
+                view = v
+                break
+        if view is None:
+            view = self.window.new_file()
+            view.set_name("AIDER: Performance Stats")
+            view.set_scratch(True)
+            view.settings().set("aider_savvy_perf_stats", True)
+            view.settings().set("word_wrap", False)
+
+        view.set_read_only(False)
+        view.run_command("select_all")
+        view.run_command("right_delete")
+        view.run_command("append", {"characters": profiler.report()})
+        view.set_read_only(True)
+        self.window.focus_view(view)
+
+        if not profiler.enabled:
+            sublime.status_message("Aider: Profiling is disabled, set \"profiling\": true")
+
+    def _dump(self):
+        """Write all stats to a JSON file in the cache directory and open it."""
+        cache_dir = get_cache_dir()
+        path = os.path.join(cache_dir, "perf-stats-{0}.json".format(time.strftime("%Y%m%d-%H%M%S")))
+        try:
+            if not os.path.isdir(cache_dir):
+                os.makedirs(cache_dir)
+            with open(path, 'w') as f:
+                json.dump(profiler.to_dict(), f, indent=2, sort_keys=True)
+        except (OSError, IOError) as e:
+            sublime.error_message("Could not write performance stats: {0}".format(e))
+            return
+        self.window.open_file(path)
+        sublime.status_message("Aider: Performance stats written to {0}".format(path))
@@ -0,0 +1,61 @@
+# AiderSavvy - Prompt recall from aider's input history
+import sublime
+import sublime_plugin
+
+from .dashboard import get_aider_instance
+
+RECALL_LIMIT = 200
+
+
+def _recall_item(timestamp, text):
+    """Quick panel item: first line of the prompt, then its date and size."""
+    lines = text.split('\n')
+    detail = timestamp or "(no date)"
+    if len(lines) > 1:
+        detail += " · {0} lines".format(len(lines))
+    return [lines[0][:120] or "(empty line)", detail]
+
+
+class AiderSavvyRecallPromptCommand(sublime_plugin.WindowCommand):
+    """Pick a prompt typed earlier in aider and send it again."""
+
+    def run(self, query=None):
+        if query is not None:
+            self.on_query(query)
+            return
+        self.window.show_input_panel("Recall aider prompt (empty for latest):", "",
+                                     self.on_query, None, None)
+
+    def on_query(self, query):
+        instance = get_aider_instance(self.window)
+        index = instance.context.input_history
+        path = instance.context.get_aider_input_history_path()
+
+        def rank():
+            # Parsing a large input history the first time can take a moment
+            index.update(path)
+            hits = index.rank(query, RECALL_LIMIT)
+            sublime.set_timeout(lambda: self.show(query, hits), 0)
+
+        sublime.set_timeout_async(rank, 0)
+
+    def show(self, query, hits):
+        self.hits = hits
+        if not hits:
+            if query.strip():
+                sublime.status_message("No aider prompts match: {0}".format(query))
+            else:
+                sublime.status_message("No aider prompts in the input history")
+            return
+        self.window.show_quick_panel([_recall_item(timestamp, text) for score, timestamp, text in hits],
+                                     self.on_done)
+
+    def on_done(self, index):
+        if index < 0:
+            return
+        text = self.hits[index][2]
+        instance = get_aider_instance(self.window)
+
+        if not instance.terminal.is_running():
+            instance.terminal.start()
+        instance.terminal.send_message(text)
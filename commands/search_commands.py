@@ -0,0 +1,84 @@
+# AiderSavvy - Chat history search command
+import sublime
+import sublime_plugin
+
+from .dashboard import get_aider_instance
+from ..core.search_index import tokenize
+
+
+def _snippet(text, terms):
+    """First non-empty line mentioning a query term, for the result detail."""
+    fallback = ""
+    for line in text.split('\n'):
+        line = line.strip()
+        if not line or line.startswith('####'):
+            continue
+        fallback = fallback or line
+        lowered = line.lower()
+        if any(term in lowered for term in terms):
+            return line[:100]
+    return fallback[:100]
+
+
+class AiderSavvySearchHistoryCommand(sublime_plugin.WindowCommand):
+    """Search the chat history and load the matching turn."""
+
+    def run(self, query=None):
+        if query:
+            self.on_query(query)
+            return
+        self.window.show_input_panel("Search aider history:", "", self.on_query, None, None)
+
+    def on_query(self, query):
+        if not query.strip():
+            return
+
+        instance = get_aider_instance(self.window)
+        ctx = instance.context
+        watcher = instance.file_watcher
+        done = []
+
+        def search():
+            index = ctx.history_index
+            try:
+                # A running watcher keeps the index current, do not race it
+                if not (watcher and watcher.running):
+                    index.update(ctx.get_aider_history_path())
+                hits = ctx.search_index.search(index, query)
+            except (OSError, IOError, ValueError, IndexError) as e:
+                print("AiderSavvy: History search failed: {0}".format(e))
+                hits = []
+            done.append(True)
+            sublime.set_timeout(lambda: self.show_hits(index, query, hits), 0)
+
+        def progress():
+            # Indexing a long history for the first time takes a while
+            if not done:
+                sublime.status_message("Aider: Searching history…")
+                sublime.set_timeout(progress, 1000)
+
+        sublime.set_timeout_async(search, 0)
+        sublime.set_timeout(progress, 200)
+
+    def show_hits(self, index, query, hits):
+        self.hits = hits
+        if not self.hits:
+            sublime.status_message("No history turns match: {0}".format(query))
+            return
+
+        terms = tokenize(query)
+        items = []
+        for score, number in self.hits:
+            title, line, session, archived = index.turn_info(number)
+            # Read a bounded prefix of the turn for the snippet
+            text = index.read_turn(number, 8192)
+            items.append([
+                "Turn {0}: {1}".format(number + 1, title or "(empty)"),
+                "Session {0} · score {1:.2f} · {2}".format(session + 1, score, _snippet(text, terms))
+            ])
+        self.window.show_quick_panel(items, self.on_done)
+
+    def on_done(self, index):
+        if index >= 0:
+            score, number = self.hits[index]
+            self.window.run_command("aider_savvy_history_load", {"kind": "turn", "number": number + 1})
@@ -4,6 +4,7 @@ import sublime_plugin
 import os
 
 from .dashboard import get_aider_instance
+from ..core.prompt_transport import FILE
 
 
 class AiderSavvyStartTerminalCommand(sublime_plugin.WindowCommand):
@@ -31,6 +32,16 @@ class AiderSavvyStopTerminalCommand(sublime_plugin.WindowCommand):
         sublime.status_message("Aider terminal stopped")
 
 
+class AiderSavvyRestartTerminalCommand(sublime_plugin.WindowCommand):
+    """Restart aider with the session's files, mode and model (e.g. after a stall)."""
+
+    def run(self):
+        instance = get_aider_instance(self.window)
+        instance.terminal.restart()
+        instance.refresh_options()
+        sublime.status_message("Aider terminal restarted")
+
+
 class AiderSavvySendMessageCommand(sublime_plugin.WindowCommand):
     """Send a message/prompt to Aider."""
 
@@ -50,12 +61,9 @@ class AiderSavvySendMessageCommand(sublime_plugin.WindowCommand):
         instance = get_aider_instance(self.window)
 
         if not instance.terminal.is_running():
-            # Start terminal first
+            # Start terminal first, the message waits in the queue until aider is up
             instance.terminal.start()
-            # Wait a bit then send message
-            sublime.set_timeout(lambda: instance.terminal.send_message(text), 1000)
-        else:
-            instance.terminal.send_message(text)
+        instance.terminal.send_message(text)
 
 
 class AiderSavvySendCommandCommand(sublime_plugin.WindowCommand):
@@ -94,23 +102,46 @@ class AiderSavvyChangeModeCommand(sublime_plugin.WindowCommand):
         if index >= 0:
             modes = ["code", "ask", "architect"]
             instance = get_aider_instance(self.window)
-            instance.context.set_mode(modes[index])
+            # Applied live with /chat-mode when the terminal is running
+            instance.change_mode(modes[index])
             sublime.status_message("Mode: {0}".format(modes[index]))
             instance.refresh_options()
 
-            # If terminal running, need to restart with new mode
-            if instance.terminal.is_running():
-                sublime.message_dialog(
-                    "Mode changed to {0}.\n"
-                    "Restart terminal [T] then [t] to apply.".format(modes[index])
-                )
-
 
 class AiderSavvyChangeModelCommand(sublime_plugin.WindowCommand):
     """Change the AI model from available aliases."""
 
-    def run(self):
+    # How often to look again while the session bootstrap runs, and for how long
+    DETECTION_POLL = 200  # milliseconds
+    DETECTION_TIMEOUT = 10000  # milliseconds
+
+    def run(self, waited=0):
         instance = get_aider_instance(self.window)
+        session = instance.session
+        if not session.context.detected and not session.ready:
+            sublime.status_message("Aider: Detecting model aliases…")
+            if not session.bootstrapping:
+                # Run before the dashboard was opened: nothing detects, do it here
+                sublime.set_timeout_async(lambda: self.detect(session), 0)
+            elif waited < self.DETECTION_TIMEOUT:
+                # Wait for the result of the background detection
+                sublime.set_timeout(lambda: self.run(waited + self.DETECTION_POLL), self.DETECTION_POLL)
+            else:
+                sublime.status_message("Aider: Model aliases are still being detected, try again")
+            return
+        self.show_aliases(instance)
+
+    def detect(self, session):
+        """Detect the environment off the UI thread, then show the aliases."""
+        try:
+            session.context.detect_environment()
+        except Exception as e:
+            print("AiderSavvy: Environment detection failed: {0}".format(e))
+            sublime.set_timeout(lambda: sublime.status_message("Aider: Could not detect model aliases"), 0)
+            return
+        sublime.set_timeout(lambda: self.show_aliases(get_aider_instance(self.window)), 0)
+
+    def show_aliases(self, instance):
         model_aliases = instance.context.model_aliases
         
         if not model_aliases:
@@ -133,16 +164,10 @@ class AiderSavvyChangeModelCommand(sublime_plugin.WindowCommand):
             instance = get_aider_instance(self.window)
             selected_alias_name, selected_model = self.model_aliases[index]
             
-            instance.context.set_model(selected_model)
+            # Applied live with /model when the terminal is running
+            instance.change_model(selected_model)
             sublime.status_message("Model: {0} → {1}".format(selected_alias_name, selected_model))
             instance.refresh_options()
-            
-            # If terminal running, suggest restart
-            if instance.terminal.is_running():
-                sublime.message_dialog(
-                    "Model changed to {0} → {1}.\n"
-                    "Restart terminal [T] then [t] to apply.".format(selected_alias_name, selected_model)
-                )
 
 
 class AiderSavvyChangeRootCommand(sublime_plugin.WindowCommand):
@@ -160,7 +185,7 @@ class AiderSavvyChangeRootCommand(sublime_plugin.WindowCommand):
         if index >= 0:
             folders = self.window.folders()
             instance = get_aider_instance(self.window)
-            instance.context.project_root = folders[index]
+            instance.context.set_project_root(folders[index])
             instance.context.api_keys = instance.context._detect_api_keys()
             sublime.status_message("Root: {0}".format(folders[index]))
             instance.refresh_options()
@@ -214,13 +239,14 @@ class AiderSavvySyncSessionCommand(sublime_plugin.WindowCommand):
 
 
 class AiderSavvySendMultilineCommand(sublime_plugin.WindowCommand):
-    """Send a multiline message to Aider (opens in new buffer)."""
+    """Send a multiline message to Aider (opens in new buffer, sent when closed)."""
 
     def run(self):
         # Create a temporary buffer for multiline input
         view = self.window.new_file()
-        view.set_name("Aider - Multiline Message")
+        view.set_name("Aider - Multiline Message (close to send)")
         view.set_scratch(True)
+        # AiderSavvyEventListener.on_pre_close sends it
         view.settings().set("aider_multiline_input", True)
         
         # Set syntax if available
@@ -228,31 +254,62 @@ class AiderSavvySendMultilineCommand(sublime_plugin.WindowCommand):
             view.assign_syntax("Packages/Text/Plain text.tmLanguage")
         except:
             pass
-        
-        # Add an on_close event listener
-        view.settings().set("on_close_callback", lambda: self.on_done(view))
 
-    def on_done(self, view):
-        """Called when the multiline buffer is saved/closed."""
-        content = view.substr(sublime.Region(0, view.size()))
-        if content.strip():
-            instance = get_aider_instance(self.window)
-            if instance.terminal.is_running():
-                instance.terminal.send_message(content)
-                sublime.status_message("Multiline message sent to Aider")
-            else:
-                sublime.status_message("Start terminal first with [t]")
-        
-        # Close the temporary buffer
-        if view.is_valid():
-            view.close()
+
+def send_multiline_buffer(window, view):
+    """Send the content of a multiline buffer being closed; an empty one is discarded."""
+    content = view.substr(sublime.Region(0, view.size()))
+    if not content.strip():
+        return
+    instance = get_aider_instance(window)
+    if not instance.terminal.is_running():
+        sublime.status_message("Start terminal first with [t]")
+        return
+    transport = instance.terminal.send_message(content)
+    if transport == FILE:
+        sublime.status_message("Multiline message sent to Aider through a prompt file")
+    else:
+        sublime.status_message("Multiline message sent to Aider")
 
 
 class AiderSavvyRefreshOutputCommand(sublime_plugin.WindowCommand):
-    """Refresh output from history file."""
+    """Refresh output from the end of the history file."""
 
     def run(self):
         instance = get_aider_instance(self.window)
-        content = instance.file_watcher.get_full_history()
-        instance.output_panel.set_content(content)
+        watcher = instance.file_watcher
+        if not watcher:
+            sublime.status_message("Aider: History is still loading")
+            return
+        # Only the tail window is read, older content is loaded with [b]
+        start, content = watcher.read_window(watcher.tail_window_bytes())
+        instance.output_panel.set_content(content, start)
+        instance.refresh_output()
         sublime.status_message("Output refreshed from history file")
+
+
+class AiderSavvyLoadOlderOutputCommand(sublime_plugin.WindowCommand):
+    """Load the history preceding the Output tab content."""
+
+    def run(self):
+        instance = get_aider_instance(self.window)
+        watcher = instance.file_watcher
+        panel = instance.output_panel
+        if not watcher:
+            sublime.status_message("Aider: History is still loading")
+            return
+        if panel.loaded_from is None:
+            self.window.run_command("aider_savvy_refresh_output")
+            return
+        if panel.loaded_from == 0:
+            if watcher.context.history_index.archive.sessions:
+                sublime.status_message("Aider: Start of the live history, older sessions are archived (J to load one)")
+            else:
+                sublime.status_message("Aider: Start of the history reached")
+            return
+
+        start, content = watcher.read_window(watcher.tail_window_bytes(), panel.loaded_from)
+        panel.prepend_content(content, start)
+        instance.go_to_tab(instance.TAB_OUTPUT)
+        sublime.status_message("Aider: Loaded {0} KB of older history".format(
+            (len(content.encode('utf-8')) + 1023) // 1024))
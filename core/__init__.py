@@ -1,4 +1,21 @@
 # AiderSavvy - Core module
-from .context import AiderContext
+from .context import AiderContext, ContextSnapshot
+from .events import EventBus
 from .terminal import AiderTerminal
+from .terminal_writer import TerminalWriter
 from .file_watcher import AiderFileWatcher
+from .watchdog import AiderWatchdog
+from .warm_pool import AiderWarmPool
+from .scheduler import AiderSessionScheduler
+from .batch_runner import AiderBatchRunner, AiderBatchJob
+from .history_index import HistoryIndex
+from .history_archive import HistoryArchive
+from .search_index import HistorySearchIndex
+from .input_history import InputHistoryIndex
+from .import_graph import ImportGraph
+from .symbol_index import SymbolIndex
+from .git_status import GitStatusCache
+from .token_budget import TokenEstimator
+from .metrics import HistoryMetrics
+from .line_store import LineStore
+from .profiling import profiler, profiled
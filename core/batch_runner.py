@@ -0,0 +1,206 @@
+# AiderSavvy - Headless batch runner for one-shot aider edits
+import os
+import subprocess
+import threading
+import time
+from collections import deque
+
+
+class AiderBatchJob:
+    """A single one-shot aider run: a prompt applied to a set of files."""
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+
+    def __init__(self, number, prompt, files, readonly_files=None):
+        self.number = number
+        self.prompt = prompt
+        self.files = list(files)
+        self.readonly_files = list(readonly_files or [])
+        self.status = self.PENDING
+        self.returncode = None
+        self.started = None
+        self.finished = None
+        self.history_path = None
+        self.log_path = None
+        self.error = None
+
+    @property
+    def duration(self):
+        """Wall-clock run time in seconds, or None if not started."""
+        if self.started is None:
+            return None
+        return (self.finished or time.time()) - self.started
+
+
+class AiderBatchRunner:
+    """Runs `aider --message ... --yes` over a list of jobs with a worker pool.
+
+    Each job runs as its own subprocess in the project root with its own
+    chat/input history files under .aider.batch/<run id>/, so parallel
+    jobs never interleave in the interactive session's history. At most
+    `concurrency` jobs run at once; the queue can be cancelled at any time.
+    progress_callback(runner) is called from worker threads on every job
+    state change."""
+
+    def __init__(self, context, jobs, concurrency=2, executable="aider",
+                 progress_callback=None):
+        self.context = context
+        self.jobs = jobs
+        self.concurrency = max(1, concurrency)
+        self.executable = executable
+        self.progress_callback = progress_callback
+        self.run_id = time.strftime("%Y%m%d-%H%M%S")
+        self.batch_dir = os.path.join(context.project_root, ".aider.batch", self.run_id)
+        self.started = None
+        self.finished = None
+        self.cancelled = False
+        self._queue = deque(jobs)
+        self._lock = threading.Lock()
+        self._processes = {}
+        self._workers = []
+        self._active_workers = 0
+
+    def start(self):
+        """Start the worker pool."""
+        try:
+            os.makedirs(self.batch_dir)
+        except OSError:
+            pass
+
+        self.started = time.time()
+        self._active_workers = min(self.concurrency, len(self.jobs))
+        for _ in range(self._active_workers):
+            worker = threading.Thread(target=self._worker)
+            worker.daemon = True
+            self._workers.append(worker)
+            worker.start()
+        if not self._workers:
+            self.finished = self.started
+            self._notify()
+
+    def cancel(self):
+        """Cancel pending jobs and terminate running ones."""
+        with self._lock:
+            self.cancelled = True
+            while self._queue:
+                job = self._queue.popleft()
+                job.status = AiderBatchJob.CANCELLED
+            processes = list(self._processes.values())
+
+        for process in processes:
+            try:
+                process.terminate()
+            except OSError:
+                pass
+        self._notify()
+
+    def is_running(self):
+        """Check if any worker is still busy."""
+        return self.started is not None and self.finished is None
+
+    def counts(self):
+        """Number of jobs per status."""
+        counts = {}
+        for job in self.jobs:
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return counts
+
+    def throughput(self):
+        """Completed jobs per minute since the batch started."""
+        if not self.started:
+            return 0.0
+        completed = sum(1 for job in self.jobs
+                        if job.status in (AiderBatchJob.DONE, AiderBatchJob.FAILED))
+        elapsed = (self.finished or time.time()) - self.started
+        return completed * 60.0 / elapsed if elapsed > 0 else 0.0
+
+    def build_command(self, job):
+        """Build the aider argument list for a job.
+
+        Jobs run in parallel in one repository, so aider must not commit:
+        concurrent commits race on .git/index.lock and take in the other
+        jobs' edits. The edits are left in the working tree for review."""
+        cmd = [self.executable, "--message", job.prompt, "--yes", "--no-pretty",
+               "--no-auto-commits", "--no-dirty-commits",
+               "--chat-history-file", job.history_path,
+               "--input-history-file", job.history_path.replace(".chat.history.md", ".input.history")]
+
+        snapshot = self.context.snapshot
+        if snapshot.mode == 'ask':
+            cmd.append("--ask")
+        elif snapshot.mode == 'architect':
+            cmd.append("--architect")
+
+        if snapshot.model and snapshot.model != 'gpt-4o':
+            cmd.extend(["--model", snapshot.model])
+
+        for f in job.files:
+            cmd.extend(["--file", f])
+        for f in job.readonly_files:
+            cmd.extend(["--read", f])
+        return cmd
+
+    def _worker(self):
+        """Take jobs off the queue until it is empty or cancelled."""
+        while True:
+            with self._lock:
+                if self.cancelled or not self._queue:
+                    break
+                job = self._queue.popleft()
+                job.status = AiderBatchJob.RUNNING
+                job.started = time.time()
+            self._notify()
+            self._run_job(job)
+            self._notify()
+
+        with self._lock:
+            self._active_workers -= 1
+            if self._active_workers == 0:
+                self.finished = time.time()
+        self._notify()
+
+    def _run_job(self, job):
+        """Run one aider subprocess and record its outcome."""
+        prefix = os.path.join(self.batch_dir, "job-{0:03d}".format(job.number))
+        job.history_path = prefix + ".chat.history.md"
+        job.log_path = prefix + ".log"
+
+        try:
+            with open(job.log_path, 'wb') as log:
+                process = subprocess.Popen(
+                    self.build_command(job),
+                    cwd=self.context.project_root,
+                    stdin=subprocess.DEVNULL,
+                    stdout=log,
+                    stderr=subprocess.STDOUT
+                )
+                with self._lock:
+                    self._processes[job.number] = process
+                    cancelled = self.cancelled
+                if cancelled:
+                    process.terminate()
+                job.returncode = process.wait()
+        except (OSError, IOError) as e:
+            job.error = str(e)
+        finally:
+            with self._lock:
+                self._processes.pop(job.number, None)
+                job.finished = time.time()
+                if self.cancelled and job.returncode != 0:
+                    job.status = AiderBatchJob.CANCELLED
+                elif job.error is None and job.returncode == 0:
+                    job.status = AiderBatchJob.DONE
+                else:
+                    job.status = AiderBatchJob.FAILED
+
+    def _notify(self):
+        """Report progress to the callback."""
+        if self.progress_callback:
+            try:
+                self.progress_callback(self)
+            except Exception as e:
+                print("AiderSavvy: Batch progress callback error: {0}".format(e))
@@ -1,23 +1,146 @@
 # AiderSavvy - Session context management
 import os
 import re
+import threading
+
+from .events import (EventBus, SessionStarted, TurnStarted, ModelChanged, ModeChanged,
+                     FileAdded, ReadOnlyAdded, FileDropped)
+from .git_status import GitStatusCache
+from .history_index import HistoryIndex, SESSION_MARKER, TURN_MARKER
+from .import_graph import ImportGraph
+from .input_history import InputHistoryIndex
+from .metrics import HistoryMetrics
+from .profiling import profiled
+from .project_index import ProjectFileIndex
+from .prompt_transport import is_prompt_file
+from .search_index import HistorySearchIndex
+from .symbol_index import SymbolIndex
+from .settings import get_cache_dir, get_setting
+from .token_budget import TokenEstimator, FILES_SHARE, context_window as model_context_window
+
+
+class ContextSnapshot:
+    """Immutable session state: project root, files, read-only files, mode and model.
+
+    AiderContext never changes a snapshot, it publishes a new one with the
+    next version. A reader holding a reference always sees a consistent
+    state, even while the history or a command updates the context, and
+    caches can key on the version."""
+
+    __slots__ = ('version', 'project_root', 'files', 'readonly_files', 'mode', 'model',
+                 'chat_files')
+
+    FIELDS = ('project_root', 'files', 'readonly_files', 'mode', 'model')
+
+    def __init__(self, version, project_root, files, readonly_files, mode, model):
+        self.version = version
+        self.project_root = project_root
+        self.files = tuple(files)
+        self.readonly_files = tuple(readonly_files)
+        self.mode = mode
+        self.model = model
+        # Editable and read-only files, for membership tests
+        self.chat_files = frozenset(self.files + self.readonly_files)
+
+    def replace(self, **changes):
+        """A copy with changes applied, under the next version."""
+        values = dict((name, getattr(self, name)) for name in self.FIELDS)
+        values.update(changes)
+        return ContextSnapshot(self.version + 1, **values)
 
 
 class AiderContext:
-    """Manages the Aider session state."""
+    """Manages the Aider session state.
 
-    def __init__(self, window):
+    Root, files, mode and model live in a ContextSnapshot. Writers publish
+    a new one under a lock; readers take self.snapshot once and use it."""
+
+    DEFAULT_HISTORY_FILE = ".aider.chat.history.md"
+
+    def __init__(self, window, project_root=None, history_file=None):
         self.window = window
-        self.project_root = self._determine_project_root()
-        self.files = []
-        self.readonly_files = []
-        self.mode = 'code'
-        self.model = 'gpt-4o'
+        self._lock = threading.RLock()
+        self.snapshot = ContextSnapshot(0, project_root or self._determine_project_root(),
+                                        (), (), 'code', 'gpt-4o')
+        self.history_file = history_file or self.DEFAULT_HISTORY_FILE
         self.is_running = False
+        self.pending_model = None
+        self.pending_mode = None
         self.terminal_tag = 'aider_terminal'
+        self.history_index = HistoryIndex(get_cache_dir())
+        self.search_index = HistorySearchIndex(get_cache_dir())
+        self.input_history = InputHistoryIndex(get_cache_dir())
+        self.project_index = ProjectFileIndex()
+        self.import_graph = ImportGraph()
+        self.symbol_index = SymbolIndex()
+        self.git_status = GitStatusCache()
+        self.metrics = HistoryMetrics()
+        self.history_partial_line = ""
+        # History events (see core.events), published by the file watcher
+        self.events = EventBus()
+        self.token_estimator = TokenEstimator(self.events)
+        # Filled by detect_environment(), off the main thread when possible
+        self.detected = False
+        self.api_keys = []
+        self.model_aliases = []
+        self.multiline_enabled = False
+
+    # State, read from the current snapshot
+
+    @property
+    def project_root(self):
+        return self.snapshot.project_root
+
+    @property
+    def files(self):
+        return self.snapshot.files
+
+    @property
+    def readonly_files(self):
+        return self.snapshot.readonly_files
+
+    @property
+    def mode(self):
+        return self.snapshot.mode
+
+    @property
+    def model(self):
+        return self.snapshot.model
+
+    def context_window(self, snapshot=None):
+        """Context window of the session's model, in tokens.
+
+        The "context_window_tokens" setting overrides the built-in table."""
+        snapshot = snapshot or self.snapshot
+        return get_setting("context_window_tokens") or model_context_window(snapshot.model)
+
+    def token_budget(self, snapshot=None):
+        """Tokens the chat files may take, leaving room for the repo map, history and reply."""
+        return int(self.context_window(snapshot) * FILES_SHARE)
+
+    def estimate_tokens(self, rel_paths, snapshot=None):
+        """Estimated tokens of project files, relative to the project root."""
+        snapshot = snapshot or self.snapshot
+        return self.token_estimator.total(snapshot.project_root, rel_paths)
+
+    def chat_tokens(self, snapshot=None):
+        """Estimated tokens of the editable and read-only files of the chat."""
+        snapshot = snapshot or self.snapshot
+        return self.estimate_tokens(snapshot.files + snapshot.readonly_files, snapshot)
+
+    def _publish(self, **changes):
+        """Replace the snapshot with a copy carrying changes."""
+        with self._lock:
+            self.snapshot = self.snapshot.replace(**changes)
+            return self.snapshot
+
+    @profiled("context.detect_environment")
+    def detect_environment(self):
+        """Scan .env files and aider configs for API keys, aliases and multiline."""
         self.api_keys = self._detect_api_keys()
         self.model_aliases = self._detect_model_aliases()
         self.multiline_enabled = self._detect_multiline_config()
+        self.detected = True
 
     def _determine_project_root(self):
         """Find the best project root directory."""
@@ -183,49 +306,89 @@ class AiderContext:
 
     def add_file(self, filepath):
         """Add a file to the chat."""
-        if filepath not in self.files and filepath not in self.readonly_files:
-            self.files.append(filepath)
+        with self._lock:
+            snapshot = self.snapshot
+            if filepath in snapshot.chat_files:
+                return False
+            self._publish(files=snapshot.files + (filepath,))
             return True
-        return False
+
+    def add_files(self, filepaths):
+        """Add several files to the chat as one snapshot, returns those not already in it."""
+        with self._lock:
+            snapshot = self.snapshot
+            added = []
+            seen = set(snapshot.chat_files)
+            for filepath in filepaths:
+                if filepath not in seen:
+                    seen.add(filepath)
+                    added.append(filepath)
+            if added:
+                self._publish(files=snapshot.files + tuple(added))
+            return added
 
     def add_readonly_file(self, filepath):
         """Add a file as read-only."""
-        if filepath in self.files:
-            self.files.remove(filepath)
-        if filepath not in self.readonly_files:
-            self.readonly_files.append(filepath)
+        with self._lock:
+            snapshot = self.snapshot
+            files = tuple(f for f in snapshot.files if f != filepath)
+            if filepath in snapshot.readonly_files:
+                if files != snapshot.files:
+                    self._publish(files=files)
+                return False
+            self._publish(files=files, readonly_files=snapshot.readonly_files + (filepath,))
             return True
-        return False
+
+    def add_readonly_files(self, filepaths):
+        """Add several files not in the chat as read-only, as one snapshot; returns those added."""
+        with self._lock:
+            snapshot = self.snapshot
+            added = []
+            seen = set(snapshot.chat_files)
+            for filepath in filepaths:
+                if filepath not in seen:
+                    seen.add(filepath)
+                    added.append(filepath)
+            if added:
+                self._publish(readonly_files=snapshot.readonly_files + tuple(added))
+            return added
 
     def drop_file(self, filepath):
         """Remove a file from the chat."""
-        if filepath in self.files:
-            self.files.remove(filepath)
-            return True
-        if filepath in self.readonly_files:
-            self.readonly_files.remove(filepath)
-            return True
-        return False
+        with self._lock:
+            snapshot = self.snapshot
+            if filepath in snapshot.files:
+                self._publish(files=tuple(f for f in snapshot.files if f != filepath))
+                return True
+            if filepath in snapshot.readonly_files:
+                self._publish(readonly_files=tuple(f for f in snapshot.readonly_files if f != filepath))
+                return True
+            return False
 
     def set_mode(self, mode):
         """Set the Aider mode (code/ask/architect)."""
         if mode in ['code', 'ask', 'architect']:
-            self.mode = mode
+            self._publish(mode=mode)
             return True
         return False
 
     def set_model(self, model):
         """Set the AI model."""
-        self.model = model
+        self._publish(model=model)
+
+    def set_project_root(self, project_root):
+        """Set the project root aider runs in."""
+        self._publish(project_root=project_root)
 
     def get_aider_history_path(self):
-        """Get path to .aider.chat.history.md file."""
-        return os.path.join(self.project_root, ".aider.chat.history.md")
+        """Get path to .aider.chat.history.md file (or the session's own history file)."""
+        return os.path.join(self.project_root, self.history_file)
 
     def get_aider_input_history_path(self):
         """Get path to .aider.input.history file."""
         return os.path.join(self.project_root, ".aider.input.history")
 
+    @profiled("context.sync_from_existing_session")
     def sync_from_existing_session(self):
         """Detect files, model and mode from an existing Aider session by parsing .aider.chat.history.md."""
         history_path = self.get_aider_history_path()
@@ -234,19 +397,21 @@ class AiderContext:
             return False
         
         try:
-            with open(history_path, 'r', encoding='utf-8', errors='replace') as f:
-                content = f.read()
-            
-            # Find the last session block (starts with "# aider chat started at")
-            sessions = content.split('# aider chat started at')
-            if len(sessions) < 2:
+            # Only the last session block matters, read just its byte range
+            index = self.history_index
+            index.update(history_path)
+            if not index.sessions:
                 return False
-            
-            # Get the last session content
-            last_session = sessions[-1]
+
+            start, end = index.session_range(len(index.sessions) - 1)
+            last_session = index.read_range(start + len(SESSION_MARKER), end)
             
             # Parse the last session to get current state
             self._parse_session_for_state(last_session)
+
+            # Tokens and cost of the current session (no timing, not seen live)
+            if not self.metrics.turns:
+                self.metrics.feed(last_session + "\n", None, self.model)
             
             return True
             
@@ -265,6 +430,7 @@ class AiderContext:
         # Patterns for extraction
         model_pattern = re.compile(r'Main model: ([^\s]+)')
         mode_pattern = re.compile(r'with (code|ask|architect) edit format')
+        edit_format_pattern = re.compile(r'Main model: [^\s]+ with ([\w-]+) edit format')
         added_pattern = re.compile(r'Added ([^\s]+) to the chat\.')
         dropped_pattern = re.compile(r'Dropped ([^\s]+) from the chat\.')
         readonly_pattern = re.compile(r'Added ([^\s]+) to the chat as read-only\.')
@@ -292,11 +458,19 @@ class AiderContext:
             mode_match = mode_pattern.search(line)
             if mode_match:
                 last_mode = mode_match.group(1)
+            else:
+                # Any other main edit format (diff, whole, udiff...) means code mode
+                format_match = edit_format_pattern.search(line)
+                if format_match and format_match.group(1) not in ('help', 'context'):
+                    last_mode = 'code'
             
             # Check for added files (read-only first, then regular)
             readonly_match = readonly_pattern.search(line)
             if readonly_match:
                 filepath = readonly_match.group(1)
+                if is_prompt_file(filepath, self.project_root):
+                    # The plugin's own prompt file, not part of the session
+                    continue
                 if filepath not in session_readonly:
                     session_readonly.append(filepath)
                 if filepath in session_files:
@@ -319,35 +493,61 @@ class AiderContext:
                 if filepath in session_readonly:
                     session_readonly.remove(filepath)
         
-        # Update context with parsed values
+        # Publish the parsed values as one snapshot
+        changes = {'files': session_files, 'readonly_files': session_readonly}
         if last_model:
-            self.model = last_model
-        
+            changes['model'] = last_model
         if last_mode:
-            self.mode = last_mode
-        
-        # Update files lists
-        self.files = session_files
-        self.readonly_files = session_readonly
+            changes['mode'] = last_mode
+        self._publish(**changes)
 
+    def reset_incremental_sync(self):
+        """Forget a partially read line, the history is re-read from the start."""
+        self.history_partial_line = ""
+
+    @profiled("context.sync_incremental_from_history")
     def sync_incremental_from_history(self, new_content):
         """Parse new content appended to history file for incremental updates.
-        Returns tuple (model_changed, mode_changed, files_changed) to indicate what changed."""
-        
-        model_changed = False
-        mode_changed = False
-        files_changed = False
+        Applies the changes as one new snapshot and returns them as a list of
+        events (see core.events)."""
+        with self._lock:
+            snapshot = self.snapshot
+            state = {'model': snapshot.model, 'mode': snapshot.mode,
+                     'files': list(snapshot.files), 'readonly_files': list(snapshot.readonly_files)}
+            events = self._parse_incremental(new_content, state)
+            if any(not isinstance(event, (SessionStarted, TurnStarted)) for event in events):
+                self._publish(**state)
+        return events
+
+    def _parse_incremental(self, new_content, state):
+        """Parse complete lines of new_content into events, updating state."""
+        events = []
+        files = state['files']
+        readonly_files = state['readonly_files']
         
         # Patterns for extraction
         model_pattern = re.compile(r'Main model: ([^\s]+)')
         mode_pattern = re.compile(r'with (code|ask|architect) edit format')
+        edit_format_pattern = re.compile(r'Main model: [^\s]+ with ([\w-]+) edit format')
         added_pattern = re.compile(r'Added ([^\s]+) to the chat\.')
         dropped_pattern = re.compile(r'Dropped ([^\s]+) from the chat\.')
         readonly_pattern = re.compile(r'Added ([^\s]+) to the chat as read-only\.')
+        session_marker = SESSION_MARKER.decode('utf-8')
+        turn_marker = TURN_MARKER.decode('utf-8')
         
-        lines = new_content.split('\n')
+        # Reads can end mid-line, keep the unfinished line for the next call
+        lines = (self.history_partial_line + new_content).split('\n')
+        self.history_partial_line = lines.pop()
         
         for line in lines:
+            # Session and turn headers
+            if line.startswith(session_marker):
+                events.append(SessionStarted(line[len(session_marker):].strip()))
+                continue
+            if line.startswith(turn_marker):
+                events.append(TurnStarted(line[len(turn_marker):].strip()))
+                continue
+
             line = line.strip()
             
             # Skip empty lines
@@ -362,59 +562,71 @@ class AiderContext:
             model_match = model_pattern.search(line)
             if model_match:
                 new_model = model_match.group(1)
-                if new_model != self.model:
-                    self.model = new_model
-                    model_changed = True
+                if new_model != state['model']:
+                    events.append(ModelChanged(new_model, state['model']))
+                    state['model'] = new_model
             
             # Check for mode change
+            new_mode = None
             mode_match = mode_pattern.search(line)
             if mode_match:
                 new_mode = mode_match.group(1)
-                if new_mode != self.mode:
-                    self.mode = new_mode
-                    mode_changed = True
+            else:
+                # Any other main edit format (diff, whole, udiff...) means code mode
+                format_match = edit_format_pattern.search(line)
+                if format_match and format_match.group(1) not in ('help', 'context'):
+                    new_mode = 'code'
+            if new_mode:
+                if new_mode != state['mode']:
+                    events.append(ModeChanged(new_mode, state['mode']))
+                    state['mode'] = new_mode
             
             # Check for read-only files first
             readonly_match = readonly_pattern.search(line)
             if readonly_match:
                 filepath = readonly_match.group(1)
-                if filepath not in self.readonly_files:
-                    self.readonly_files.append(filepath)
-                    files_changed = True
-                if filepath in self.files:
-                    self.files.remove(filepath)
+                if is_prompt_file(filepath, self.project_root):
+                    # The plugin's own prompt file, not part of the session
+                    continue
+                if filepath in files:
+                    files.remove(filepath)
+                    events.append(FileDropped(filepath, False))
+                if filepath not in readonly_files:
+                    readonly_files.append(filepath)
+                    events.append(ReadOnlyAdded(filepath))
                 continue
             
             # Check for added files
             added_match = added_pattern.search(line)
             if added_match:
                 filepath = added_match.group(1)
-                if filepath not in self.files and filepath not in self.readonly_files:
-                    self.files.append(filepath)
-                    files_changed = True
+                if filepath not in files and filepath not in readonly_files:
+                    files.append(filepath)
+                    events.append(FileAdded(filepath))
                 continue
             
             # Check for dropped files
             dropped_match = dropped_pattern.search(line)
             if dropped_match:
                 filepath = dropped_match.group(1)
-                if filepath in self.files:
-                    self.files.remove(filepath)
-                    files_changed = True
-                if filepath in self.readonly_files:
-                    self.readonly_files.remove(filepath)
-                    files_changed = True
+                if filepath in files:
+                    files.remove(filepath)
+                    events.append(FileDropped(filepath, False))
+                if filepath in readonly_files:
+                    readonly_files.remove(filepath)
+                    events.append(FileDropped(filepath, True))
         
-        return (model_changed, mode_changed, files_changed)
+        return events
 
     def to_dict(self):
         """Export context as dictionary."""
+        snapshot = self.snapshot
         return {
-            'project_root': self.project_root,
-            'files': self.files[:],
-            'readonly_files': self.readonly_files[:],
-            'mode': self.mode,
-            'model': self.model,
+            'project_root': snapshot.project_root,
+            'files': list(snapshot.files),
+            'readonly_files': list(snapshot.readonly_files),
+            'mode': snapshot.mode,
+            'model': snapshot.model,
             'is_running': self.is_running,
             'api_keys': self.api_keys[:]
         }
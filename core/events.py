@@ -0,0 +1,61 @@
+# AiderSavvy - Typed history events and the bus publishing them
+from collections import namedtuple
+
+# Parsed from the history by AiderContext.sync_incremental_from_history
+SessionStarted = namedtuple('SessionStarted', 'title')
+TurnStarted = namedtuple('TurnStarted', 'title')
+ModelChanged = namedtuple('ModelChanged', 'model previous')
+ModeChanged = namedtuple('ModeChanged', 'mode previous')
+FileAdded = namedtuple('FileAdded', 'path')
+ReadOnlyAdded = namedtuple('ReadOnlyAdded', 'path')
+FileDropped = namedtuple('FileDropped', 'path readonly')
+
+# Published by AiderFileWatcher
+OutputChunk = namedtuple('OutputChunk', 'text')
+# The history was truncated or replaced, output restarts at offset start
+HistoryReplaced = namedtuple('HistoryReplaced', 'start')
+# Model, mode and files were re-read from the last session as a whole
+StateSynced = namedtuple('StateSynced', '')
+
+# Published by TokenEstimator once files were sampled in the background
+TokensEstimated = namedtuple('TokensEstimated', 'paths')
+
+# Published by AiderWatchdog when the aider process' health changes
+HealthChanged = namedtuple('HealthChanged', 'state previous')
+
+OPTION_EVENTS = (ModelChanged, ModeChanged)
+FILE_EVENTS = (FileAdded, ReadOnlyAdded, FileDropped)
+
+
+class EventBus:
+    """In-process publish/subscribe for one session's history events.
+
+    Subscribers register for event types and receive, per publish, the
+    batch of matching events in history order. The watcher publishes one
+    batch per poll, so a burst of appended lines costs one call per
+    subscriber instead of one per change."""
+
+    def __init__(self):
+        self.subscribers = []  # (event types, handler)
+
+    def subscribe(self, event_types, handler):
+        """Call handler(events) with the events of the given types."""
+        self.subscribers.append((tuple(event_types), handler))
+
+    def unsubscribe(self, handler):
+        """Stop calling handler."""
+        self.subscribers = [s for s in self.subscribers if s[1] != handler]
+
+    def publish(self, events):
+        """Deliver a batch of events to their subscribers, in subscription order."""
+        if not events:
+            return
+        for event_types, handler in list(self.subscribers):
+            batch = [event for event in events if isinstance(event, event_types)]
+            if not batch:
+                continue
+            try:
+                handler(batch)
+            except Exception as e:
+                # One failing subscriber must not starve the others
+                print("AiderSavvy: Event handler error: {0}".format(e))
@@ -1,44 +1,93 @@
 # AiderSavvy - File watcher for Aider output and session changes
 import sublime
+import codecs
 import os
+import time
+
+from .events import OutputChunk, HistoryReplaced, StateSynced
+from .profiling import profiler, profiled
+from .settings import get_setting
 
 
 class AiderFileWatcher:
-    """Watches Aider chat history file for live updates and session changes."""
+    """Watches Aider chat history file for live updates and session changes.
+
+    What one poll finds is published as a single batch of events on the
+    context's event bus: OutputChunk for the new text, followed by the
+    changes the history parser found in it. The session's watchdog, if
+    any, is checked after each poll with the history's mtime."""
+
+    TAIL_BYTES = 64
 
-    def __init__(self, context, output_callback, session_callback=None):
+    def __init__(self, context, watchdog=None):
         self.context = context
-        self.output_callback = output_callback
-        self.session_callback = session_callback
+        self.watchdog = watchdog
         self.last_size = 0
         self.last_mtime = 0
         self.running = False
         self.poll_interval = 1000  # milliseconds
+        self.poll_generation = 0
+        # Last bytes before last_size, to notice a truncated file that regrew
+        self.tail = b""
+        self.decoder = codecs.getincrementaldecoder('utf-8')('replace')
+        # Where the tail window read after a truncation starts
+        self.replaced_from = 0
 
     def start(self):
         """Start watching the history file."""
         self.running = True
+        self.poll_generation += 1
         self._reset_position()
-        self._poll()
+        self._poll(self.poll_generation)
 
     def stop(self):
         """Stop watching."""
         self.running = False
+        self.context.history_index.save()
+
+    def pause(self):
+        """Stop polling but keep the read position for a later resume."""
+        self.running = False
+
+    def resume(self):
+        """Resume polling, catching up on everything appended while paused."""
+        if self.running:
+            return
+        self.running = True
+        self.poll_generation += 1
+        self._poll(self.poll_generation)
 
     def _reset_position(self):
         """Reset to current end of file."""
         history_path = self.context.get_aider_history_path()
+        # Index whatever was written before we started watching
+        self.context.history_index.update(history_path)
+        self.context.reset_incremental_sync()
+        self.decoder.reset()
+        self.tail = b""
         if os.path.exists(history_path):
             self.last_size = os.path.getsize(history_path)
             self.last_mtime = os.path.getmtime(history_path)
+            self.tail = self._read_tail(history_path, self.last_size)
         else:
             self.last_size = 0
             self.last_mtime = 0
 
-    def _poll(self):
+    def _read_tail(self, history_path, end):
+        """Read the bytes just before end."""
+        start = max(0, end - self.TAIL_BYTES)
+        with open(history_path, 'rb') as f:
+            f.seek(start)
+            return f.read(end - start)
+
+    @profiled("file_watcher._poll")
+    def _poll(self, generation=None):
         """Poll for file changes."""
         if not self.running:
             return
+        # A stop/start or pause/resume left an older poll loop scheduled
+        if generation is not None and generation != self.poll_generation:
+            return
 
         history_path = self.context.get_aider_history_path()
 
@@ -50,34 +99,62 @@ class AiderFileWatcher:
                 # Check if file was modified
                 if current_mtime > self.last_mtime or current_size != self.last_size:
                     new_content = ""
+                    replaced = False
+                    events = []
+                    index = self.context.history_index
                     
                     if current_size > self.last_size:
-                        # Read only new content
-                        with open(history_path, 'r', encoding='utf-8', errors='replace') as f:
-                            f.seek(self.last_size)
-                            new_content = f.read()
+                        # Read only new content, re-reading the tail we already
+                        # have to make sure the file was not replaced meanwhile
+                        with open(history_path, 'rb') as f:
+                            f.seek(self.last_size - len(self.tail))
+                            data = f.read()
+                        if data.startswith(self.tail):
+                            data = data[len(self.tail):]
+                            # Characters split across reads are completed next time
+                            new_content = self.decoder.decode(data)
+                            profiler.count("file_watcher.bytes_read", len(data))
+                            turn_count = len(index.turns)
+                            index.feed(history_path, data, self.last_size)
+                            if len(index.turns) > turn_count:
+                                # A turn was closed, add it to the search index
+                                self.context.search_index.update_later(index)
+                            # The file may have grown since it was stat'ed
+                            current_size = self.last_size + len(data)
+                            self.tail = (self.tail + data)[-self.TAIL_BYTES:]
+                        else:
+                            replaced = True
                     elif current_size < self.last_size:
-                        # File was truncated or recreated, read everything
-                        with open(history_path, 'r', encoding='utf-8', errors='replace') as f:
-                            new_content = f.read()
+                        replaced = True
+
+                    if replaced:
+                        new_content, current_size = self._read_replaced(history_path)
+                        # Output restarts from the tail window of the new file
+                        events.append(HistoryReplaced(self.replaced_from))
+                        # The window holds turns already counted (e.g. after an archive)
+                        self.context.metrics.discard_partial()
                     
                     if new_content:
-                        # Call output callback for display
-                        if self.output_callback:
-                            self.output_callback(new_content)
+                        if not replaced:
+                            # Per-turn tokens, cost and timing from arrival times
+                            self.context.metrics.feed(new_content, time.time(), self.context.model)
+                        events.append(OutputChunk(new_content))
                         
                         # Parse new content for session changes (model, mode, files)
-                        if self.session_callback:
-                            model_changed, mode_changed, files_changed = \
-                                self.context.sync_incremental_from_history(new_content)
-                            
-                            if model_changed or mode_changed:
-                                self.session_callback("OPTIONS")
-                            if files_changed:
-                                self.session_callback("FILES")
+                        if not replaced:
+                            events.extend(self.context.sync_incremental_from_history(new_content))
+
+                    if replaced:
+                        # State comes from the last session, not the tail window
+                        self.context.sync_from_existing_session()
+                        events.append(StateSynced())
 
                     self.last_size = current_size
                     self.last_mtime = current_mtime
+                    self.context.events.publish(events)
+
+            if self.watchdog:
+                self.watchdog.check(self.last_mtime)
 
         except (OSError, IOError) as e:
             print("AiderSavvy: File watcher error: {0}".format(e))
@@ -86,15 +163,37 @@ class AiderFileWatcher:
 
         # Schedule next poll
         if self.running:
-            sublime.set_timeout(self._poll, self.poll_interval)
+            sublime.set_timeout(lambda: self._poll(generation), self.poll_interval)
 
-    def get_full_history(self):
-        """Read the entire history file."""
-        history_path = self.context.get_aider_history_path()
-        if os.path.exists(history_path):
-            try:
-                with open(history_path, 'r', encoding='utf-8', errors='replace') as f:
-                    return f.read()
-            except Exception:
-                pass
-        return ""
+    def _read_replaced(self, history_path):
+        """The file was truncated or recreated, read its tail window again."""
+        index = self.context.history_index
+        index.update(history_path)
+        self.replaced_from, end = index.tail_range(self.tail_window_bytes())
+        with open(history_path, 'rb') as f:
+            f.seek(self.replaced_from)
+            data = f.read(end - self.replaced_from)
+        profiler.count("file_watcher.bytes_read", len(data))
+        self.context.reset_incremental_sync()
+        self.decoder.reset()
+        self.tail = self._read_tail(history_path, end)
+        return self.decoder.decode(data), end
+
+    def tail_window_bytes(self):
+        """Size of the history window loaded into the Output tab."""
+        return get_setting("output_tail_kb", 256) * 1024
+
+    def read_window(self, max_bytes, end=None):
+        """Read up to max_bytes of history ending at end, from a line or session start.
+
+        end defaults to what the watcher delivered so far, so appends that
+        follow continue the window. Returns (start offset, content)."""
+        index = self.context.history_index
+        if end is None:
+            # Leave out a character split at the end, the decoder still holds it
+            end = self.last_size - len(self.decoder.getstate()[0])
+        start, end = index.older_range(end, max_bytes)
+        if start >= end:
+            return end, ""
+        profiler.count("file_watcher.bytes_read", end - start)
+        return start, index.read_range(start, end)
@@ -0,0 +1,119 @@
+# AiderSavvy - Compressed archive of old chat history sessions
+import gzip
+import json
+import os
+
+ARCHIVE_DIR = ".aider.history.archive"
+INDEX_FILE = "index.json"
+
+
+def archive_dir(history_path):
+    """Archive directory of a history file, next to it."""
+    return os.path.join(os.path.dirname(history_path), ARCHIVE_DIR,
+                        os.path.basename(history_path))
+
+
+class HistoryArchive:
+    """Old history sessions stored as one gzip segment per session.
+
+    index.json lists the segments with the offsets of their sessions and
+    turns, so the archive can be navigated and searched without
+    decompressing anything but the segment being read. Archived sessions
+    and turns come before the ones of the live file, which keeps turn
+    numbers stable when sessions are archived.
+
+    segments: list of {"file", "size", "sessions", "turns"} where sessions
+              are [offset, line, title] and turns [offset, line, session, title]
+              relative to the segment, with global session numbers
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        # Fingerprint of the original history, it identifies the history for caches
+        self.fingerprint = None
+        self.segments = []
+        self.sessions = []  # [segment, offset, line, title]
+        self.turns = []  # [segment, offset, line, session, title]
+        self._cached = (None, None)
+        self._load()
+
+    def _load(self):
+        """Read the segment index."""
+        if not self.directory:
+            return
+        index_file = os.path.join(self.directory, INDEX_FILE)
+        if not os.path.exists(index_file):
+            return
+        try:
+            with open(index_file, 'r') as f:
+                data = json.load(f)
+            self.fingerprint = data['fingerprint']
+            for segment in data['segments']:
+                self._add_entries(segment)
+        except (OSError, IOError, ValueError, KeyError) as e:
+            print("AiderSavvy: Could not read history archive index: {0}".format(e))
+            self.segments, self.sessions, self.turns = [], [], []
+
+    def _add_entries(self, segment):
+        """Register a segment's sessions and turns."""
+        number = len(self.segments)
+        self.segments.append(segment)
+        for offset, line, title in segment['sessions']:
+            self.sessions.append([number, offset, line, title])
+        for offset, line, session, title in segment['turns']:
+            self.turns.append([number, offset, line, session, title])
+
+    def _save(self):
+        """Write the segment index atomically."""
+        index_file = os.path.join(self.directory, INDEX_FILE)
+        tmp_file = index_file + ".tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump({'fingerprint': self.fingerprint, 'segments': self.segments}, f)
+        os.replace(tmp_file, index_file)
+
+    def add(self, segments, fingerprint):
+        """Store segments given as (data, sessions, turns), then save the index."""
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        if not self.segments:
+            self.fingerprint = fingerprint
+        for data, sessions, turns in segments:
+            name = "segment-{0:05d}.md.gz".format(len(self.segments) + 1)
+            with gzip.open(os.path.join(self.directory, name), 'wb') as f:
+                f.write(data)
+            self._add_entries({'file': name, 'size': len(data),
+                               'sessions': sessions, 'turns': turns})
+        self._save()
+
+    # Reading
+
+    def read_segment(self, number):
+        """Decompressed bytes of a segment, the last one read is kept."""
+        if self._cached[0] != number:
+            path = os.path.join(self.directory, self.segments[number]['file'])
+            with gzip.open(path, 'rb') as f:
+                self._cached = (number, f.read())
+        return self._cached[1]
+
+    def session_range(self, number):
+        """(segment, start, end) of archived session number."""
+        segment, start = self.sessions[number][:2]
+        end = self.segments[segment]['size']
+        if number + 1 < len(self.sessions) and self.sessions[number + 1][0] == segment:
+            end = self.sessions[number + 1][1]
+        return (segment, start, end)
+
+    def turn_range(self, number):
+        """(segment, start, end) of archived turn number, up to the next turn or session."""
+        segment, start = self.turns[number][:2]
+        end = self.segments[segment]['size']
+        if number + 1 < len(self.turns) and self.turns[number + 1][0] == segment:
+            end = self.turns[number + 1][1]
+        for session in self.segments[segment]['sessions']:
+            if start < session[0] < end:
+                end = session[0]
+        return (segment, start, end)
+
+    def read(self, segment, start, end):
+        """Decode a byte range of a segment."""
+        return self.read_segment(segment)[start:end].decode('utf-8', 'replace')
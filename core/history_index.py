@@ -0,0 +1,415 @@
+# AiderSavvy - Byte offset index over the chat history
+import hashlib
+import json
+import os
+import time
+
+from .history_archive import HistoryArchive, archive_dir
+
+SESSION_MARKER = b"# aider chat started at"
+TURN_MARKER = b"#### "
+
+FINGERPRINT_BYTES = 256
+TITLE_LENGTH = 80
+LINE_SCAN_BYTES = 64 * 1024
+
+
+class HistoryIndex:
+    """Records the byte offset of every session and user turn in the history.
+
+    Sessions start at "# aider chat started at" lines and user turns at
+    "####" lines. The index is fed incrementally with the bytes the watcher
+    reads, so navigating to session N or turn N never needs a scan, and
+    loading one only reads its byte range. It is persisted in the cache
+    directory and revalidated (size + leading bytes fingerprint) on load.
+
+    Sessions moved to the HistoryArchive come first in the global numbering
+    used by session_count(), session_info(), read_turn() and friends.
+
+    sessions: list of [offset, line, title]
+    turns:    list of [offset, line, session index, title]
+
+    Turns written before any session header have session index -1.
+    """
+
+    SAVE_INTERVAL = 10  # seconds
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir
+        self.path = None
+        self.archive = HistoryArchive()
+        self._reset()
+
+    def _reset(self):
+        """Forget everything indexed so far."""
+        self.size = 0
+        self.line_count = 0
+        self.sessions = []
+        self.turns = []
+        self.fingerprint = None
+        self._partial = b""
+        self._last_save = 0
+
+    # Building
+
+    def update(self, path):
+        """Catch up with the history file, reading only appended bytes.
+
+        Returns True if the index changed."""
+        if path != self.path:
+            self.path = path
+            self.archive = HistoryArchive(archive_dir(path))
+            self._reset()
+            self._load()
+
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            if self.size:
+                self._reset()
+                return True
+            return False
+
+        if size < self.size or not self._fingerprint_matches():
+            # Truncated or replaced: rebuild from scratch
+            self._reset()
+
+        if size == self.size:
+            return False
+
+        with open(path, 'rb') as f:
+            f.seek(self.size)
+            data = f.read()
+        self._index_bytes(data)
+        self.save()
+        return True
+
+    def feed(self, path, data, offset):
+        """Index bytes the watcher read at offset.
+
+        Falls back to a catch-up read if the data does not continue where
+        the index stopped."""
+        if path != self.path or offset != self.size:
+            self.update(path)
+            return
+        self._index_bytes(data)
+        self.maybe_save()
+
+    def _index_bytes(self, data):
+        """Scan appended bytes for session and turn markers."""
+        if not data:
+            return
+
+        start = self.size - len(self._partial)
+        buffer = self._partial + data
+        lines = buffer.split(b"\n")
+        self._partial = lines.pop()
+
+        offset = start
+        for line in lines:
+            self.line_count += 1
+            if line.startswith(SESSION_MARKER):
+                title = line[len(SESSION_MARKER):]
+                self.sessions.append([offset, self.line_count, self._title(title)])
+            elif line.startswith(TURN_MARKER):
+                self.turns.append([offset, self.line_count, len(self.sessions) - 1,
+                                   self._title(line[len(TURN_MARKER):])])
+            offset += len(line) + 1
+
+        self.size += len(data)
+        if self.fingerprint is None and self.size >= FINGERPRINT_BYTES:
+            self.fingerprint = self._read_fingerprint()
+
+    def _title(self, raw):
+        """Decode a short display title from a marker line."""
+        title = raw.decode('utf-8', 'replace').strip()
+        if len(title) > TITLE_LENGTH:
+            title = title[:TITLE_LENGTH - 3] + "..."
+        return title
+
+    def _read_fingerprint(self):
+        """Hash of the leading bytes, to notice a replaced file."""
+        try:
+            with open(self.path, 'rb') as f:
+                return hashlib.sha1(f.read(FINGERPRINT_BYTES)).hexdigest()
+        except (OSError, IOError):
+            return None
+
+    def _fingerprint_matches(self):
+        """Check the file still starts with the bytes we indexed."""
+        if self.fingerprint is None:
+            return True
+        return self._read_fingerprint() == self.fingerprint
+
+    # Lookups
+
+    def session_range(self, number):
+        """Byte range (start, end) of session number (0-based)."""
+        start = self.sessions[number][0]
+        if number + 1 < len(self.sessions):
+            end = self.sessions[number + 1][0]
+        else:
+            end = self.size
+        return (start, end)
+
+    def turn_range(self, number):
+        """Byte range (start, end) of turn number (0-based).
+
+        A turn runs until the next turn or the next session header."""
+        start = self.turns[number][0]
+        end = self.size
+        if number + 1 < len(self.turns):
+            end = self.turns[number + 1][0]
+        session = self.turns[number][2]
+        if session + 1 < len(self.sessions):
+            end = min(end, self.sessions[session + 1][0])
+        return (start, end)
+
+    def aligned_start(self, start, end):
+        """First session or line start in [start, end), for loading from a byte cut.
+
+        A session header in the first half of the range is preferred,
+        otherwise the first line after start."""
+        if start <= 0:
+            return 0
+        for session in self.sessions:
+            if start <= session[0] < start + (end - start) // 2:
+                return session[0]
+        with open(self.path, 'rb') as f:
+            # From start - 1 so that a line starting right at start is kept
+            f.seek(start - 1)
+            data = f.read(min(end - start + 1, LINE_SCAN_BYTES))
+        newline = data.find(b"\n")
+        if newline < 0:
+            # One huge line, cut it rather than scanning further
+            return start
+        return start + newline
+
+    def tail_range(self, max_bytes):
+        """Byte range of the last max_bytes of history, aligned to a line or session."""
+        return (self.aligned_start(max(0, self.size - max_bytes), self.size), self.size)
+
+    def older_range(self, offset, max_bytes):
+        """Byte range of up to max_bytes of history before offset, aligned likewise."""
+        return (self.aligned_start(max(0, offset - max_bytes), offset), offset)
+
+    def read_range(self, start, end):
+        """Read and decode a byte range of the history file."""
+        with open(self.path, 'rb') as f:
+            f.seek(start)
+            return f.read(end - start).decode('utf-8', 'replace')
+
+    # Archived and live history
+
+    @property
+    def history_id(self):
+        """Identifies the history for caches, it survives archiving."""
+        if self.archive.segments:
+            return self.archive.fingerprint
+        return self.fingerprint
+
+    def session_count(self):
+        return len(self.archive.sessions) + len(self.sessions)
+
+    def turn_count(self):
+        return len(self.archive.turns) + len(self.turns)
+
+    def session_info(self, number):
+        """(title, line, archived) of session number."""
+        archived = len(self.archive.sessions)
+        if number < archived:
+            segment, offset, line, title = self.archive.sessions[number]
+            return (title, line, True)
+        offset, line, title = self.sessions[number - archived]
+        return (title, line, False)
+
+    def turn_info(self, number):
+        """(title, line, session number, archived) of turn number."""
+        archived = len(self.archive.turns)
+        if number < archived:
+            segment, offset, line, session, title = self.archive.turns[number]
+            return (title, line, session, True)
+        offset, line, session, title = self.turns[number - archived]
+        if session >= 0:
+            session += len(self.archive.sessions)
+        return (title, line, session, False)
+
+    def session_turn_counts(self):
+        """Number of user turns in each session."""
+        counts = [0] * self.session_count()
+        for turn in self.archive.turns:
+            if turn[3] >= 0:
+                counts[turn[3]] += 1
+        for turn in self.turns:
+            if turn[2] >= 0:
+                counts[turn[2] + len(self.archive.sessions)] += 1
+        return counts
+
+    def live_range(self, kind, number):
+        """Byte range of a session or turn in the live file, None if archived."""
+        if kind == 'session':
+            number -= len(self.archive.sessions)
+            return self.session_range(number) if number >= 0 else None
+        number -= len(self.archive.turns)
+        return self.turn_range(number) if number >= 0 else None
+
+    def read_session(self, number):
+        """Text of session number, archived or live."""
+        live = self.live_range('session', number)
+        if live:
+            return self.read_range(*live)
+        return self.archive.read(*self.archive.session_range(number))
+
+    def read_turn(self, number, limit=None):
+        """Text of turn number, archived or live, up to limit bytes."""
+        for _, text in self.read_turns(number, number + 1, limit):
+            return text
+
+    def read_turns(self, first, last, limit=None):
+        """Yield (number, text) for turns first..last-1, opening the live file once."""
+        archived = len(self.archive.turns)
+        for number in range(first, min(last, archived)):
+            segment, start, end = self.archive.turn_range(number)
+            if limit:
+                end = min(end, start + limit)
+            yield number, self.archive.read(segment, start, end)
+        if last <= archived:
+            return
+        with open(self.path, 'rb') as f:
+            for number in range(max(first, archived), last):
+                start, end = self.turn_range(number - archived)
+                if limit:
+                    end = min(end, start + limit)
+                f.seek(start)
+                yield number, f.read(end - start).decode('utf-8', 'replace')
+
+    def archive_sessions(self):
+        """Move every session but the last one into the archive.
+
+        Each session becomes a gzip segment, then the live file is rewritten
+        with the last session only. Returns the number of sessions archived."""
+        self.update(self.path)
+        if len(self.sessions) < 2:
+            return 0
+
+        cut = self.sessions[-1][0]
+        starts = [session[0] for session in self.sessions[:-1]]
+        if starts[0] > 0:
+            # Turns written before the first session header
+            starts.insert(0, 0)
+        bounds = list(zip(starts, starts[1:] + [cut]))
+        archived_sessions = len(self.archive.sessions)
+
+        # Lines are renumbered from the start of each segment
+        header_lines = dict((session[0], session[1]) for session in self.sessions)
+
+        segments = []
+        with open(self.path, 'rb') as f:
+            for start, end in bounds:
+                f.seek(start)
+                data = f.read(end - start)
+                first_line = header_lines.get(start, 1)
+                sessions = [[offset - start, line - first_line + 1, title]
+                            for offset, line, title in self.sessions if start <= offset < end]
+                turns = []
+                for offset, line, session, title in self.turns:
+                    if start <= offset < end:
+                        if session >= 0:
+                            session += archived_sessions
+                        turns.append([offset - start, line - first_line + 1, session, title])
+                segments.append((data, sessions, turns))
+
+        self.archive.add(segments, self.fingerprint)
+        self._rewrite_live(cut)
+
+        # Index the now small live file from scratch
+        self._reset()
+        self.update(self.path)
+        return len(self.archive.sessions) - archived_sessions
+
+    def _rewrite_live(self, cut):
+        """Replace the live file with its bytes from cut on.
+
+        What aider appends meanwhile is copied too: the file is replaced
+        only once its size is what was copied, else the copy goes on."""
+        tmp_file = self.path + ".archiving"
+        position = cut
+        mode = 'wb'
+        while True:
+            with open(self.path, 'rb') as source, open(tmp_file, mode) as target:
+                source.seek(position)
+                while True:
+                    data = source.read(1024 * 1024)
+                    if not data:
+                        break
+                    target.write(data)
+                position = source.tell()
+            if os.path.getsize(self.path) == position:
+                break
+            mode = 'ab'
+        os.replace(tmp_file, self.path)
+
+    # Persistence
+
+    def _cache_file(self):
+        """Cache file for the current history path."""
+        if not self.cache_dir or not self.path:
+            return None
+        digest = hashlib.sha1(self.path.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, "history-{0}.json".format(digest))
+
+    def maybe_save(self):
+        """Save if the last save is old enough."""
+        if time.time() - self._last_save >= self.SAVE_INTERVAL:
+            self.save()
+
+    def save(self):
+        """Persist the index, up to the last complete line."""
+        cache_file = self._cache_file()
+        if not cache_file:
+            return
+        self._last_save = time.time()
+        data = {
+            'path': self.path,
+            'size': self.size - len(self._partial),
+            'line_count': self.line_count,
+            'fingerprint': self.fingerprint,
+            'sessions': self.sessions,
+            'turns': self.turns,
+        }
+        try:
+            if not os.path.isdir(self.cache_dir):
+                os.makedirs(self.cache_dir)
+            tmp_file = cache_file + ".tmp"
+            with open(tmp_file, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp_file, cache_file)
+        except (OSError, IOError) as e:
+            print("AiderSavvy: Could not save history index: {0}".format(e))
+
+    def _load(self):
+        """Load a persisted index for the current path, if still valid."""
+        cache_file = self._cache_file()
+        if not cache_file or not os.path.exists(cache_file):
+            return
+        try:
+            with open(cache_file, 'r') as f:
+                data = json.load(f)
+        except (OSError, IOError, ValueError):
+            return
+
+        if data.get('path') != self.path:
+            return
+        try:
+            if os.path.getsize(self.path) < data['size']:
+                return
+        except OSError:
+            return
+
+        self.size = data['size']
+        self.line_count = data['line_count']
+        self.fingerprint = data['fingerprint']
+        self.sessions = data['sessions']
+        self.turns = data['turns']
+        if not self._fingerprint_matches():
+            self._reset()
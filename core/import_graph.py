@@ -0,0 +1,290 @@
+# AiderSavvy - Import graph of the project's Python and JS/TS files
+import os
+import posixpath
+import re
+import threading
+import time
+
+from .profiling import profiled
+
+PYTHON_EXTENSIONS = ('.py', '.pyi')
+SCRIPT_EXTENSIONS = ('.ts', '.tsx', '.js', '.jsx', '.mjs', '.cjs')
+
+# Files larger than this are not parsed (generated or bundled code)
+MAX_PARSE_BYTES = 1024 * 1024
+
+PY_IMPORT_RE = re.compile(r"^[ \t]*import[ \t]+([\w. \t,]+)", re.M)
+PY_FROM_RE = re.compile(r"^[ \t]*from[ \t]+(\.*)([\w.]*)[ \t]+import[ \t]+(\([^)]*\)|[^\n#;]*)", re.M)
+SCRIPT_IMPORT_RE = re.compile(
+    r"""(?:^|[;\s])(?:import|export)\s[\w*{}\s,$]*?\bfrom\s*['"]([^'"\n]+)['"]"""
+    r"""|(?:^|[;\s])import\s*['"]([^'"\n]+)['"]"""
+    r"""|\b(?:require|import)\s*\(\s*['"]([^'"\n]+)['"]\s*\)""", re.M)
+
+
+def python_specs(text):
+    """Import specs of Python source: (level, module, imported names)."""
+    specs = []
+    for match in PY_IMPORT_RE.finditer(text):
+        for part in match.group(1).split(","):
+            module = part.strip().split()[0] if part.strip() else ""
+            if module:
+                specs.append((0, module, ()))
+    for match in PY_FROM_RE.finditer(text):
+        names = match.group(3).strip("() \t\n").replace("\n", " ")
+        names = tuple(name.strip().split()[0] for name in names.split(",") if name.strip())
+        specs.append((len(match.group(1)), match.group(2), names))
+    return specs
+
+
+def script_specs(text):
+    """Relative module specifiers imported or required by JS/TS source."""
+    specs = []
+    for match in SCRIPT_IMPORT_RE.finditer(text):
+        spec = match.group(1) or match.group(2) or match.group(3)
+        # Bare specifiers are packages (node_modules), not project files
+        if spec.startswith("./") or spec.startswith("../"):
+            specs.append(spec)
+    return specs
+
+
+class ImportGraph:
+    """Direct import edges between the project's Python and JS/TS files.
+
+    Built from the project file index in the background: every source file
+    is parsed once with regexes for import statements, its import specs
+    are kept, and resolved against the project's modules. A saved file is
+    parsed again on its own; a new file re-resolves the kept specs without
+    reading anything. Related files are then answered from memory.
+
+    imports: {relative path: set of relative paths it imports}
+    importers: {relative path: set of relative paths importing it}
+    """
+
+    def __init__(self):
+        self.root = None
+        self.built_at = None
+        self.specs = {}  # {relative path: import specs}
+        self.mtimes = {}  # {relative path: mtime when parsed}
+        self.modules = {}  # {dotted module name: relative path}
+        self.imports = {}
+        self.importers = {}
+        # A background build is running, saves wait in queued
+        self.building = False
+        self.queued = set()  # Absolute paths saved during the build
+        self._lock = threading.Lock()
+
+    def is_built(self, root):
+        """Whether the graph is up to date for root."""
+        return self.built_at is not None and root == self.root
+
+    def invalidate(self):
+        """Make the next use build the graph again (unchanged files are not parsed again)."""
+        self.built_at = None
+
+    @profiled("import_graph.build")
+    def build(self, project_index):
+        """Parse the source files of a built project index and link them, then the files saved meanwhile."""
+        with self._lock:
+            self.building = True
+        try:
+            if project_index.root != self.root:
+                self.specs = {}
+                self.mtimes = {}
+            self.root = project_index.root
+            sources = [path for path in list(project_index.files) if self._is_source(path)]
+            specs = {}
+            for rel_path in sources:
+                specs[rel_path] = self._parse(rel_path, self.specs.get(rel_path))
+            self.specs = specs
+            self._index_modules()
+            self._resolve_all()
+            self.built_at = time.time()
+        finally:
+            with self._lock:
+                self.building = False
+                queued, self.queued = self.queued, set()
+        for path in queued:
+            self.update(path)
+        return len(sources)
+
+    def update(self, path):
+        """Parse a saved file (absolute path) again and relink it, or after the running build."""
+        with self._lock:
+            if self.building:
+                self.queued.add(path)
+                return
+            self._update(path)
+
+    def _update(self, path):
+        if self.built_at is None or not self.root:
+            return
+        rel_path = os.path.relpath(path, self.root).replace(os.sep, "/")
+        if rel_path.startswith("../") or not self._is_source(rel_path):
+            return
+        known = rel_path in self.specs
+        self.specs[rel_path] = self._parse(rel_path)
+        if known:
+            self._link(rel_path)
+        else:
+            # A new module may be what other files were importing
+            self._index_modules()
+            self._resolve_all()
+
+    # Parsing
+
+    def _is_source(self, rel_path):
+        return rel_path.endswith(PYTHON_EXTENSIONS) or rel_path.endswith(SCRIPT_EXTENSIONS)
+
+    def _parse(self, rel_path, previous=None):
+        """Import specs of a file, reusing previous ones if it did not change."""
+        path = os.path.join(self.root, rel_path)
+        try:
+            stat = os.stat(path)
+            if previous is not None and self.mtimes.get(rel_path) == stat.st_mtime:
+                return previous
+            if stat.st_size > MAX_PARSE_BYTES:
+                specs = []
+            else:
+                with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                    text = f.read()
+                if rel_path.endswith(PYTHON_EXTENSIONS):
+                    specs = python_specs(text)
+                else:
+                    specs = script_specs(text)
+        except (OSError, IOError):
+            self.mtimes.pop(rel_path, None)
+            return []
+        self.mtimes[rel_path] = stat.st_mtime
+        return specs
+
+    # Resolution
+
+    def _index_modules(self):
+        """Map dotted module names to the Python files defining them.
+
+        A module is known by its path from the root and, inside packages
+        (directories with __init__.py), from the top package's parent, as
+        for a src/ layout."""
+        packages = set(posixpath.dirname(path) for path in self.specs
+                       if posixpath.basename(path) == "__init__.py")
+        modules = {}
+        for rel_path in sorted(self.specs):
+            if not rel_path.endswith(PYTHON_EXTENSIONS):
+                continue
+            parts = rel_path[:rel_path.rindex(".")].split("/")
+            if parts[-1] == "__init__":
+                parts.pop()
+            if not parts:
+                continue
+            modules.setdefault(".".join(parts), rel_path)
+            # The innermost directory chain that are all packages
+            top = len(parts) - 1
+            while top > 0 and "/".join(parts[:top]) in packages:
+                top -= 1
+            if top > 0:
+                modules.setdefault(".".join(parts[top:]), rel_path)
+        self.modules = modules
+
+    def _resolve_python(self, rel_path, spec):
+        """Files imported by one Python import spec."""
+        level, module, names = spec
+        if level:
+            directory = posixpath.dirname(rel_path)
+            parts = directory.split("/") if directory else []
+            if level > 1:
+                parts = parts[:max(len(parts) - (level - 1), 0)]
+            if module:
+                parts = parts + module.split(".")
+            return self._relative_files(parts, names)
+
+        found = []
+        for name in names:
+            target = self.modules.get(module + "." + name) if name != "*" else None
+            if target:
+                found.append(target)
+        if not found:
+            parts = module.split(".")
+            while parts:
+                target = self.modules.get(".".join(parts))
+                if target:
+                    found.append(target)
+                    break
+                parts.pop()
+        return found
+
+    def _relative_files(self, parts, names):
+        """Files of a relative import of names from the module at path parts."""
+        found = []
+        for name in names:
+            target = self._module_file(parts + [name]) if name != "*" else None
+            if target:
+                found.append(target)
+        if not found and parts:
+            target = self._module_file(parts)
+            if target:
+                found.append(target)
+        return found
+
+    def _module_file(self, parts):
+        """Python file of the module at path parts from the root."""
+        path = "/".join(parts)
+        for candidate in (path + ".py", path + ".pyi", path + "/__init__.py"):
+            if candidate in self.specs:
+                return candidate
+        return None
+
+    def _resolve_script(self, rel_path, spec):
+        """Files imported by one relative JS/TS specifier."""
+        target = posixpath.normpath(posixpath.join(posixpath.dirname(rel_path), spec))
+        if target in self.specs:
+            return [target]
+        stem = target
+        # "./x.js" is how TS imports "./x.ts" under ESM resolution
+        for extension in SCRIPT_EXTENSIONS:
+            if target.endswith(extension):
+                stem = target[:-len(extension)]
+                break
+        for extension in SCRIPT_EXTENSIONS:
+            for candidate in (stem + extension, target + "/index" + extension):
+                if candidate in self.specs:
+                    return [candidate]
+        return []
+
+    def _link(self, rel_path):
+        """Replace the import edges of one file."""
+        for target in self.imports.pop(rel_path, ()):
+            importers = self.importers.get(target)
+            if importers:
+                importers.discard(rel_path)
+        resolve = self._resolve_python if rel_path.endswith(PYTHON_EXTENSIONS) else self._resolve_script
+        targets = set()
+        for spec in self.specs.get(rel_path, ()):
+            targets.update(resolve(rel_path, spec))
+        targets.discard(rel_path)
+        self.imports[rel_path] = targets
+        for target in targets:
+            self.importers.setdefault(target, set()).add(rel_path)
+
+    def _resolve_all(self):
+        """Link every file from its kept specs."""
+        self.imports = {}
+        self.importers = {}
+        for rel_path in self.specs:
+            self._link(rel_path)
+
+    # Lookups
+
+    def related(self, rel_paths):
+        """Direct imports and importers of rel_paths, not among them.
+
+        Returns [(relative path, reason)] sorted by path."""
+        sources = set(rel_paths)
+        related = {}
+        for source in rel_paths:
+            for target in self.imports.get(source, ()):
+                if target not in sources:
+                    related.setdefault(target, "imported by {0}".format(source))
+            for importer in self.importers.get(source, ()):
+                if importer not in sources:
+                    related.setdefault(importer, "imports {0}".format(source))
+        return sorted(related.items())
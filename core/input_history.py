@@ -0,0 +1,270 @@
+# AiderSavvy - Index of the prompts typed in aider (.aider.input.history)
+import hashlib
+import heapq
+import json
+import os
+
+FINGERPRINT_BYTES = 256
+
+# Ranking: how many newer prompts halve the recency bonus, and its weight
+RECENCY_SCALE = 200.0
+RECENCY_WEIGHT = 0.5
+
+
+def fuzzy_score(query, text):
+    """Score in (0, 1] if the characters of query appear in order in text, else None.
+
+    Both are expected lowercased. A substring match scores best, otherwise
+    matches on word starts and in consecutive runs score higher."""
+    if not query:
+        return 1.0
+    position = text.find(query)
+    if position >= 0:
+        return 1.0 if position == 0 or not text[position - 1].isalnum() else 0.9
+
+    score = 0.0
+    previous = -2
+    start = 0
+    for char in query:
+        position = text.find(char, start)
+        if position < 0:
+            return None
+        if position == previous + 1:
+            score += 1.0
+        elif position == 0 or not text[position - 1].isalnum():
+            score += 0.8
+        else:
+            score += 0.3
+        previous = position
+        start = position + 1
+    return 0.8 * score / len(query)
+
+
+class InputHistoryIndex:
+    """Prompts parsed from aider's .aider.input.history.
+
+    prompt_toolkit appends every prompt as a "# <timestamp>" line followed by
+    its lines prefixed with "+". The file is parsed incrementally: only the
+    bytes appended since the last update are read. Parsed prompts are cached
+    in the cache directory as an append-only JSON lines log, revalidated
+    (size + leading bytes fingerprint) on load, so the next Sublime session
+    starts from where this one stopped.
+
+    prompts: list of [timestamp, text], oldest first
+
+    The last prompt of the file stays pending (not cached) until the next
+    one starts, as more of its lines may still be on the way.
+    """
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir
+        self.path = None
+        self._reset()
+
+    def _reset(self):
+        """Forget everything parsed so far."""
+        self.size = 0
+        self.prompts = []
+        self.fingerprint = None
+        self._partial = b""
+        self._pending = None  # [timestamp, lines, offset] of the last prompt
+        self._saved = 0  # Prompts already in the cache log
+        self._unique = None
+
+    # Building
+
+    def update(self, path):
+        """Catch up with the input history, reading only appended bytes.
+
+        Returns True if new prompts were parsed."""
+        if path != self.path:
+            self.path = path
+            self._reset()
+            self._load()
+
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            if self.size:
+                self._reset()
+                self._clear_cache()
+                return True
+            return False
+
+        if size < self.size or not self._fingerprint_matches():
+            # Truncated or replaced: parse again from scratch
+            self._reset()
+            self._clear_cache()
+
+        if size == self.size:
+            return False
+
+        with open(path, 'rb') as f:
+            f.seek(self.size)
+            data = f.read(size - self.size)
+        self._parse(data)
+        self.save()
+        self._unique = None
+        return True
+
+    def _parse(self, data):
+        """Parse appended bytes into prompts."""
+        offset = self.size - len(self._partial)
+        buffer = self._partial + data
+        lines = buffer.split(b"\n")
+        self._partial = lines.pop()
+
+        for line in lines:
+            if line.startswith(b"+"):
+                if self._pending is None:
+                    self._pending = [None, [], offset]
+                self._pending[1].append(line[1:].decode('utf-8', 'replace').rstrip('\r'))
+            elif line.startswith(b"#"):
+                self._flush()
+                timestamp = line[1:].decode('utf-8', 'replace').strip()
+                self._pending = [timestamp, [], offset]
+            elif not line.strip():
+                self._flush()
+            offset += len(line) + 1
+
+        self.size += len(data)
+        if self.fingerprint is None and self.size >= FINGERPRINT_BYTES:
+            self.fingerprint = self._read_fingerprint()
+
+    def _flush(self):
+        """Close the pending prompt, if it has any line."""
+        if self._pending and self._pending[1]:
+            self.prompts.append([self._pending[0], "\n".join(self._pending[1])])
+        self._pending = None
+
+    def _read_fingerprint(self):
+        """Hash of the leading bytes, to notice a replaced file."""
+        try:
+            with open(self.path, 'rb') as f:
+                return hashlib.sha1(f.read(FINGERPRINT_BYTES)).hexdigest()
+        except (OSError, IOError):
+            return None
+
+    def _fingerprint_matches(self):
+        """Check the file still starts with the bytes we parsed."""
+        if self.fingerprint is None:
+            return True
+        return self._read_fingerprint() == self.fingerprint
+
+    # Lookups
+
+    def all_prompts(self):
+        """Every prompt, oldest first, including the pending one."""
+        if self._pending and self._pending[1]:
+            return self.prompts + [[self._pending[0], "\n".join(self._pending[1])]]
+        return self.prompts
+
+    def unique_prompts(self):
+        """[(timestamp, text, lowercased text)] without repeats, newest first."""
+        if self._unique is None:
+            seen = set()
+            unique = []
+            for timestamp, text in reversed(self.all_prompts()):
+                if text in seen:
+                    continue
+                seen.add(text)
+                unique.append((timestamp, text, text.lower()))
+            self._unique = unique
+        return self._unique
+
+    def rank(self, query, limit=200):
+        """Prompts matching query, ranked by fuzzy score plus recency.
+
+        Returns [(score, timestamp, text)], best first."""
+        query = query.strip().lower()
+        ranked = []
+        for age, (timestamp, text, lowered) in enumerate(self.unique_prompts()):
+            match = fuzzy_score(query, lowered)
+            if match is None:
+                continue
+            recency = RECENCY_SCALE / (RECENCY_SCALE + age)
+            ranked.append((match + RECENCY_WEIGHT * recency, -age, timestamp, text))
+            if not query and len(ranked) >= limit:
+                # Without a query the ranking is just the recency
+                break
+        return [(score, timestamp, text)
+                for score, age, timestamp, text in heapq.nlargest(limit, ranked)]
+
+    # Persistence
+
+    def _cache_file(self):
+        """Cache log file for the current input history path."""
+        if not self.cache_dir or not self.path:
+            return None
+        digest = hashlib.sha1(self.path.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, "input-{0}.jsonl".format(digest))
+
+    def _clear_cache(self):
+        """Drop the cache log."""
+        cache_file = self._cache_file()
+        if cache_file and os.path.exists(cache_file):
+            try:
+                os.remove(cache_file)
+            except OSError:
+                pass
+
+    def save(self):
+        """Append the prompts closed since the last save to the cache log.
+
+        Each record holds the offset parsing resumes from, which is the start
+        of the pending prompt (or of the incomplete line)."""
+        cache_file = self._cache_file()
+        if not cache_file or self._saved == len(self.prompts):
+            return
+        resume = self._pending[2] if self._pending else self.size - len(self._partial)
+        try:
+            if not os.path.isdir(self.cache_dir):
+                os.makedirs(self.cache_dir)
+            with open(cache_file, 'a') as f:
+                if not self._saved and f.tell() == 0:
+                    f.write(json.dumps({'path': self.path}) + "\n")
+                f.write(json.dumps({'resume': resume, 'fingerprint': self.fingerprint,
+                                    'prompts': self.prompts[self._saved:]}) + "\n")
+            self._saved = len(self.prompts)
+        except (OSError, IOError) as e:
+            print("AiderSavvy: Could not save input history index: {0}".format(e))
+
+    def _load(self):
+        """Replay the cache log for the current path, if still valid."""
+        cache_file = self._cache_file()
+        if not cache_file or not os.path.exists(cache_file):
+            return
+        prompts = []
+        resume = 0
+        fingerprint = None
+        torn = False
+        try:
+            with open(cache_file, 'r') as f:
+                header = json.loads(f.readline())
+                if header.get('path') != self.path:
+                    return
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        torn = True
+                        break
+                    prompts.extend(record['prompts'])
+                    resume = record['resume']
+                    fingerprint = record['fingerprint']
+            if os.path.getsize(self.path) < resume:
+                return
+        except (OSError, IOError, ValueError, KeyError):
+            return
+
+        self.size = resume
+        self.prompts = prompts
+        self.fingerprint = fingerprint
+        self._saved = len(prompts)
+        if not self._fingerprint_matches():
+            self._reset()
+        elif torn:
+            # Keep the records before the torn one, they are written again
+            # as one record on the next save
+            self._clear_cache()
+            self._saved = 0
@@ -0,0 +1,126 @@
+# AiderSavvy - Compact line storage for the output buffer
+import codecs
+from array import array
+
+# Evicted head bytes are only reclaimed past this size
+COMPACT_MIN_BYTES = 64 * 1024
+
+
+class LineStore:
+    """Lines kept as one UTF-8 buffer plus an array of line start offsets.
+
+    Text is appended to a single bytearray and the start of every line is
+    recorded in an array('I'), so 100k lines cost a few bytes each instead of
+    one str object per line. Evicting lines from the head only advances the
+    first line; the dead bytes are dropped in one go once they make up half
+    of the buffer. Lines are decoded straight from a memoryview of the buffer,
+    without copying the bytes first.
+
+    Like str.split('\\n'), "a\\nb" holds two lines and "a\\n" holds "a" and
+    an empty last line, which the next append continues.
+    """
+
+    def __init__(self, max_lines=None):
+        self.max_lines = max_lines
+        self.clear()
+
+    def clear(self):
+        """Forget all lines."""
+        self.buffer = bytearray()
+        self.offsets = array('I')
+        self.first = 0
+
+    def set(self, text):
+        """Replace all lines with text, returns the number of bytes evicted."""
+        self.clear()
+        return self.append(text)
+
+    def append(self, text):
+        """Append text, continuing the last line if it had no newline yet.
+
+        Returns the number of bytes evicted from the head to stay within max_lines."""
+        if not text:
+            return 0
+        data = text.encode('utf-8')
+        position = len(self.buffer)
+        if not len(self.offsets):
+            self.offsets.append(0)
+        self.buffer.extend(data)
+
+        pieces = data.split(b'\n')
+        pieces.pop()
+        for piece in pieces:
+            position += len(piece) + 1
+            self.offsets.append(position)
+
+        if self.max_lines and len(self) > self.max_lines:
+            return self.evict(len(self) - self.max_lines)
+        return 0
+
+    def prepend(self, text):
+        """Insert text before the first line, which text's last line continues.
+
+        Rebuilds the buffer, it is meant for occasional backfills. Prepended
+        lines are not evicted until the next append."""
+        if not text:
+            return
+        data = text.encode('utf-8')
+        base = self.offsets[self.first] if len(self.offsets) else 0
+        offsets = array('I', [0])
+        position = 0
+        pieces = data.split(b'\n')
+        pieces.pop()
+        for piece in pieces:
+            position += len(piece) + 1
+            offsets.append(position)
+        if len(self.offsets):
+            shift = len(data) - base
+            offsets.extend(offset + shift for offset in self.offsets[self.first + 1:])
+        self.buffer = bytearray(data) + self.buffer[base:]
+        self.offsets = offsets
+        self.first = 0
+
+    def evict(self, count):
+        """Drop the count oldest lines, returns the number of bytes dropped."""
+        previous = self.offsets[self.first]
+        self.first = min(self.first + count, len(self.offsets) - 1)
+        base = self.offsets[self.first]
+        if base >= COMPACT_MIN_BYTES and base * 2 >= len(self.buffer):
+            del self.buffer[:base]
+            self.offsets = array('I', (offset - base for offset in self.offsets[self.first:]))
+            self.first = 0
+        return base - previous
+
+    def __len__(self):
+        return len(self.offsets) - self.first
+
+    def _byte_range(self, start, end):
+        """Byte offsets of lines start to end (exclusive), without the final newline."""
+        begin = self.offsets[self.first + start]
+        if self.first + end < len(self.offsets):
+            return begin, self.offsets[self.first + end] - 1
+        return begin, len(self.buffer)
+
+    def _decode(self, begin, end):
+        with memoryview(self.buffer) as view:
+            return codecs.utf_8_decode(view[begin:end], 'replace', True)[0]
+
+    def line(self, number):
+        """Line number (0 based, negative counts from the end)."""
+        if number < 0:
+            number += len(self)
+        if not 0 <= number < len(self):
+            raise IndexError("line index out of range")
+        return self._decode(*self._byte_range(number, number + 1))
+
+    def text(self, start=0, end=None):
+        """Lines start to end joined with newlines, decoded in one go."""
+        count = len(self)
+        end = count if end is None else min(end, count)
+        if start >= end:
+            return ""
+        return self._decode(*self._byte_range(start, end))
+
+    def __iter__(self):
+        for number in range(len(self)):
+            yield self.line(number)
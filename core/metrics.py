@@ -0,0 +1,159 @@
+# AiderSavvy - Per-turn latency, token and cost metrics
+import re
+
+TOKENS_PATTERN = re.compile(
+    r'Tokens: ([\d.,]+)([km]?) sent,.*?([\d.,]+)([km]?) received\.'
+    r'(?: Cost: \$([\d.,]+) message, \$([\d.,]+) session\.)?'
+)
+SESSION_MARKER = '# aider chat started at'
+TURN_MARKER = '####'
+
+SUFFIXES = {'': 1, 'k': 1000, 'm': 1000000}
+
+
+def parse_count(number, suffix):
+    """Parse aider's abbreviated token counts ("2.5k")."""
+    return int(float(number.replace(',', '')) * SUFFIXES[suffix])
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = int(round(fraction * (len(ordered) - 1)))
+    return ordered[rank]
+
+
+class TurnMetrics:
+    """Timing, token and cost figures of one user turn."""
+
+    def __init__(self, model, started):
+        self.model = model
+        self.started = started  # Arrival time of the "####" line
+        self.first_output = None  # Arrival of the first reply chunk
+        self.last_output = None  # Arrival of the last reply chunk
+        self.sent = None
+        self.received = None
+        self.cost = None
+
+    @property
+    def latency(self):
+        """Seconds from the prompt to the end of the reply."""
+        if self.started is None or self.last_output is None:
+            return None
+        return self.last_output - self.started
+
+    @property
+    def first_output_latency(self):
+        """Seconds from the prompt to the first reply chunk."""
+        if self.started is None or self.first_output is None:
+            return None
+        return self.first_output - self.started
+
+    @property
+    def generation_time(self):
+        """Seconds between the first and last reply chunk."""
+        if self.first_output is None or self.last_output is None:
+            return None
+        return self.last_output - self.first_output
+
+
+class HistoryMetrics:
+    """Extracts per-turn metrics from history chunks as they are appended.
+
+    Timing comes from the watcher's arrival time of each chunk, so turns
+    read from an existing history (arrival None) only carry tokens and cost.
+    A turn ends with aider's "Tokens: ... sent, ... received. Cost: ..."
+    line."""
+
+    def __init__(self):
+        self.turns = []
+        self.sessions = 0
+        self._partial = ""
+
+    def feed(self, content, arrival, model):
+        """Parse appended history content that arrived at time arrival."""
+        lines = (self._partial + content).split('\n')
+        self._partial = lines.pop()
+
+        turn = self.turns[-1] if self.turns else None
+        for line in lines:
+            stripped = line.strip()
+            if not stripped:
+                continue
+
+            if stripped.startswith(SESSION_MARKER):
+                self.sessions += 1
+                turn = None
+                continue
+
+            if stripped.startswith(TURN_MARKER):
+                # Consecutive "####" lines are one multi-line prompt
+                if not (turn and turn.first_output is None and turn.sent is None):
+                    turn = TurnMetrics(model, arrival)
+                    self.turns.append(turn)
+                continue
+
+            if not turn or turn.sent is not None:
+                continue
+
+            if turn.first_output is None:
+                turn.first_output = arrival
+            turn.last_output = arrival
+
+            tokens_match = TOKENS_PATTERN.search(stripped)
+            if tokens_match:
+                turn.sent = parse_count(tokens_match.group(1), tokens_match.group(2))
+                turn.received = parse_count(tokens_match.group(3), tokens_match.group(4))
+                if tokens_match.group(5):
+                    turn.cost = float(tokens_match.group(5).replace(',', ''))
+
+        # A reply line still being written counts as output arriving
+        partial = self._partial.strip()
+        if (turn and turn.sent is None and partial and
+                not partial.startswith(TURN_MARKER) and not partial.startswith(SESSION_MARKER)):
+            if turn.first_output is None:
+                turn.first_output = arrival
+            turn.last_output = arrival
+
+    def discard_partial(self):
+        """Forget an incomplete last line, the history it came from was replaced."""
+        self._partial = ""
+
+    def summary(self):
+        """Aggregate figures for the Metrics tab."""
+        latencies = [t.latency for t in self.turns if t.latency is not None]
+        first_latencies = [t.first_output_latency for t in self.turns
+                           if t.first_output_latency is not None]
+
+        by_model = {}
+        for t in self.turns:
+            stats = by_model.setdefault(t.model, {
+                'turns': 0, 'sent': 0, 'received': 0, 'cost': 0.0,
+                'timed_received': 0, 'generation_time': 0.0})
+            stats['turns'] += 1
+            stats['sent'] += t.sent or 0
+            stats['received'] += t.received or 0
+            stats['cost'] += t.cost or 0.0
+            if t.received and t.generation_time:
+                stats['timed_received'] += t.received
+                stats['generation_time'] += t.generation_time
+
+        for stats in by_model.values():
+            stats['tokens_per_second'] = (
+                stats['timed_received'] / stats['generation_time']
+                if stats['generation_time'] else None)
+
+        return {
+            'turns': len(self.turns),
+            'timed_turns': len(latencies),
+            'latency_p50': percentile(latencies, 0.5),
+            'latency_p95': percentile(latencies, 0.95),
+            'first_output_p50': percentile(first_latencies, 0.5),
+            'first_output_p95': percentile(first_latencies, 0.95),
+            'sent': sum(t.sent or 0 for t in self.turns),
+            'received': sum(t.received or 0 for t in self.turns),
+            'cost': sum(t.cost or 0.0 for t in self.turns),
+            'by_model': by_model,
+        }
@@ -0,0 +1,193 @@
+# AiderSavvy - Lightweight profiling hooks
+import bisect
+import functools
+import time
+
+# Histogram bucket upper bounds in milliseconds, plus one open-ended bucket
+BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+
+class Histogram:
+    """Fixed-size bucketed histogram of durations in milliseconds."""
+
+    __slots__ = ('count', 'total', 'max', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+
+    def record(self, ms):
+        """Add one duration."""
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+        self.buckets[bisect.bisect_left(BUCKETS, ms)] += 1
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, fraction):
+        """Approximate percentile: upper bound of the bucket holding it (capped at max)."""
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.buckets):
+            seen += bucket_count
+            if seen >= target:
+                return min(BUCKETS[i], self.max) if i < len(BUCKETS) else self.max
+        return self.max
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'total_ms': self.total,
+            'mean_ms': self.mean,
+            'p50_ms': self.percentile(0.5),
+            'p95_ms': self.percentile(0.95),
+            'max_ms': self.max,
+            'buckets': dict(zip([str(b) for b in BUCKETS] + ['inf'], self.buckets)),
+        }
+
+
+class _NullTimer:
+    """Context manager used when profiling is disabled."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    """Context manager recording its duration into a histogram."""
+
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, (time.perf_counter() - self.start) * 1000.0)
+        return False
+
+
+class Profiler:
+    """Registry of timing histograms and counters for the plugin's hot paths.
+
+    Disabled by default ("profiling" setting); when disabled, timers and
+    counters return immediately without touching the clock."""
+
+    def __init__(self):
+        self.enabled = False
+        self.histograms = {}
+        self.counters = {}
+        self.since = time.time()
+
+    def record(self, name, ms):
+        """Record a duration in milliseconds."""
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        histogram.record(ms)
+
+    def count(self, name, amount=1):
+        """Increment a counter."""
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def timer(self, name):
+        """Context manager timing a block."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name)
+
+    def reset(self):
+        """Drop all recorded data."""
+        self.histograms = {}
+        self.counters = {}
+        self.since = time.time()
+
+    def to_dict(self):
+        """All recorded data, for JSON dumps."""
+        return {
+            'since': self.since,
+            'enabled': self.enabled,
+            'timers': dict((name, h.to_dict()) for name, h in self.histograms.items()),
+            'counters': dict(self.counters),
+        }
+
+    def report(self):
+        """Render the histograms as text."""
+        lines = []
+        lines.append("  AIDER SAVVY - Performance Stats")
+        lines.append("")
+        lines.append("  Profiling: {0}   (setting \"profiling\")".format(
+            "ENABLED" if self.enabled else "disabled"))
+        lines.append("  Since: {0}".format(time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.since))))
+        lines.append("")
+
+        lines.append("-" * 78)
+        lines.append("  {0:<36} {1:>7} {2:>8} {3:>7} {4:>7} {5:>8}".format(
+            "Timer", "count", "mean ms", "p50", "p95", "max ms"))
+        lines.append("-" * 78)
+        for name in sorted(self.histograms):
+            h = self.histograms[name]
+            lines.append("  {0:<36} {1:>7} {2:>8.2f} {3:>7} {4:>7} {5:>8.2f}".format(
+                name, h.count, h.mean, h.percentile(0.5), h.percentile(0.95), h.max))
+        if not self.histograms:
+            lines.append("    (nothing recorded)")
+        lines.append("")
+
+        for name in sorted(self.histograms):
+            h = self.histograms[name]
+            lines.append("  {0}".format(name))
+            peak = max(h.buckets) or 1
+            labels = ["<={0}ms".format(b) for b in BUCKETS] + [">{0}ms".format(BUCKETS[-1])]
+            for label, bucket_count in zip(labels, h.buckets):
+                if bucket_count:
+                    bar = "#" * max(1, int(40 * bucket_count / peak))
+                    lines.append("    {0:>10} {1:>7} {2}".format(label, bucket_count, bar))
+            lines.append("")
+
+        lines.append("-" * 78)
+        lines.append("  Counters")
+        lines.append("-" * 78)
+        for name in sorted(self.counters):
+            lines.append("  {0:<36} {1:>12}".format(name, self.counters[name]))
+        if not self.counters:
+            lines.append("    (nothing recorded)")
+
+        return "\n".join(lines)
+
+
+profiler = Profiler()
+
+
+def profiled(name):
+    """Decorator timing every call of a function under name."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not profiler.enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profiler.record(name, (time.perf_counter() - start) * 1000.0)
+        return wrapper
+    return decorate
@@ -0,0 +1,234 @@
+# AiderSavvy - Index of the project's files for bulk adds
+import os
+import re
+import threading
+import time
+
+import sublime
+
+from .profiling import profiled
+
+IGNORE_DIRS = {'.git', '__pycache__', 'node_modules', '.venv', 'venv',
+               'dist', 'build', '.idea', '.vscode', '.svn', '.hg'}
+IGNORE_EXTENSIONS = {'.pyc', '.pyo', '.so', '.o', '.a', '.dylib',
+                     '.jpg', '.jpeg', '.png', '.gif', '.ico', '.pdf',
+                     '.bin', '.exe', '.dll', '.obj', '.class'}
+
+
+def glob_to_regex(pattern):
+    """Compile a glob where * stays within a directory and ** spans several."""
+    parts = []
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            parts.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("**", i):
+            parts.append(".*")
+            i += 2
+        elif pattern[i] == "*":
+            parts.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            parts.append("[^/]")
+            i += 1
+        else:
+            parts.append(re.escape(pattern[i]))
+            i += 1
+    return re.compile("".join(parts) + r"\Z")
+
+
+class GitIgnore:
+    """The common subset of a root .gitignore: globs, /anchored, dir/ and !negations."""
+
+    def __init__(self, root):
+        self.rules = []  # (regex, negated, directories only)
+        try:
+            with open(os.path.join(root, ".gitignore"), 'r') as f:
+                lines = f.read().splitlines()
+        except (OSError, IOError, UnicodeDecodeError):
+            return
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            negated = line.startswith("!")
+            if negated:
+                line = line[1:]
+            directory = line.endswith("/")
+            line = line.rstrip("/")
+            if "/" in line:
+                # A leading or inner slash anchors the pattern to the root
+                regex = glob_to_regex(line.lstrip("/"))
+            else:
+                regex = glob_to_regex("**/" + line)
+            self.rules.append((regex, negated, directory))
+
+    def ignored(self, rel_path, is_dir=False):
+        """Whether rel_path ('/' separated) is ignored, the last matching rule wins."""
+        result = False
+        for regex, negated, directory in self.rules:
+            if directory and not is_dir:
+                continue
+            if regex.match(rel_path):
+                result = not negated
+        return result
+
+
+class ProjectFileIndex:
+    """Relative paths and sizes of every file under the project root.
+
+    The project is walked once, skipping the usual build/VCS directories,
+    binary extensions, dot files and what the root .gitignore excludes.
+    Globs and directory adds are then resolved against the index instead
+    of walking the tree again, and the Files tab lists them. Saved files
+    are added as they appear; a scan ([s] in the Files tab) rebuilds it.
+
+    files: {relative path ('/' separated): size in bytes}
+    """
+
+    def __init__(self):
+        self.root = None
+        self.files = {}
+        self.built_at = None
+        self.gitignore = None
+        # A background build is running, saves wait in queued
+        self.building = False
+        self.queued = set()  # Absolute paths saved during the build
+        self.waiting = []  # Callbacks for when the background build is done
+        self._lock = threading.Lock()
+
+    def is_built(self, root):
+        """Whether the index is up to date for root."""
+        return self.built_at is not None and root == self.root
+
+    def invalidate(self):
+        """Make the next use walk the project again."""
+        self.built_at = None
+
+    def build_later(self, root, callback):
+        """Build the index for root in the background, then call callback() on the UI thread.
+
+        Callers arriving while the build runs wait for the same build."""
+        if callback not in self.waiting:
+            self.waiting.append(callback)
+        if self.building:
+            return
+
+        def build():
+            try:
+                self.build(root)
+            except (OSError, IOError) as e:
+                sublime.set_timeout(lambda: on_built(e), 0)
+            else:
+                sublime.set_timeout(lambda: on_built(None), 0)
+
+        def on_built(error):
+            waiting, self.waiting = self.waiting, []
+            if error:
+                sublime.error_message("AiderSavvy: Could not index {0}: {1}".format(root, error))
+                return
+            for waiter in waiting:
+                waiter()
+
+        self.building = True
+        sublime.set_timeout_async(build, 0)
+
+    @profiled("project_index.build")
+    def build(self, root):
+        """Walk root and index its files, then the files saved meanwhile."""
+        with self._lock:
+            self.building = True
+        try:
+            count = self._build(root)
+        finally:
+            with self._lock:
+                self.building = False
+                queued, self.queued = self.queued, set()
+        for path in queued:
+            self.add(path)
+        return count
+
+    def _build(self, root):
+        self.root = root
+        self.gitignore = GitIgnore(root)
+        files = {}
+        for directory, dirs, names in os.walk(root):
+            rel_dir = os.path.relpath(directory, root).replace(os.sep, "/")
+            rel_dir = "" if rel_dir == "." else rel_dir + "/"
+            dirs[:] = [d for d in dirs
+                       if d not in IGNORE_DIRS and not d.startswith('.')
+                       and not self.gitignore.ignored(rel_dir + d, True)]
+            for name in names:
+                rel_path = rel_dir + name
+                if self._ignored_name(name) or self.gitignore.ignored(rel_path):
+                    continue
+                try:
+                    files[rel_path] = os.path.getsize(os.path.join(directory, name))
+                except OSError:
+                    continue
+        self.files = files
+        self.built_at = time.time()
+        return len(files)
+
+    def _ignored_name(self, name):
+        """Aider's own files, dot files and binaries."""
+        return (name.startswith('.') or
+                os.path.splitext(name)[1].lower() in IGNORE_EXTENSIONS)
+
+    def add(self, path):
+        """Index a file that appeared (absolute path), or after the running build."""
+        with self._lock:
+            if self.building:
+                self.queued.add(path)
+                return
+            self._add(path)
+
+    def _add(self, path):
+        if self.built_at is None or not self.root:
+            return
+        rel_path = os.path.relpath(path, self.root).replace(os.sep, "/")
+        if rel_path.startswith("../"):
+            return
+        parts = rel_path.split("/")
+        for depth in range(1, len(parts)):
+            if (parts[depth - 1] in IGNORE_DIRS or parts[depth - 1].startswith('.') or
+                    self.gitignore.ignored("/".join(parts[:depth]), True)):
+                return
+        if self._ignored_name(parts[-1]) or self.gitignore.ignored(rel_path):
+            return
+        try:
+            self.files[rel_path] = os.path.getsize(path)
+        except OSError:
+            self.files.pop(rel_path, None)
+
+    # Lookups
+
+    def match_glob(self, pattern):
+        """Sorted files matching a glob relative to the root, e.g. src/**/*.py."""
+        pattern = pattern.strip().replace(os.sep, "/")
+        if pattern.startswith("./"):
+            pattern = pattern[2:]
+        regex = glob_to_regex(pattern)
+        return sorted(path for path in self.files if regex.match(path))
+
+    def in_directory(self, rel_dir):
+        """Sorted files under a directory relative to the root ("" for all)."""
+        rel_dir = rel_dir.replace(os.sep, "/").strip("/")
+        if rel_dir in ("", "."):
+            return sorted(self.files)
+        prefix = rel_dir + "/"
+        return sorted(path for path in self.files if path.startswith(prefix))
+
+    def directories(self):
+        """Sorted directories holding indexed files."""
+        found = set()
+        for path in self.files:
+            parts = path.split("/")[:-1]
+            for depth in range(1, len(parts) + 1):
+                found.add("/".join(parts[:depth]))
+        return sorted(found)
+
+    def total_size(self, paths):
+        """Indexed size of paths, in bytes."""
+        return sum(self.files.get(path, 0) for path in paths)
@@ -0,0 +1,104 @@
+# AiderSavvy - Choosing how a prompt reaches the aider terminal
+import os
+import time
+
+from .settings import get_cache_dir
+
+# terminus_send_string types every character, so the cost of a transport is
+# roughly the characters it sends
+TYPED = "typed"
+BLOCK = "block"
+FILE = "file"
+
+# Characters above which a prompt goes through a file by default
+DEFAULT_FILE_THRESHOLD = 2000
+# Prompt files older than this are removed when a new one is written
+PROMPT_FILE_MAX_AGE = 24 * 3600
+
+# Line typed with a file-backed prompt, short and constant
+FILE_INSTRUCTION = ("My request is in the read-only file {0}, "
+                    "follow it as if I had typed it here.")
+
+
+def prompt_directory():
+    """Directory of the prompt files, in the cache directory."""
+    return os.path.join(get_cache_dir(), "prompts")
+
+
+def is_prompt_file(path, root):
+    """Whether path, as aider printed it (absolute or relative to root), is a prompt file."""
+    directory = os.path.dirname(os.path.normpath(os.path.join(root, os.path.expanduser(path))))
+    return directory == os.path.normpath(prompt_directory())
+
+
+def choose_transport(message, multiline_enabled, file_threshold=DEFAULT_FILE_THRESHOLD):
+    """TYPED, BLOCK or FILE for message.
+
+    One line is typed as is. Several lines need a {tag ... tag} block
+    unless aider's multiline mode is on, where typing them and submitting
+    with Meta+Enter is enough. Past file_threshold characters, writing a
+    file and typing a few short lines beats typing the whole prompt."""
+    if file_threshold and len(message) > file_threshold:
+        return FILE
+    if "\n" in message and not multiline_enabled:
+        return BLOCK
+    return TYPED
+
+
+def block_tag(message):
+    """Tag for a {tag ... tag} block that no line of message closes early."""
+    tag = "aider_savvy"
+    number = 0
+    lines = set(line.strip() for line in message.split("\n"))
+    while tag + "}" in lines:
+        number += 1
+        tag = "aider_savvy{0}".format(number)
+    return tag
+
+
+def wrap_block(message):
+    """message as an aider multiline block, one typed input."""
+    tag = block_tag(message)
+    return "{{{0}\n{1}\n{0}}}".format(tag, message)
+
+
+class PromptFileStore:
+    """Files holding prompts too large to type into the terminal.
+
+    aider reads a prompt file added with /read-only; it is dropped from the
+    chat before the next prompt is sent."""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def write(self, message):
+        """Write message to a new prompt file and return its path."""
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        self.prune()
+        name = "prompt-{0}.md".format(time.strftime("%Y%m%d-%H%M%S"))
+        path = os.path.join(self.directory, name)
+        number = 1
+        while os.path.exists(path):
+            number += 1
+            path = os.path.join(self.directory, name[:-3] + "-{0}.md".format(number))
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(message)
+            if not message.endswith("\n"):
+                f.write("\n")
+        return path
+
+    def prune(self):
+        """Remove prompt files older than PROMPT_FILE_MAX_AGE."""
+        limit = time.time() - PROMPT_FILE_MAX_AGE
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+        for name in names:
+            path = os.path.join(self.directory, name)
+            try:
+                if name.startswith("prompt-") and os.path.getmtime(path) < limit:
+                    os.remove(path)
+            except OSError:
+                continue
@@ -0,0 +1,47 @@
+# AiderSavvy - Session streaming scheduler
+
+
+class AiderSessionScheduler:
+    """Caps how many sessions stream their history at once.
+
+    Every streaming session polls its history file and re-renders on new
+    output. Sessions beyond the cap are parked: their watcher pauses but
+    keeps its read position, so it catches up when the session streams
+    again. The least recently activated session is parked first."""
+
+    def __init__(self, max_active=2):
+        self.max_active = max(1, max_active)
+        self.active = []  # Least recently activated first
+        self.parked = []  # Most recently parked last
+
+    def activate(self, session):
+        """Make session stream, parking others if over the cap."""
+        if session in self.active:
+            self.active.remove(session)
+            self.active.append(session)
+            return
+
+        if session in self.parked:
+            self.parked.remove(session)
+        self.active.append(session)
+        if session.file_watcher:
+            session.file_watcher.resume()
+
+        while len(self.active) > self.max_active:
+            parked = self.active.pop(0)
+            if parked.file_watcher:
+                parked.file_watcher.pause()
+            self.parked.append(parked)
+
+    def remove(self, session):
+        """Forget a closed session, letting a parked one stream again."""
+        if session in self.parked:
+            self.parked.remove(session)
+        if session in self.active:
+            self.active.remove(session)
+            if self.parked:
+                self.activate(self.parked[-1])
+
+    def is_streaming(self, session):
+        """Check whether session is currently streaming."""
+        return session in self.active
@@ -0,0 +1,252 @@
+# AiderSavvy - Inverted index for full-text search over the chat history
+import hashlib
+import json
+import math
+import os
+import re
+import time
+
+import sublime
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9_]{2,}')
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+
+def tokenize(text):
+    """Lowercase word tokens used for indexing and queries."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class HistorySearchIndex:
+    """Inverted index token -> {turn number: term frequency} over history turns.
+
+    Turns come from a HistoryIndex and are identified by their global
+    number (archived turns first), so a hit maps straight to a byte range.
+    Only closed turns (followed by another turn) are indexed permanently;
+    the open last turn is indexed on the fly at query time because aider
+    may still be writing it.
+
+    On disk the index is a log of inverted segments, one JSON line per
+    update, so an update appends the postings of the new turns instead of
+    rewriting everything. Segments are merged when there are too many.
+
+    Indexing a long history takes seconds, so the plugin updates and
+    searches only on the async thread (update_later, and the search
+    command), which also keeps them from running concurrently.
+    """
+
+    MAX_SEGMENTS = 32
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir
+        self.path = None
+        # An update_later is scheduled and has not started yet
+        self.pending = False
+        self._reset()
+
+    def _reset(self):
+        """Forget everything indexed so far."""
+        self.fingerprint = None
+        self.indexed_turns = 0
+        self.postings = {}
+        self.lengths = []
+        self.segments = 0
+
+    # Building
+
+    def update(self, history_index):
+        """Index the closed turns history_index knows about but we do not.
+
+        Returns the number of newly indexed turns."""
+        if history_index.path != self.path:
+            self.path = history_index.path
+            self._reset()
+            self._load()
+
+        if (self.fingerprint != history_index.history_id or
+                self.indexed_turns > history_index.turn_count()):
+            # The history was rebuilt, start over
+            self._reset()
+            self.fingerprint = history_index.history_id
+            self._clear_cache()
+
+        closed = history_index.turn_count() - 1
+        if closed <= self.indexed_turns:
+            return 0
+
+        first = self.indexed_turns
+        segment = {}
+        lengths = []
+        for number, text in history_index.read_turns(first, closed):
+            counts = self._count(text)
+            lengths.append(sum(counts.values()))
+            for token, count in counts.items():
+                segment.setdefault(token, []).extend([number, count])
+
+        self._merge(segment, lengths)
+        self._append_segment(first, segment, lengths)
+        return closed - first
+
+    def update_later(self, history_index):
+        """Index the new closed turns on the async thread."""
+        if self.pending:
+            return
+        self.pending = True
+
+        def run():
+            self.pending = False
+            started = time.time()
+            try:
+                added = self.update(history_index)
+            except (OSError, IOError, ValueError, IndexError) as e:
+                # The history changed under us, the next update starts over
+                print("AiderSavvy: Search index update failed: {0}".format(e))
+                return
+            if time.time() - started > 1:
+                sublime.status_message("Aider: Indexed {0} history turns for search".format(added))
+
+        sublime.set_timeout_async(run, 0)
+
+    def _count(self, text):
+        """Term frequencies of a text."""
+        counts = {}
+        for token in tokenize(text):
+            counts[token] = counts.get(token, 0) + 1
+        return counts
+
+    def _merge(self, segment, lengths):
+        """Merge a segment of flat [turn, count, ...] postings into memory."""
+        for token, flat in segment.items():
+            postings = self.postings.setdefault(token, {})
+            for i in range(0, len(flat), 2):
+                postings[flat[i]] = flat[i + 1]
+        self.lengths.extend(lengths)
+        self.indexed_turns += len(lengths)
+
+    # Querying
+
+    def search(self, history_index, query, limit=50):
+        """Rank turns for query with BM25, returns [(score, turn number)]."""
+        self.update(history_index)
+        terms = list(set(tokenize(query)))
+        if not terms:
+            return []
+
+        # The open last turn is not in the persistent index yet
+        open_turn = {}
+        open_length = 0
+        last = history_index.turn_count() - 1
+        if last >= self.indexed_turns:
+            for number, text in history_index.read_turns(last, last + 1):
+                open_turn = self._count(text)
+                open_length = sum(open_turn.values())
+
+        total_turns = self.indexed_turns + (1 if open_length else 0)
+        if not total_turns:
+            return []
+        average = float(sum(self.lengths) + open_length) / total_turns or 1.0
+
+        scores = {}
+        for term in terms:
+            postings = self.postings.get(term, {})
+            df = len(postings) + (1 if term in open_turn else 0)
+            if not df:
+                continue
+            idf = math.log(1 + (total_turns - df + 0.5) / (df + 0.5))
+            for number, tf in postings.items():
+                scores[number] = scores.get(number, 0.0) + self._bm25(
+                    idf, tf, self.lengths[number], average)
+            if term in open_turn:
+                scores[last] = scores.get(last, 0.0) + self._bm25(
+                    idf, open_turn[term], open_length, average)
+
+        ranked = sorted(((score, number) for number, score in scores.items()),
+                        key=lambda hit: (-hit[0], -hit[1]))
+        return ranked[:limit]
+
+    def _bm25(self, idf, tf, length, average):
+        """BM25 contribution of one term in one turn."""
+        return idf * tf * (K1 + 1) / (tf + K1 * (1 - B + B * length / average))
+
+    # Persistence
+
+    def _cache_file(self):
+        """Segment log file for the current history path."""
+        if not self.cache_dir or not self.path:
+            return None
+        digest = hashlib.sha1(self.path.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, "search-{0}.jsonl".format(digest))
+
+    def _clear_cache(self):
+        """Drop the persisted segments."""
+        cache_file = self._cache_file()
+        if cache_file and os.path.exists(cache_file):
+            try:
+                os.remove(cache_file)
+            except OSError:
+                pass
+
+    def _append_segment(self, first, segment, lengths):
+        """Append one inverted segment to the log, compacting when needed."""
+        cache_file = self._cache_file()
+        if not cache_file:
+            return
+        if self.segments + 1 > self.MAX_SEGMENTS:
+            self._compact()
+            return
+
+        record = {'fingerprint': self.fingerprint, 'first': first,
+                  'lengths': lengths, 'postings': segment}
+        try:
+            if not os.path.isdir(self.cache_dir):
+                os.makedirs(self.cache_dir)
+            with open(cache_file, 'a') as f:
+                f.write(json.dumps(record) + "\n")
+            self.segments += 1
+        except (OSError, IOError) as e:
+            print("AiderSavvy: Could not save search index: {0}".format(e))
+
+    def _compact(self):
+        """Rewrite the log as a single segment holding the whole index."""
+        cache_file = self._cache_file()
+        segment = {}
+        for token, postings in self.postings.items():
+            flat = segment[token] = []
+            for number in sorted(postings):
+                flat.extend([number, postings[number]])
+        record = {'fingerprint': self.fingerprint, 'first': 0,
+                  'lengths': self.lengths, 'postings': segment}
+        try:
+            tmp_file = cache_file + ".tmp"
+            with open(tmp_file, 'w') as f:
+                f.write(json.dumps(record) + "\n")
+            os.replace(tmp_file, cache_file)
+            self.segments = 1
+        except (OSError, IOError) as e:
+            print("AiderSavvy: Could not compact search index: {0}".format(e))
+
+    def _load(self):
+        """Replay the persisted segment log for the current path."""
+        cache_file = self._cache_file()
+        if not cache_file or not os.path.exists(cache_file):
+            return
+        consistent = True
+        try:
+            with open(cache_file, 'r') as f:
+                for line in f:
+                    record = json.loads(line)
+                    if record['first'] != self.indexed_turns:
+                        consistent = False
+                        break
+                    self.fingerprint = record['fingerprint']
+                    self._merge(record['postings'], record['lengths'])
+                    self.segments += 1
+        except (OSError, IOError, ValueError, KeyError):
+            consistent = False
+
+        if not consistent:
+            # Torn or out of order log, keep what is consistent
+            self._compact()
@@ -0,0 +1,15 @@
+# AiderSavvy - Plugin settings access
+import os
+import sublime
+
+SETTINGS_FILE = "AiderSavvy.sublime-settings"
+
+
+def get_setting(key, default=None):
+    """Read a value from AiderSavvy.sublime-settings."""
+    return sublime.load_settings(SETTINGS_FILE).get(key, default)
+
+
+def get_cache_dir():
+    """Directory for AiderSavvy's persistent caches (indexes)."""
+    return os.path.join(sublime.cache_path(), "AiderSavvy")
@@ -0,0 +1,159 @@
+# AiderSavvy - Index of where functions and classes are defined
+import os
+import re
+import threading
+import time
+
+from .profiling import profiled
+
+# Files larger than this are not tagged (generated or bundled code)
+MAX_TAG_BYTES = 1024 * 1024
+
+_PYTHON = re.compile(r"^[ \t]*(?:async[ \t]+)?(?:def|class)[ \t]+(\w+)", re.M)
+_SCRIPT = re.compile(
+    r"^[ \t]*(?:export[ \t]+)?(?:default[ \t]+)?(?:declare[ \t]+)?(?:abstract[ \t]+)?"
+    r"(?:async[ \t]+)?(?:function\*?|class|interface|type|enum)[ \t]+([\w$]+)"
+    r"|^[ \t]*(?:export[ \t]+)?(?:const|let|var)[ \t]+([\w$]+)[ \t]*(?::[^=\n]+)?=[ \t]*"
+    r"(?:async[ \t]*)?(?:\([^)\n]*\)|[\w$]+)[ \t]*(?::[^=\n]+)?=>", re.M)
+_GO = re.compile(r"^func[ \t]+(?:\([^)]*\)[ \t]*)?(\w+)|^type[ \t]+(\w+)", re.M)
+_RUST = re.compile(r"^[ \t]*(?:pub(?:\([^)]*\))?[ \t]+)?(?:async[ \t]+)?"
+                   r"(?:fn|struct|enum|trait|type|mod)[ \t]+(\w+)", re.M)
+_RUBY = re.compile(r"^[ \t]*(?:def[ \t]+(?:self\.)?([\w?!]+)|(?:class|module)[ \t]+(?:\w+::)*(\w+))", re.M)
+_JAVA = re.compile(r"^[ \t]*(?:(?:public|private|protected|static|final|abstract|sealed|data|open|internal)[ \t]+)*"
+                   r"(?:class|interface|enum|record|object|fun)[ \t]+(\w+)", re.M)
+_PHP = re.compile(r"^[ \t]*(?:(?:abstract|final|public|private|protected|static)[ \t]+)*"
+                  r"(?:function|class|interface|trait)[ \t]+(\w+)", re.M)
+
+# Definition patterns by extension, each match yields the name in one of its groups
+TAGGERS = {
+    '.py': _PYTHON, '.pyi': _PYTHON,
+    '.js': _SCRIPT, '.jsx': _SCRIPT, '.mjs': _SCRIPT, '.cjs': _SCRIPT,
+    '.ts': _SCRIPT, '.tsx': _SCRIPT,
+    '.go': _GO,
+    '.rs': _RUST,
+    '.rb': _RUBY,
+    '.java': _JAVA, '.kt': _JAVA, '.scala': _JAVA,
+    '.php': _PHP,
+}
+
+
+def tag_symbols(text, tagger):
+    """Names defined in text, in order, without repeats."""
+    names = []
+    seen = set()
+    for match in tagger.finditer(text):
+        name = next(group for group in match.groups() if group)
+        if name not in seen:
+            seen.add(name)
+            names.append(name)
+    return names
+
+
+class SymbolIndex:
+    """Files defining each function, class or type name in the project.
+
+    Built from the project file index in the background with a regex
+    tagger per language, then kept current by tagging saved files again.
+    A lookup is one dict access, no file is read. Files saved while a
+    build runs are queued and tagged once it is done, so the main and
+    async threads never change the index at the same time.
+
+    definitions: {symbol name: set of relative paths defining it}
+    """
+
+    def __init__(self):
+        self.root = None
+        self.built_at = None
+        self.definitions = {}
+        self.symbols = {}  # {relative path: names defined in it}
+        self.mtimes = {}  # {relative path: mtime when tagged}
+        # A background build is running, saves wait in queued
+        self.building = False
+        self.queued = set()  # Absolute paths saved during the build
+        self._lock = threading.Lock()
+
+    def is_built(self, root):
+        """Whether the index is up to date for root."""
+        return self.built_at is not None and root == self.root
+
+    def invalidate(self):
+        """Make the next use build the index again (unchanged files are not read again)."""
+        self.built_at = None
+
+    @profiled("symbol_index.build")
+    def build(self, project_index):
+        """Tag the source files of a built project index, then the files saved meanwhile."""
+        with self._lock:
+            self.building = True
+        try:
+            if project_index.root != self.root:
+                self.symbols = {}
+                self.mtimes = {}
+            self.root = project_index.root
+            symbols = {}
+            for rel_path in list(project_index.files):
+                tagger = TAGGERS.get(os.path.splitext(rel_path)[1].lower())
+                if tagger:
+                    symbols[rel_path] = self._tag(rel_path, tagger, self.symbols.get(rel_path))
+            definitions = {}
+            for rel_path, names in symbols.items():
+                for name in names:
+                    definitions.setdefault(name, set()).add(rel_path)
+            self.symbols = symbols
+            self.definitions = definitions
+            self.built_at = time.time()
+        finally:
+            with self._lock:
+                self.building = False
+                queued, self.queued = self.queued, set()
+        for path in queued:
+            self.update(path)
+        return len(definitions)
+
+    def update(self, path):
+        """Tag a saved file (absolute path) again, or after the running build."""
+        with self._lock:
+            if self.building:
+                self.queued.add(path)
+                return
+            self._update(path)
+
+    def _update(self, path):
+        if self.built_at is None or not self.root:
+            return
+        rel_path = os.path.relpath(path, self.root).replace(os.sep, "/")
+        tagger = TAGGERS.get(os.path.splitext(rel_path)[1].lower())
+        if rel_path.startswith("../") or not tagger:
+            return
+        for name in self.symbols.pop(rel_path, ()):
+            paths = self.definitions.get(name)
+            if paths:
+                paths.discard(rel_path)
+                if not paths:
+                    del self.definitions[name]
+        names = self._tag(rel_path, tagger)
+        self.symbols[rel_path] = names
+        for name in names:
+            self.definitions.setdefault(name, set()).add(rel_path)
+
+    def _tag(self, rel_path, tagger, previous=None):
+        """Names defined in a file, reusing previous ones if it did not change."""
+        path = os.path.join(self.root, rel_path)
+        try:
+            stat = os.stat(path)
+            if previous is not None and self.mtimes.get(rel_path) == stat.st_mtime:
+                return previous
+            if stat.st_size > MAX_TAG_BYTES:
+                names = ()
+            else:
+                with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                    names = tuple(tag_symbols(f.read(), tagger))
+        except (OSError, IOError):
+            self.mtimes.pop(rel_path, None)
+            return ()
+        self.mtimes[rel_path] = stat.st_mtime
+        return names
+
+    def lookup(self, name):
+        """Sorted files defining name."""
+        return sorted(self.definitions.get(name, ()))
@@ -1,19 +1,55 @@
 # AiderSavvy - Terminus terminal integration
+import os
+import time
+
 import sublime
 
+from .prompt_transport import (choose_transport, wrap_block, prompt_directory, PromptFileStore,
+                               BLOCK, FILE, FILE_INSTRUCTION, DEFAULT_FILE_THRESHOLD)
+from .settings import get_setting
+from .terminal_writer import TerminalWriter
+
 
 class AiderTerminal:
     """Manages the Aider terminal via Terminus plugin."""
 
-    def __init__(self, window, context):
+    DEFAULT_TAG = "aider_savvy"
+    DEFAULT_PANEL_NAME = "Aider"
+    # Longest slash command line sent at once, well under terminal line limits
+    MAX_COMMAND_LENGTH = 1000
+    # Enter submits, unless aider's multiline mode is on: then Meta+Enter does
+    SUBMIT = "\n"
+    MULTILINE_SUBMIT = "\x1b\r"
+
+    def __init__(self, window, context, tag=None, panel_name=None):
         self.window = window
         self.context = context
-        self.tag = "aider_savvy"
+        self.base_tag = tag or self.DEFAULT_TAG
+        self.base_panel_name = panel_name or self.DEFAULT_PANEL_NAME
+        self.tag = self.base_tag
+        self.panel_name = self.base_panel_name
         self.terminal_view = None
+        self.warm_pool = None
+        # When aider was last launched or adopted, for the watchdog
+        self.started_at = None
+        self.writer = TerminalWriter(self._write, context.events)
+        self.prompt_files = PromptFileStore(prompt_directory())
+        # Prompt file still in the chat as read-only, dropped before the next prompt.
+        # The history parser leaves prompt files out of the session's files.
+        self.prompt_file = None
 
     def start(self):
         """Start Aider in a Terminus terminal panel."""
-        cmd = self._build_command()
+        standby = None
+        if self.warm_pool:
+            standby = self.warm_pool.take(self._standby_key())
+        if standby:
+            self._attach_standby(standby)
+            return
+
+        # One consistent state for the command line and its directory
+        snapshot = self.context.snapshot
+        cmd = self._build_command(snapshot)
 
         # Close existing terminal if any
         self.stop()
@@ -22,14 +58,17 @@ class AiderTerminal:
             # Open Terminus as a PANEL (like Output: SFTP)
             self.window.run_command("terminus_open", {
                 "cmd": ["/bin/bash", "-c", cmd],
-                "cwd": self.context.project_root,
+                "cwd": snapshot.project_root,
                 "title": "Aider",
                 "tag": self.tag,
                 "auto_close": False,
-                "panel_name": "Aider",  # Crée un panel "Output: Aider"
+                "panel_name": self.panel_name,  # Crée un panel "Output: Aider"
             })
 
             self.context.is_running = True
+            self.started_at = time.time()
+            # Input typed before aider is ready waits in the queue
+            self.writer.starting()
 
             # Focus the panel after a short delay
             sublime.set_timeout(self._focus_panel, 100)
@@ -37,47 +76,179 @@ class AiderTerminal:
             sublime.error_message("Failed to start Aider terminal: {0}".format(e))
             self.context.is_running = False
 
+        self._warm_replacement()
+
+    def _attach_standby(self, standby):
+        """Adopt a pre-warmed aider process and apply the session state."""
+        self.stop()
+
+        self.tag = standby['tag']
+        self.panel_name = standby['panel_name']
+        self.context.is_running = True
+        self.started_at = time.time()
+        self._focus_panel()
+
+        for command in self._session_commands(standby['model']):
+            self.send_aider_command(command)
+
+        self._warm_replacement()
+
+    def _warm_replacement(self):
+        """Keep a standby process warming for the next start."""
+        if not self.warm_pool:
+            return
+        key = self._standby_key()
+        snapshot = self.context.snapshot
+        root = snapshot.project_root
+        cmd = self.build_standby_command(snapshot)
+        model = snapshot.model
+
+        def warm():
+            # Not if the session was closed meanwhile
+            if self.warm_pool:
+                self.warm_pool.warm(key, root, cmd, model)
+
+        # Let the attached session settle before launching another aider
+        sublime.set_timeout(warm, 2000)
+
+    def _standby_key(self):
+        """Standby processes are shared by sessions writing the same history."""
+        return self.context.get_aider_history_path()
+
     def _focus_panel(self):
         """Focus the Aider terminal panel."""
-        self.window.run_command("show_panel", {"panel": "output.Aider"})
+        self.window.run_command("show_panel", {"panel": "output.{0}".format(self.panel_name)})
 
-    def _build_command(self):
-        """Build the aider command with all options."""
+    def _build_command(self, snapshot):
+        """Build the aider command with all options, from a context snapshot."""
         parts = ["aider"]
 
         # Add files
-        for f in self.context.files:
+        for f in snapshot.files:
             parts.append("--file")
             parts.append('"{0}"'.format(f))
 
         # Add read-only files
-        for f in self.context.readonly_files:
+        for f in snapshot.readonly_files:
             parts.append("--read")
             parts.append('"{0}"'.format(f))
 
         # Mode
-        if self.context.mode == 'ask':
+        if snapshot.mode == 'ask':
             parts.append("--ask")
-        elif self.context.mode == 'architect':
+        elif snapshot.mode == 'architect':
             parts.append("--architect")
 
         # Model (if not default)
-        if self.context.model and self.context.model != 'gpt-4o':
+        if snapshot.model and snapshot.model != 'gpt-4o':
             parts.append("--model")
-            parts.append(self.context.model)
+            parts.append(snapshot.model)
+
+        parts.extend(self._history_options())
 
         return " ".join(parts)
 
-    def send_command(self, text):
-        """Send a command/text to the running Aider terminal."""
+    def build_standby_command(self, snapshot=None):
+        """Build the base aider command used for standby processes.
+
+        The warm pool adds the standby's own history file."""
+        snapshot = snapshot or self.context.snapshot
+        parts = ["aider"]
+        if snapshot.model and snapshot.model != 'gpt-4o':
+            parts.append("--model")
+            parts.append(snapshot.model)
+        return " ".join(parts)
+
+    def _history_options(self):
+        """Point aider at the session's own history file, if it has one."""
+        if self.context.history_file == self.context.DEFAULT_HISTORY_FILE:
+            return []
+        return ["--chat-history-file", '"{0}"'.format(self.context.history_file)]
+
+    def _session_commands(self, standby_model):
+        """Slash commands that bring a standby process to the current context."""
+        snapshot = self.context.snapshot
+        commands = []
+        if snapshot.model and snapshot.model != standby_model:
+            commands.append("model {0}".format(snapshot.model))
+        if snapshot.mode != 'code':
+            commands.append("chat-mode {0}".format(snapshot.mode))
+        commands.extend(self._chunk_paths_command("add", snapshot.files))
+        commands.extend(self._chunk_paths_command("read-only", snapshot.readonly_files))
+        return commands
+
+    def _quote_paths(self, paths):
+        """Join paths for a slash command, quoting those with spaces."""
+        return " ".join('"{0}"'.format(p) if " " in p else p for p in paths)
+
+    def _chunk_paths_command(self, command, paths):
+        """Split "command path..." into lines of at most MAX_COMMAND_LENGTH characters."""
+        lines = []
+        chunk = []
+        # Counting the leading slash send_aider_command adds
+        length = len(command) + 1
+        for path in paths:
+            quoted = self._quote_paths([path])
+            if chunk and length + 1 + len(quoted) > self.MAX_COMMAND_LENGTH:
+                lines.append("{0} {1}".format(command, " ".join(chunk)))
+                chunk = []
+                length = len(command) + 1
+            chunk.append(quoted)
+            length += 1 + len(quoted)
+        if chunk:
+            lines.append("{0} {1}".format(command, " ".join(chunk)))
+        return lines
+
+    def send_paths_command(self, command, paths):
+        """Send a slash command taking paths (add, drop, read-only) in chunked lines."""
+        for line in self._chunk_paths_command(command, paths):
+            self.send_aider_command(line)
+
+    def _submit_key(self):
+        """Key sequence that submits the typed input."""
+        return self.MULTILINE_SUBMIT if self.context.multiline_enabled else self.SUBMIT
+
+    def _write(self, string):
+        """Type string into the terminal, only called by the writer."""
         self.window.run_command("terminus_send_string", {
-            "string": text + "\n",
+            "string": string,
             "tag": self.tag
         })
 
+    def send_command(self, text, message=False):
+        """Send a command/text to the running Aider terminal.
+
+        Writes are queued in order and paced by self.writer; message marks
+        a chat prompt, after which the queue waits for aider's reply."""
+        self.writer.write(text + self._submit_key(), message)
+
     def send_message(self, message):
-        """Send a chat message to Aider."""
-        self.send_command(message)
+        """Send a chat message to Aider, through the cheapest transport for its size.
+
+        Returns the transport used (see prompt_transport)."""
+        if self.prompt_file:
+            self.send_paths_command("drop", [self.prompt_file])
+            self.prompt_file = None
+
+        threshold = get_setting("prompt_file_threshold", DEFAULT_FILE_THRESHOLD)
+        transport = choose_transport(message, self.context.multiline_enabled, threshold)
+        if transport == FILE:
+            try:
+                path = self.prompt_files.write(message)
+            except (OSError, IOError) as e:
+                print("AiderSavvy: Could not write prompt file: {0}".format(e))
+                # Typing it is slow but still works
+                transport = choose_transport(message, self.context.multiline_enabled, 0)
+            else:
+                self.send_paths_command("read-only", [path])
+                self.send_command(FILE_INSTRUCTION.format(os.path.basename(path)), True)
+                self.prompt_file = path
+                return transport
+        if transport == BLOCK:
+            self.send_command(wrap_block(message), True)
+        else:
+            self.send_command(message, True)
+        return transport
 
     def send_aider_command(self, command):
         """Send an Aider slash command (e.g., /add, /drop)."""
@@ -85,27 +256,59 @@ class AiderTerminal:
             command = "/" + command
         self.send_command(command)
 
+    def switch_model(self, model):
+        """Switch the model of the running session with /model."""
+        self.send_aider_command("model {0}".format(model))
+
+    def switch_mode(self, mode):
+        """Switch the chat mode of the running session with /chat-mode."""
+        self.send_aider_command("chat-mode {0}".format(mode))
+
+    def restart(self):
+        """Restart the terminal so the current context is applied."""
+        self.stop()
+        self.start()
+
     def stop(self):
         """Stop the Aider terminal."""
         # Close the terminus panel
+        self.writer.clear()
         self.window.run_command("terminus_close", {"tag": self.tag})
-        self.window.run_command("hide_panel", {"panel": "output.Aider"})
+        self.window.run_command("hide_panel", {"panel": "output.{0}".format(self.panel_name)})
         self.terminal_view = None
         self.context.is_running = False
+        # An adopted standby terminal is gone, go back to our own tag
+        self.tag = self.base_tag
+        self.panel_name = self.base_panel_name
 
-    def is_running(self):
-        """Check if terminal is active."""
+    def close(self):
+        """Stop the terminal for good, with the session's standby aider."""
+        self.stop()
+        if self.warm_pool:
+            self.warm_pool.stop(self._standby_key())
+            self.warm_pool = None
+
+    def find_view(self):
+        """The Terminus view or panel of the terminal, or None."""
         # Check if terminus with our tag exists
         try:
             for view in self.window.views():
                 if view.settings().get("terminus_view.tag") == self.tag:
-                    return True
+                    return view
             # Also check panels
-            return self.window.find_output_panel("Aider") is not None
+            return self.window.find_output_panel(self.panel_name)
         except Exception:
+            return None
+
+    def is_running(self):
+        """Check if terminal is active and aider in it has not exited."""
+        view = self.find_view()
+        if view is None:
             return False
+        # Terminus keeps the view open (auto_close is off) once the process ends
+        return not view.settings().get("terminus_view.finished", False)
 
     def focus(self):
         """Focus the Aider terminal panel."""
-        self.window.run_command("show_panel", {"panel": "output.Aider"})
+        self._focus_panel()
         return True
@@ -0,0 +1,175 @@
+# AiderSavvy - Ordered, paced writes to the aider terminal
+import collections
+import time
+
+import sublime
+
+from .events import OutputChunk, SessionStarted
+from .metrics import percentile
+from .profiling import profiler
+
+# Longest string handed to terminus_send_string at once
+CHUNK_SIZE = 512
+# Pause after each chunk, plus a part scaled to its size, so Terminus and
+# prompt_toolkit keep up with the typed characters
+CHUNK_DELAY_MS = 15
+DELAY_PER_KB_MS = 40
+# Check interval while holding back
+HOLD_POLL_MS = 200
+
+# After a chat message, aider is done once its reply reached the history
+# and the history stayed quiet this long
+QUIET_SECONDS = 1.0
+# Stop waiting for a reply or for aider to start after this long
+REPLY_TIMEOUT = 300
+STARTUP_TIMEOUT = 10
+
+HOLD_STARTING = "starting"
+HOLD_REPLYING = "replying"
+
+
+class TerminalWriter:
+    """The single writer of one aider terminal.
+
+    Every string sent to the terminal goes through write() and is queued
+    in order. Strings longer than CHUNK_SIZE are sent in chunks with a
+    pause scaled to their size. The queue holds back while aider cannot
+    take input, as seen from its history growing: after a start until the
+    session header is written, and after a chat message until the reply
+    is written and the history stays quiet for QUIET_SECONDS. Slash
+    commands are not waited for, aider reads them in order from the
+    terminal.
+    """
+
+    def __init__(self, send, events):
+        self.send = send  # send(string) types into the terminal
+        self.queue = collections.deque()  # [text, enqueued at, is a chat message]
+        self.scheduled = False
+        self.hold = None
+        self.hold_since = 0.0
+        self.reply_seen = False
+        self.last_growth = 0.0
+        # When the last chat message went out, 0.0 once aider wrote a reply
+        self.sent_at = 0.0
+        # Metrics
+        self.max_depth = 0
+        self.written = 0
+        self.latencies = collections.deque(maxlen=200)  # Enqueue to last chunk, ms
+        events.subscribe((OutputChunk, SessionStarted), self.on_history)
+
+    @property
+    def depth(self):
+        """Writes waiting in the queue."""
+        return len(self.queue)
+
+    def write(self, text, message=False):
+        """Queue text for the terminal; message marks a chat prompt aider replies to."""
+        self.queue.append([text, time.time(), message])
+        self.max_depth = max(self.max_depth, len(self.queue))
+        self._schedule(0)
+
+    def starting(self):
+        """aider was just launched, hold writes until it is ready."""
+        self._hold(HOLD_STARTING)
+        self.sent_at = 0.0
+
+    def clear(self):
+        """Drop the queued writes, the terminal is gone."""
+        self.queue.clear()
+        self.hold = None
+        self.sent_at = 0.0
+
+    def awaiting_reply(self):
+        """When the chat message aider has not replied to yet was sent, or None.
+
+        Unlike the hold, it does not time out."""
+        return self.sent_at or None
+
+    def _hold(self, reason):
+        self.hold = reason
+        self.hold_since = time.time()
+        self.reply_seen = False
+
+    # History
+
+    def on_history(self, events):
+        """Track aider's activity from the history events (any thread)."""
+        self.last_growth = time.time()
+        for event in events:
+            if isinstance(event, SessionStarted):
+                if self.hold == HOLD_STARTING:
+                    self.hold = None
+            elif self.sent_at and not self.reply_seen:
+                # The prompt itself is echoed as "#### " lines first
+                self.reply_seen = any(line.strip() and not line.startswith("####")
+                                      for line in event.text.split("\n"))
+                if self.reply_seen:
+                    self.sent_at = 0.0
+        if self.queue:
+            sublime.set_timeout(lambda: self._schedule(0), 0)
+
+    def holding(self):
+        """Why writes are held back, or None."""
+        if self.hold is None:
+            return None
+        now = time.time()
+        if self.hold == HOLD_STARTING:
+            if now - self.hold_since > STARTUP_TIMEOUT:
+                self.hold = None
+        elif now - self.hold_since > REPLY_TIMEOUT:
+            print("AiderSavvy: No reply from aider after {0}s, sending queued input".format(REPLY_TIMEOUT))
+            self.hold = None
+        elif self.reply_seen and now - self.last_growth >= QUIET_SECONDS:
+            self.hold = None
+        return self.hold
+
+    # Draining
+
+    def _schedule(self, delay):
+        if self.scheduled:
+            return
+        self.scheduled = True
+        sublime.set_timeout(self._pump, delay)
+
+    def _pump(self):
+        """Send the next chunk, then come back after a pause."""
+        self.scheduled = False
+        if not self.queue:
+            return
+        if self.holding():
+            self._schedule(HOLD_POLL_MS)
+            return
+
+        item = self.queue[0]
+        text = item[0]
+        chunk = text[:CHUNK_SIZE]
+        if len(text) > CHUNK_SIZE and chunk.endswith("\x1b"):
+            # Keep an escape sequence (Meta+Enter) in one write
+            chunk = chunk[:-1]
+        self.send(chunk)
+
+        if len(chunk) < len(text):
+            item[0] = text[len(chunk):]
+        else:
+            self.queue.popleft()
+            self.written += 1
+            latency = (time.time() - item[1]) * 1000.0
+            self.latencies.append(latency)
+            if profiler.enabled:
+                profiler.record("terminal.flush", latency)
+            if item[2]:
+                self._hold(HOLD_REPLYING)
+                self.sent_at = self.hold_since
+        if self.queue:
+            self._schedule(int(CHUNK_DELAY_MS + DELAY_PER_KB_MS * len(chunk) / 1024.0))
+
+    def stats(self):
+        """Queue depth and flush latency, for the Options tab."""
+        return {
+            'depth': len(self.queue),
+            'max_depth': self.max_depth,
+            'written': self.written,
+            'holding': self.holding(),
+            'flush_p50_ms': percentile(self.latencies, 0.5),
+            'flush_p95_ms': percentile(self.latencies, 0.95),
+        }
@@ -0,0 +1,163 @@
+# AiderSavvy - Token estimates of chat files against the model's context window
+import os
+import re
+import threading
+
+import sublime
+
+from .events import TokensEstimated
+from .profiling import profiled
+
+# Context window by model name fragment, the longest matching fragment wins
+MODEL_CONTEXT_WINDOWS = (
+    ('gpt-4.1', 1047576),
+    ('gpt-4o', 128000),
+    ('gpt-4-turbo', 128000),
+    ('gpt-4-32k', 32768),
+    ('gpt-4', 8192),
+    ('gpt-3.5', 16385),
+    ('gpt-5', 400000),
+    ('o1', 200000),
+    ('o3', 200000),
+    ('o4-mini', 200000),
+    ('claude', 200000),
+    ('sonnet', 200000),
+    ('opus', 200000),
+    ('haiku', 200000),
+    ('gemini', 1048576),
+    ('deepseek', 128000),
+    ('grok', 131072),
+    ('mistral', 128000),
+    ('llama', 128000),
+    ('qwen', 131072),
+)
+DEFAULT_CONTEXT_WINDOW = 128000
+# Share of the window the chat files may use, the rest goes to the system
+# prompt, repo map, chat history and the reply
+FILES_SHARE = 0.8
+
+# Rough tokenizer: short letter runs, number groups and single symbols
+TOKEN_RE = re.compile(r"[A-Za-z]{1,6}|\d{1,3}|[^\sA-Za-z\d]")
+# Bytes per token assumed before a file is sampled
+BYTES_PER_TOKEN = 3.5
+# Files larger than SAMPLES * SAMPLE_BYTES are estimated from SAMPLES slices
+SAMPLE_BYTES = 32 * 1024
+SAMPLES = 3
+
+
+def context_window(model):
+    """Context window of model, in tokens (DEFAULT_CONTEXT_WINDOW if unknown)."""
+    name = (model or "").lower()
+    best = None
+    for fragment, tokens in MODEL_CONTEXT_WINDOWS:
+        if fragment in name and (best is None or len(fragment) > len(best[0])):
+            best = (fragment, tokens)
+    return best[1] if best else DEFAULT_CONTEXT_WINDOW
+
+
+def count_tokens(text):
+    """Approximate token count of text."""
+    return len(TOKEN_RE.findall(text))
+
+
+def format_tokens(tokens):
+    """Compact token count: 850, 12.3k, 1.2M."""
+    if tokens < 1000:
+        return str(int(tokens))
+    if tokens < 1000000:
+        return "{0:.1f}k".format(tokens / 1000.0)
+    return "{0:.1f}M".format(tokens / 1000000.0)
+
+
+class TokenEstimator:
+    """Token estimates of project files, keyed by (path, mtime, size).
+
+    A file's first estimate comes from its size alone. Sampling it (read
+    whole when small, SAMPLES slices when large) runs in the background
+    and TokensEstimated is published once it refines estimates, so the
+    panels can render again. An estimate stays valid until the file's
+    mtime or size change.
+
+    entries: {absolute path: (mtime, size, tokens)}
+    """
+
+    def __init__(self, events):
+        self.events = events
+        self.entries = {}
+        self.pending = set()
+        # Bumped whenever a sampled estimate is stored, for render caches
+        self.generation = 0
+        self._lock = threading.Lock()
+
+    def estimate(self, path):
+        """(tokens, sampled) for an absolute path, (0, True) if it cannot be read."""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return 0, True
+        with self._lock:
+            entry = self.entries.get(path)
+        if entry and entry[0] == stat.st_mtime and entry[1] == stat.st_size:
+            return entry[2], True
+        return int(stat.st_size / BYTES_PER_TOKEN), False
+
+    def total(self, root, rel_paths):
+        """Estimated tokens of files relative to root, sampling missing ones later."""
+        total = 0
+        missing = []
+        for rel_path in rel_paths:
+            path = os.path.join(root, rel_path)
+            tokens, sampled = self.estimate(path)
+            total += tokens
+            if not sampled:
+                missing.append(path)
+        if missing:
+            self.refresh(missing)
+        return total
+
+    def refresh(self, paths):
+        """Sample paths in the background, then publish TokensEstimated."""
+        with self._lock:
+            paths = [path for path in paths if path not in self.pending]
+            self.pending.update(paths)
+        if not paths:
+            return
+
+        def sample():
+            try:
+                for path in paths:
+                    self._sample(path)
+            finally:
+                with self._lock:
+                    self.pending.difference_update(paths)
+            sublime.set_timeout(lambda: self.events.publish([TokensEstimated(tuple(paths))]), 0)
+
+        sublime.set_timeout_async(sample, 0)
+
+    @profiled("token_budget.sample")
+    def _sample(self, path):
+        """Estimate one file from its content and remember it."""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return
+        try:
+            with open(path, 'rb') as f:
+                if stat.st_size <= SAMPLES * SAMPLE_BYTES:
+                    tokens = count_tokens(f.read().decode('utf-8', 'replace'))
+                else:
+                    sampled = 0
+                    counted = 0
+                    step = (stat.st_size - SAMPLE_BYTES) // (SAMPLES - 1)
+                    for i in range(SAMPLES):
+                        f.seek(i * step)
+                        data = f.read(SAMPLE_BYTES)
+                        sampled += len(data)
+                        counted += count_tokens(data.decode('utf-8', 'replace'))
+                    tokens = int(counted * stat.st_size / float(max(sampled, 1)))
+        except (OSError, IOError):
+            # Unreadable: keep the size estimate rather than sampling it again
+            tokens = int(stat.st_size / BYTES_PER_TOKEN)
+        with self._lock:
+            self.entries[path] = (stat.st_mtime, stat.st_size, tokens)
+            self.generation += 1
@@ -0,0 +1,129 @@
+# AiderSavvy - Warm standby aider processes
+import os
+
+import sublime
+
+from .settings import get_cache_dir
+
+
+class AiderWarmPool:
+    """Keeps one idle aider process per project root ready to be attached.
+
+    Standby processes are keyed by history file path, so sessions that write
+    their own history (see --chat-history-file) get their own standby.
+
+    Cold-starting aider costs seconds of imports and repo-map building. A
+    standby process is launched in a hidden Terminus panel with the base
+    command only (no files, default mode); the terminal adopts its tag when
+    started and applies the session state through slash commands.
+
+    A standby writes to its own history file in the cache directory, so
+    its start does not show up in a live session's history. When it is
+    taken, what it wrote is moved to the session's history and its file
+    is replaced by a link to it: aider opens the history file for every
+    append, so from then on it writes to the session's history."""
+
+    def __init__(self, window):
+        self.window = window
+        self.standby = {}  # key (history path) -> standby info dict
+        self.counter = 0
+
+    def warm(self, key, project_root, cmd, model):
+        """Launch a standby process for key unless one exists."""
+        if key in self.standby:
+            return
+
+        self.counter += 1
+        tag = "aider_savvy_warm_{0}".format(self.counter)
+        panel_name = "Aider Standby {0}".format(self.counter)
+        history = self._history_path(self.counter)
+        active_panel = self.window.active_panel()
+
+        try:
+            # A file left by an earlier run may still link to a session's history
+            if os.path.lexists(history):
+                os.remove(history)
+            os.makedirs(os.path.dirname(history), exist_ok=True)
+            cmd = '{0} --chat-history-file "{1}"'.format(cmd, history)
+            self.window.run_command("terminus_open", {
+                "cmd": ["/bin/bash", "-c", cmd],
+                "cwd": project_root,
+                "title": "Aider (standby)",
+                "tag": tag,
+                "auto_close": False,
+                "focus": False,
+                "panel_name": panel_name,
+            })
+        except Exception as e:
+            print("AiderSavvy: Failed to start standby aider: {0}".format(e))
+            return
+
+        self.standby[key] = {
+            'tag': tag,
+            'panel_name': panel_name,
+            'model': model,
+            'history': history,
+        }
+
+        # Keep the standby panel out of sight
+        sublime.set_timeout(lambda: self._restore_panel(active_panel), 100)
+
+    def _history_path(self, number):
+        return os.path.join(get_cache_dir(), "standby", "{0}.chat.history.md".format(number))
+
+    def _restore_panel(self, active_panel):
+        """Restore whatever panel was visible before the standby launch."""
+        if active_panel and not active_panel.startswith("output.Aider Standby"):
+            self.window.run_command("show_panel", {"panel": active_panel})
+        else:
+            self.window.run_command("hide_panel")
+
+    def take(self, key):
+        """Hand over the standby process for key (the session's history path), if any."""
+        standby = self.standby.pop(key, None)
+        if not standby:
+            return None
+        if self.window.find_output_panel(standby['panel_name']) is None:
+            # The standby terminal was closed behind our back
+            return None
+        try:
+            self._redirect_history(standby['history'], key)
+        except OSError as e:
+            print("AiderSavvy: Cannot hand over the standby aider: {0}".format(e))
+            self._close(standby)
+            return None
+        return standby
+
+    def _redirect_history(self, standby_history, history_path):
+        """Move the standby's history to history_path and link its file there."""
+        if os.path.exists(standby_history):
+            with open(standby_history, 'rb') as f:
+                data = f.read()
+            if data:
+                with open(history_path, 'ab') as f:
+                    f.write(data)
+        # Replaced in one step, aider never finds the file missing
+        link = standby_history + ".link"
+        if os.path.lexists(link):
+            os.remove(link)
+        os.symlink(os.path.abspath(history_path), link)
+        os.replace(link, standby_history)
+
+    def stop(self, key):
+        """Close the standby process for key, if any."""
+        standby = self.standby.pop(key, None)
+        if standby:
+            self._close(standby)
+
+    def _close(self, standby):
+        self.window.run_command("terminus_close", {"tag": standby['tag']})
+        try:
+            os.remove(standby['history'])
+        except OSError:
+            pass
+
+    def stop_all(self):
+        """Close all standby processes."""
+        for standby in self.standby.values():
+            self._close(standby)
+        self.standby = {}
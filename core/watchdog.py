@@ -0,0 +1,106 @@
+# AiderSavvy - Health watchdog for the aider process
+import time
+
+from .events import HealthChanged
+from .settings import get_setting
+
+# Health states
+STOPPED = "stopped"    # No terminal started
+OK = "ok"              # Running, no prompt waiting for a reply
+WAITING = "waiting"    # A prompt was sent, the history grew recently
+STALLED = "stalled"    # A prompt was sent, the history has not grown for stall_seconds
+EXITED = "exited"      # Started, but the terminal was closed or aider exited
+
+DEFAULT_STALL_SECONDS = 180
+# The Terminus view is looked up at most this often
+LIVENESS_INTERVAL = 5
+# Liveness is not judged until the terminal had this long to open
+STARTUP_GRACE = 5
+
+
+def format_duration(seconds):
+    """Short elapsed time: 45s, 3m, 1h05m."""
+    seconds = int(seconds)
+    if seconds < 60:
+        return "{0}s".format(seconds)
+    if seconds < 3600:
+        return "{0}m".format(seconds // 60)
+    return "{0}h{1:02d}m".format(seconds // 3600, seconds % 3600 // 60)
+
+
+class AiderWatchdog:
+    """Health of one session's aider process.
+
+    Checked by the file watcher after each poll, from what is already
+    known: the history's mtime the watcher stat'ed tells when aider last
+    wrote, the terminal writer whether a prompt is waiting for its reply.
+    No file is read or stat'ed. The Terminus view is looked up every
+    LIVENESS_INTERVAL to notice a closed terminal or an exited process,
+    which is_running() alone cannot tell from the panel left open.
+
+    aider writes a reply to the history once it is complete, so a prompt
+    is stalled when nothing was written for stall_seconds after it.
+    HealthChanged is published on the context's events on each change.
+    """
+
+    def __init__(self, context, terminal):
+        self.context = context
+        self.terminal = terminal
+        self.state = STOPPED
+        self.since = time.time()  # When the state was entered
+        self.idle = 0.0  # Seconds without history writes while a prompt waits
+        # Terminal start the liveness below was looked up for
+        self.started_at = None
+        self.alive = True
+        self.alive_checked = 0.0
+
+    def stall_seconds(self):
+        return get_setting("stall_seconds", DEFAULT_STALL_SECONDS)
+
+    def check(self, last_write):
+        """Update the health; last_write is the history's mtime from the watcher."""
+        now = time.time()
+        if not self.context.is_running:
+            state = STOPPED
+        else:
+            if self.terminal.started_at != self.started_at:
+                # Started or restarted since the last lookup
+                self.started_at = self.terminal.started_at
+                self.alive = True
+                self.alive_checked = 0.0
+            if not self._is_alive(now):
+                state = EXITED
+            else:
+                sent_at = self.terminal.writer.awaiting_reply()
+                if sent_at:
+                    self.idle = now - max(last_write, sent_at)
+                    state = STALLED if self.idle >= self.stall_seconds() else WAITING
+                else:
+                    self.idle = 0.0
+                    state = OK
+        if state != self.state:
+            previous = self.state
+            self.state = state
+            self.since = now
+            self.context.events.publish([HealthChanged(state, previous)])
+        return state
+
+    def _is_alive(self, now):
+        """Whether the terminal is open with aider in it, looked up at most every LIVENESS_INTERVAL."""
+        if now - (self.started_at or 0) < STARTUP_GRACE:
+            return True
+        if now - self.alive_checked >= LIVENESS_INTERVAL:
+            self.alive_checked = now
+            self.alive = self.terminal.is_running()
+        return self.alive
+
+    def describe(self):
+        """What the state means, for the Options tab, or None when all is well."""
+        if self.state == WAITING:
+            return "waiting for a reply, last output {0} ago".format(format_duration(self.idle))
+        if self.state == STALLED:
+            return "no output for {0} after the prompt".format(format_duration(self.idle))
+        if self.state == EXITED:
+            return "aider exited or its terminal was closed {0} ago".format(
+                format_duration(time.time() - self.since))
+        return None
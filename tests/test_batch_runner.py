@@ -0,0 +1,75 @@
+# AiderSavvy - Batch runner run against benchmarks/fake_aider.py
+import importlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+BENCHMARKS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks")
+sys.path.insert(0, BENCHMARKS)
+
+import sublime_stub  # noqa: E402
+
+sublime_stub.load_package()
+batch_runner = importlib.import_module("AiderSavvy.core.batch_runner")
+context = importlib.import_module("AiderSavvy.core.context")
+
+FAKE_AIDER = os.path.join(BENCHMARKS, "fake_aider.py")
+
+
+class BatchRunnerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        os.environ["FAKE_AIDER_DELAY"] = "0"
+        window = sublime_stub.Window()
+        window.folders = lambda: [self.root]
+        self.context = context.AiderContext(window, self.root)
+
+    def tearDown(self):
+        os.environ.pop("FAKE_AIDER_DELAY", None)
+        os.environ.pop("FAKE_AIDER_FAIL", None)
+        shutil.rmtree(self.root)
+
+    def run_jobs(self, jobs, concurrency=2):
+        runner = batch_runner.AiderBatchRunner(self.context, jobs, concurrency, FAKE_AIDER)
+        runner.start()
+        deadline = time.time() + 30
+        while runner.finished is None and time.time() < deadline:
+            time.sleep(0.05)
+        self.assertIsNotNone(runner.finished, "batch did not finish")
+        return runner
+
+    def read_history(self, job):
+        with open(job.history_path) as f:
+            return f.read()
+
+    def test_parallel_jobs_do_not_commit(self):
+        jobs = [batch_runner.AiderBatchJob(i, "rename x", ["f{0}.py".format(i)]) for i in range(1, 5)]
+        runner = self.run_jobs(jobs)
+        self.assertEqual(runner.counts(), {batch_runner.AiderBatchJob.DONE: 4})
+        for job in jobs:
+            history = self.read_history(job)
+            self.assertIn("Added {0} to the chat.".format(job.files[0]), history)
+            self.assertNotIn("> Commit", history)
+
+    def test_jobs_have_their_own_history(self):
+        jobs = [batch_runner.AiderBatchJob(i, "prompt {0}".format(i), ["f.py"]) for i in range(1, 4)]
+        self.run_jobs(jobs, concurrency=3)
+        for job in jobs:
+            history = self.read_history(job)
+            self.assertIn("#### prompt {0}".format(job.number), history)
+            self.assertEqual(history.count("# aider chat started"), 1)
+
+    def test_failed_job(self):
+        os.environ["FAKE_AIDER_FAIL"] = "1"
+        job = batch_runner.AiderBatchJob(1, "prompt", ["f.py"])
+        self.run_jobs([job])
+        self.assertEqual(job.status, batch_runner.AiderBatchJob.FAILED)
+        self.assertEqual(job.returncode, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+# AiderSavvy - Multiline message buffer reaching the terminal
+import importlib
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+BENCHMARKS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks")
+sys.path.insert(0, BENCHMARKS)
+
+import sublime_stub  # noqa: E402
+
+plugin = sublime_stub.load_package()
+dashboard = importlib.import_module("AiderSavvy.commands.dashboard")
+session_commands = importlib.import_module("AiderSavvy.commands.session_commands")
+
+
+class SendMultilineTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.window = sublime_stub.Window([self.root])
+        self.instance = dashboard.get_aider_instance(self.window)
+        self.sent = []
+        terminal = self.instance.terminal
+        terminal.is_running = lambda: True
+        send_message = terminal.send_message
+        terminal.send_message = lambda message: self.sent.append(message) or send_message(message)
+
+    def tearDown(self):
+        sublime_stub.clear_timeouts()
+        shutil.rmtree(self.root)
+
+    def open_buffer(self, text):
+        session_commands.AiderSavvySendMultilineCommand(self.window).run()
+        view = self.window.active_view()
+        view.text = text
+        return view
+
+    def test_buffer_is_sent_when_closed(self):
+        view = self.open_buffer("Refactor this:\n\n    def f(): pass\n")
+        plugin.AiderSavvyEventListener().on_pre_close(view)
+        self.assertEqual(self.sent, ["Refactor this:\n\n    def f(): pass\n"])
+        # Several lines go out as one {aider_savvy ... aider_savvy} block
+        self.assertIn("{aider_savvy", "".join(item[0] for item in self.instance.terminal.writer.queue))
+
+    def test_empty_buffer_is_discarded(self):
+        view = self.open_buffer("  \n")
+        plugin.AiderSavvyEventListener().on_pre_close(view)
+        self.assertEqual(self.sent, [])
+
+    def test_other_views_are_not_sent(self):
+        view = self.window.new_file()
+        view.text = "some file\n"
+        plugin.AiderSavvyEventListener().on_pre_close(view)
+        self.assertEqual(self.sent, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
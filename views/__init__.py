@@ -2,3 +2,5 @@
 from .options_panel import OptionsPanel
 from .output_panel import OutputPanel
 from .files_panel import FilesPanel
+from .batch_panel import BatchPanel
+from .metrics_panel import MetricsPanel
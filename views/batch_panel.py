@@ -0,0 +1,65 @@
+# AiderSavvy - Batch jobs panel view
+import sublime
+import time
+
+
+class BatchPanel:
+    """Renders the headless batch job progress panel."""
+
+    def __init__(self, window, context):
+        self.window = window
+        self.context = context
+        self.runner = None
+
+    def get_content(self):
+        """Get the batch panel content as string."""
+        lines = []
+
+        # Header
+        lines.append("  AIDER BATCH JOBS (headless one-shot runs)")
+        lines.append("")
+        lines.append("  [B] Prompt on each editable file    [X] Cancel batch")
+        lines.append("  Aider: Run Batch Jobs From View (JSON lines: prompt, files, read)")
+        lines.append("")
+
+        runner = self.runner
+        if not runner:
+            lines.append("-" * 60)
+            lines.append("    (no batch started)")
+            return "\n".join(lines)
+
+        counts = runner.counts()
+        state = "RUNNING" if runner.is_running() else "FINISHED"
+        if runner.cancelled:
+            state = "CANCELLED"
+        elapsed = 0.0
+        if runner.started:
+            elapsed = (runner.finished or time.time()) - runner.started
+
+        lines.append("-" * 60)
+        lines.append("  Batch {0} [{1}]".format(runner.run_id, state))
+        lines.append("-" * 60)
+        lines.append("  Jobs      : {0} total, {1} done, {2} running, {3} pending, {4} failed, {5} cancelled".format(
+            len(runner.jobs), counts.get('done', 0), counts.get('running', 0),
+            counts.get('pending', 0), counts.get('failed', 0), counts.get('cancelled', 0)))
+        lines.append("  Workers   : {0}".format(runner.concurrency))
+        lines.append("  Elapsed   : {0:.1f}s".format(elapsed))
+        lines.append("  Throughput: {0:.1f} jobs/min".format(runner.throughput()))
+        lines.append("  Logs      : {0}".format(runner.batch_dir))
+        lines.append("")
+
+        for job in runner.jobs:
+            duration = job.duration
+            timing = " {0:.1f}s".format(duration) if duration is not None else ""
+            prompt = job.prompt.replace("\n", " ")
+            if len(prompt) > 50:
+                prompt = prompt[:47] + "..."
+            lines.append("  #{0:03d} [{1}{2}] {3}".format(job.number, job.status, timing, prompt))
+            if job.files:
+                lines.append("        files: {0}".format(", ".join(job.files)))
+            if job.error:
+                lines.append("        error: {0}".format(job.error))
+            elif job.status == 'failed':
+                lines.append("        exit code {0}, see {1}".format(job.returncode, job.log_path))
+
+        return "\n".join(lines)
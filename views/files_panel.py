@@ -1,7 +1,12 @@
 # AiderSavvy - Files panel view
 import sublime
+import bisect
 import os
 
+from ..core.events import FileAdded, ReadOnlyAdded, FileDropped, StateSynced
+from ..core.profiling import profiled
+from ..core.token_budget import format_tokens
+
 
 class FilesPanel:
     """Renders the files management panel."""
@@ -10,105 +15,146 @@ class FilesPanel:
         self.window = window
         self.context = context
         self.available_files = []
-
-    def scan_project_files(self):
-        """Scan project for available files."""
-        self.available_files = []
-        folders = self.window.folders()
-
-        if not folders:
+        # The available files need a scan, they cannot be updated from events
+        self.stale = True
+        # ((snapshot version, estimates generation), rendered chat file sections)
+        self._chat_lines = (None, None)
+        context.events.subscribe((FileAdded, ReadOnlyAdded, FileDropped, StateSynced), self.on_events)
+
+    def on_events(self, events):
+        """Keep the available files in step with files added to or dropped from the chat."""
+        for event in events:
+            if isinstance(event, StateSynced):
+                # Files were replaced as a whole, dropped ones are only found by a scan
+                self.stale = True
+            elif isinstance(event, FileDropped):
+                if event.path not in self.context.snapshot.chat_files:
+                    self._make_available(event.path)
+            else:
+                position = bisect.bisect_left(self.available_files, event.path)
+                if position < len(self.available_files) and self.available_files[position] == event.path:
+                    del self.available_files[position]
+
+    def _make_available(self, rel_path):
+        """Insert a project file back into the sorted available files."""
+        if rel_path not in self.context.project_index.files:
             return
+        position = bisect.bisect_left(self.available_files, rel_path)
+        if position == len(self.available_files) or self.available_files[position] != rel_path:
+            self.available_files.insert(position, rel_path)
 
-        ignore_dirs = {'.git', '__pycache__', 'node_modules', '.venv', 'venv',
-                       'dist', 'build', '.idea', '.vscode', '.svn', '.hg'}
-        ignore_extensions = {'.pyc', '.pyo', '.so', '.o', '.a', '.dylib',
-                             '.jpg', '.jpeg', '.png', '.gif', '.ico', '.pdf',
-                             '.bin', '.exe', '.dll', '.obj', '.class'}
-        max_files = 1000  # Limit to prevent performance issues
-
-        for folder in folders:
-            try:
-                for root, dirs, files in os.walk(folder):
-                    # Filter directories
-                    dirs[:] = [d for d in dirs if d not in ignore_dirs and not d.startswith('.')]
-                    
-                    # Early exit if we have too many files
-                    if len(self.available_files) >= max_files:
-                        break
-                        
-                    for f in files:
-                        # Skip ignored extensions
-                        ext = os.path.splitext(f)[1].lower()
-                        if ext in ignore_extensions:
-                            continue
-
-                        # Skip aider files and hidden files
-                        if f.startswith('.aider') or f.startswith('.'):
-                            continue
-
-                        full_path = os.path.join(root, f)
-                        rel_path = os.path.relpath(full_path, folder)
-
-                        # Skip if already added to context
-                        if rel_path not in self.context.files and rel_path not in self.context.readonly_files:
-                            self.available_files.append(rel_path)
-                            
-                        if len(self.available_files) >= max_files:
-                            break
-                            
-                    if len(self.available_files) >= max_files:
-                        break
-            except (OSError, IOError) as e:
-                print("AiderSavvy: Error scanning folder {0}: {1}".format(folder, e))
-                continue
-
-        # Remove duplicates and sort
-        self.available_files = sorted(list(set(self.available_files)))
+    @profiled("files_panel.scan_project_files")
+    def scan_project_files(self):
+        """List the project files outside the chat, from the project file index.
+
+        Returns False when the index is not built for the project root yet:
+        it is then built in the background and the Files tab rendered again."""
+        index = self.context.project_index
+        root = self.context.project_root
+        if not index.is_built(root):
+            self.available_files = []
+            self.stale = True
+            index.build_later(root, self._on_indexed)
+            return False
+        chat_files = self.context.snapshot.chat_files
+        self.available_files = sorted(path for path in index.files if path not in chat_files)
+        self.stale = False
+        return True
+
+    def _on_indexed(self):
+        instance = getattr(self.window, 'aider_savvy', None)
+        if instance and instance.files_panel is self:
+            instance.refresh_files()
 
     def get_content(self):
         """Get the files panel content as string."""
-        ctx = self.context
         lines = []
 
         # Header
         lines.append("  AIDER FILES")
         lines.append("")
         lines.append("  [a] Add file    [d] Drop file    [r] Read-only")
-        lines.append("  [A] Add current [s] Scan project")
+        lines.append("  [A] Add current [s] Scan project    [u] Add git changes")
+        lines.append("  [G] Add glob    [D] Add directory    [i] Add related")
         lines.append("")
 
-        # Editable files
+        lines.extend(self._chat_file_lines(self.context.snapshot))
+
+        # Available files (show first 30)
         lines.append("-" * 60)
-        lines.append("  Editable Files ({0})".format(len(ctx.files)))
+        lines.append("  Available Files ({0} total)".format(len(self.available_files)))
         lines.append("-" * 60)
-        if ctx.files:
-            for i, f in enumerate(ctx.files, 1):
-                lines.append("  {0:2}. {1}".format(i, f))
+        if self.available_files:
+            shown = self.available_files[:30]
+            for f, tokens in zip(shown, self._file_tokens(shown)):
+                lines.append("    {0}  (~{1} tok)".format(f, format_tokens(tokens)))
+            if len(self.available_files) > 30:
+                lines.append("    ... and {0} more".format(len(self.available_files) - 30))
+        elif self.context.project_index.building:
+            lines.append("    (indexing project files...)")
         else:
-            lines.append("    (no files)")
+            lines.append("    (press [s] to scan project)")
+
+        return "\n".join(lines)
+
+    def _file_tokens(self, rel_paths, snapshot=None):
+        """Estimated tokens of each file, sampling the unknown ones in the background."""
+        snapshot = snapshot or self.context.snapshot
+        estimator = self.context.token_estimator
+        tokens = []
+        missing = []
+        for rel_path in rel_paths:
+            path = os.path.join(snapshot.project_root, rel_path)
+            estimate, sampled = estimator.estimate(path)
+            tokens.append(estimate)
+            if not sampled:
+                missing.append(path)
+        if missing:
+            estimator.refresh(missing)
+        return tokens
+
+    def _chat_file_lines(self, snapshot):
+        """Budget, editable and read-only sections, cached per snapshot and estimates."""
+        key = (snapshot.version, self.context.token_estimator.generation)
+        if self._chat_lines[0] == key:
+            return self._chat_lines[1]
+        lines = []
+        file_tokens = self._file_tokens(snapshot.files, snapshot)
+        readonly_tokens = self._file_tokens(snapshot.readonly_files, snapshot)
+
+        # Token budget
+        used = sum(file_tokens) + sum(readonly_tokens)
+        budget = self.context.token_budget(snapshot)
+        window = self.context.context_window(snapshot)
+        lines.append("  Context: ~{0} / {1} tokens for files ({2}% of {3}, {4})".format(
+            format_tokens(used), format_tokens(budget), int(100.0 * used / budget) if budget else 0,
+            format_tokens(window), snapshot.model))
+        if used > budget:
+            lines.append("  WARNING: the chat files exceed the budget, drop some with [d]")
         lines.append("")
 
-        # Read-only files
+        # Editable files
         lines.append("-" * 60)
-        lines.append("  Read-only Files ({0})".format(len(ctx.readonly_files)))
+        lines.append("  Editable Files ({0}, ~{1} tok)".format(len(snapshot.files), format_tokens(sum(file_tokens))))
         lines.append("-" * 60)
-        if ctx.readonly_files:
-            for i, f in enumerate(ctx.readonly_files, 1):
-                lines.append("  {0:2}. {1} [read-only]".format(i, f))
+        if snapshot.files:
+            for i, (f, tokens) in enumerate(zip(snapshot.files, file_tokens), 1):
+                lines.append("  {0:2}. {1}  (~{2} tok)".format(i, f, format_tokens(tokens)))
         else:
-            lines.append("    (no read-only files)")
+            lines.append("    (no files)")
         lines.append("")
 
-        # Available files (show first 30)
+        # Read-only files
         lines.append("-" * 60)
-        lines.append("  Available Files ({0} total)".format(len(self.available_files)))
+        lines.append("  Read-only Files ({0}, ~{1} tok)".format(
+            len(snapshot.readonly_files), format_tokens(sum(readonly_tokens))))
         lines.append("-" * 60)
-        if self.available_files:
-            for f in self.available_files[:30]:
-                lines.append("    {0}".format(f))
-            if len(self.available_files) > 30:
-                lines.append("    ... and {0} more".format(len(self.available_files) - 30))
+        if snapshot.readonly_files:
+            for i, (f, tokens) in enumerate(zip(snapshot.readonly_files, readonly_tokens), 1):
+                lines.append("  {0:2}. {1} [read-only]  (~{2} tok)".format(i, f, format_tokens(tokens)))
         else:
-            lines.append("    (press [s] to scan project)")
+            lines.append("    (no read-only files)")
+        lines.append("")
 
-        return "\n".join(lines)
+        self._chat_lines = (key, lines)
+        return lines
@@ -0,0 +1,62 @@
+# AiderSavvy - Metrics panel view
+import sublime
+
+
+def _seconds(value):
+    """Format a duration, or a dash when unknown."""
+    return "{0:.1f}s".format(value) if value is not None else "-"
+
+
+class MetricsPanel:
+    """Renders latency, throughput and cost metrics from the history."""
+
+    def __init__(self, window, context):
+        self.window = window
+        self.context = context
+
+    def get_content(self):
+        """Get the metrics panel content as string."""
+        summary = self.context.metrics.summary()
+        lines = []
+
+        # Header
+        lines.append("  AIDER METRICS (from {0})".format(self.context.history_file))
+        lines.append("")
+        lines.append("  Latency is measured from watcher arrival times, only for")
+        lines.append("  turns seen live since the dashboard opened.")
+        lines.append("")
+
+        # Latency
+        lines.append("-" * 60)
+        lines.append("  Response Latency ({0} timed turns of {1})".format(
+            summary['timed_turns'], summary['turns']))
+        lines.append("-" * 60)
+        lines.append("    Full reply    p50: {0:>8}   p95: {1:>8}".format(
+            _seconds(summary['latency_p50']), _seconds(summary['latency_p95'])))
+        lines.append("    First output  p50: {0:>8}   p95: {1:>8}".format(
+            _seconds(summary['first_output_p50']), _seconds(summary['first_output_p95'])))
+        lines.append("")
+
+        # Per model
+        lines.append("-" * 60)
+        lines.append("  By Model")
+        lines.append("-" * 60)
+        if summary['by_model']:
+            for model in sorted(summary['by_model']):
+                stats = summary['by_model'][model]
+                rate = stats['tokens_per_second']
+                lines.append("    {0}".format(model))
+                lines.append("      turns: {0}  sent: {1}  received: {2}  tok/s: {3}  cost: ${4:.4f}".format(
+                    stats['turns'], stats['sent'], stats['received'],
+                    "{0:.1f}".format(rate) if rate is not None else "-", stats['cost']))
+        else:
+            lines.append("    (no turns yet)")
+        lines.append("")
+
+        # Totals
+        lines.append("-" * 60)
+        lines.append("  Cumulative: {0} tokens sent, {1} received, ${2:.4f}".format(
+            summary['sent'], summary['received'], summary['cost']))
+        lines.append("-" * 60)
+
+        return "\n".join(lines)
@@ -1,17 +1,23 @@
 # AiderSavvy - Options panel view
 import sublime
 
+from ..core.watchdog import STALLED, EXITED
+
 
 class OptionsPanel:
     """Renders the options/status panel (GitSavvy style)."""
 
-    def __init__(self, window, context):
+    def __init__(self, window, context, terminal=None, watchdog=None):
         self.window = window
         self.context = context
+        self.terminal = terminal
+        self.watchdog = watchdog
 
     def get_content(self):
         """Get the options panel content as string."""
         ctx = self.context
+        # Session state as of now, consistent across the whole render
+        state = ctx.snapshot
         lines = []
 
         # Header
@@ -20,7 +26,17 @@ class OptionsPanel:
 
         # Status
         status = "RUNNING" if ctx.is_running else "READY"
+        unhealthy = self.watchdog is not None and self.watchdog.state in (STALLED, EXITED)
+        if unhealthy:
+            status = self.watchdog.state.upper()
         lines.append("  Status: [{0}]".format(status))
+        health = self.watchdog.describe() if self.watchdog else None
+        if health:
+            lines.append("  Health: {0}".format(health))
+        if unhealthy:
+            lines.append("  [k] Restart aider with the same files, mode and model")
+        if self.terminal:
+            lines.append("  Input queue: {0}".format(self._queue_line(self.terminal.writer.stats())))
         lines.append("")
 
         # Session info
@@ -29,22 +45,34 @@ class OptionsPanel:
         lines.append("-" * 60)
         lines.append("")
         # Find current model display with alias
-        current_model_display = ctx.model
+        current_model_display = state.model
         for alias_name, model_name in ctx.model_aliases:
-            if model_name == ctx.model:
+            if model_name == state.model:
                 current_model_display = "{0} → {1}".format(alias_name, model_name)
                 break
 
-        lines.append("  [m] Mode    : {0}".format(ctx.mode.upper()))
+        mode_display = state.mode.upper()
+        if ctx.pending_mode:
+            mode_display += " (switching to {0}...)".format(ctx.pending_mode.upper())
+        if ctx.pending_model:
+            current_model_display += " (switching to {0}...)".format(ctx.pending_model)
+
+        lines.append("  [m] Mode    : {0}".format(mode_display))
         lines.append("  [M] Model   : {0}".format(current_model_display))
-        lines.append("  [R] Root    : {0}".format(ctx.project_root))
+        lines.append("  [R] Root    : {0}".format(state.project_root))
         lines.append("  [L] Multiline: {0}".format("ENABLED" if ctx.multiline_enabled else "disabled"))
         lines.append("")
 
+        if not ctx.detected:
+            lines.append("  Detecting… (API keys, model aliases, existing session)")
+            lines.append("")
+
         # API Keys
         lines.append("-" * 60)
         lines.append("  API Keys Detected")
         lines.append("-" * 60)
+        if not ctx.detected:
+            lines.append("    detecting…")
         for key in ctx.api_keys:
             lines.append("    - {0}".format(key))
         lines.append("")
@@ -53,8 +81,10 @@ class OptionsPanel:
         lines.append("-" * 60)
         lines.append("  Available Models by Alias ({0})".format(len(ctx.model_aliases)))
         lines.append("-" * 60)
+        if not ctx.detected:
+            lines.append("    detecting…")
         for i, (alias_name, model_name) in enumerate(ctx.model_aliases, 1):
-            if model_name == ctx.model:
+            if model_name == state.model:
                 lines.append("    {0:2}. {1} → {2} [CURRENT]".format(i, alias_name, model_name))
             else:
                 lines.append("    {0:2}. {1} → {2}".format(i, alias_name, model_name))
@@ -67,20 +97,31 @@ class OptionsPanel:
         lines.append("  Quick Actions")
         lines.append("-" * 60)
         lines.append("")
-        lines.append("  [t] Start/Focus Terminal    [T] Stop Terminal")
+        lines.append("  [t] Start/Focus Terminal    [T] Stop Terminal     [k] Restart Terminal")
         lines.append("  [c] Send Message            [/] Send Command")
         lines.append("  [e] Edit .env               [g] Open Global Config")
         lines.append("  [l] Open Local Config       [S] Sync from existing session")
+        lines.append("  [n] New Session             [w] Switch Session    [W] Close Session")
         lines.append("")
         lines.append("  [TAB] Next Tab    [SHIFT+TAB] Previous Tab")
-        lines.append("  [1] Options  [2] Files  [3] Output")
+        lines.append("  [1] Options  [2] Files  [3] Output  [4] Batch  [5] Metrics")
         lines.append("  [q] Close All Panels")
         lines.append("")
 
         # Files summary
         lines.append("-" * 60)
         lines.append("  Files: {0} editable, {1} read-only".format(
-            len(ctx.files), len(ctx.readonly_files)))
+            len(state.files), len(state.readonly_files)))
         lines.append("-" * 60)
 
         return "\n".join(lines)
+
+    def _queue_line(self, stats):
+        """Terminal writes pending and how fast they were flushed."""
+        line = "{0} pending (max {1})".format(stats['depth'], stats['max_depth'])
+        if stats['holding']:
+            line += ", waiting: aider is {0}".format(stats['holding'])
+        if stats['flush_p50_ms'] is not None:
+            line += ", flush p50 {0:.0f}ms / p95 {1:.0f}ms".format(
+                stats['flush_p50_ms'], stats['flush_p95_ms'])
+        return line
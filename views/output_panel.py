@@ -1,6 +1,10 @@
 # AiderSavvy - Output panel view
 import sublime
 
+from ..core.events import OutputChunk, HistoryReplaced
+from ..core.line_store import LineStore
+from ..core.settings import get_setting
+
 
 class OutputPanel:
     """Renders the live output panel."""
@@ -8,42 +12,85 @@ class OutputPanel:
     def __init__(self, window, context):
         self.window = window
         self.context = context
-        self.content_lines = []
-        self.max_lines = 5000
+        # Oldest lines are dropped past the limit
+        self.max_lines = get_setting("output_max_lines", 20000)
+        self.lines = LineStore(self.max_lines)
+        # History byte offset the output starts at, None if unknown
+        self.loaded_from = None
+        # Text appended since the last get_content(), None if that is not
+        # enough to bring a rendered tab up to date
+        self.unrendered = None
+        context.events.subscribe((OutputChunk, HistoryReplaced), self.on_events)
+
+    def on_events(self, events):
+        """Follow the history: append new output, restart on a replaced file."""
+        for event in events:
+            if isinstance(event, OutputChunk):
+                self.append_content(event.text)
+            else:
+                self.set_content("", event.start)
 
     def append_content(self, new_content):
         """Append new content to the output."""
-        if not new_content:
-            return
+        was_empty = not len(self.lines)
+        # A chunk ending mid-line is continued by the next one
+        evicted = self.lines.append(new_content)
+        if evicted and self.loaded_from is not None:
+            self.loaded_from += evicted
+        if evicted or was_empty:
+            # Head lines or the placeholder must go, render in full
+            self.unrendered = None
+        elif self.unrendered is not None:
+            self.unrendered.append(new_content)
 
-        new_lines = new_content.split('\n')
-        self.content_lines.extend(new_lines)
+    def take_unrendered(self):
+        """Text to append to the rendered tab, None if it needs a full render."""
+        if self.unrendered is None:
+            return None
+        text = "".join(self.unrendered)
+        self.unrendered = []
+        return text
 
-        # Trim if too long
-        if len(self.content_lines) > self.max_lines:
-            self.content_lines = self.content_lines[-self.max_lines:]
+    def set_content(self, content, start=None):
+        """Set the entire content, read from history offset start if known."""
+        self.lines.max_lines = self.max_lines
+        evicted = self.lines.set(content)
+        self.loaded_from = None if start is None else start + evicted
+        self.unrendered = None
 
-    def set_content(self, content):
-        """Set the entire content."""
-        self.content_lines = content.split('\n') if content else []
+    def prepend_content(self, content, start):
+        """Insert older history, read from offset start, before the output."""
+        self.lines.prepend(content)
+        # Keep what was explicitly loaded, plus the usual room for new output
+        self.lines.max_lines = len(self.lines) + self.max_lines
+        self.loaded_from = start
+        self.unrendered = None
 
     def clear(self):
         """Clear the output."""
-        self.content_lines = []
+        self.lines.max_lines = self.max_lines
+        self.lines.clear()
+        self.loaded_from = None
+        self.unrendered = None
 
     def get_content(self):
         """Get the output panel content as string."""
+        self.unrendered = []
         lines = []
 
-        lines.append("  AIDER OUTPUT (Live from .aider.chat.history.md)")
+        lines.append("  AIDER OUTPUT (Live from {0})".format(self.context.history_file))
         lines.append("")
         lines.append("  [C] Clear output    [O] Refresh from file")
+        lines.append("  [j] Load turn       [J] Load session    [f] Search history")
+        if self.loaded_from:
+            lines.append("  [b] Load older ({0} KB earlier in the history, or move to the top)".format(
+                (self.loaded_from + 1023) // 1024))
         lines.append("")
         lines.append("-" * 60)
         lines.append("")
 
-        if self.content_lines:
-            lines.extend(self.content_lines)
+        if len(self.lines):
+            lines.append(self.lines.text())
         else:
             lines.append("  (No output yet. Start terminal with [t] and send a message.)")
 